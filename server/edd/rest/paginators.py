@@ -1,7 +1,40 @@
 # coding: utf-8
 
+import json
+import logging
+from collections import OrderedDict
+
+from django.db import connections
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_count(queryset):
+    """
+    Estimates the number of rows in a queryset from the Postgres query planner, instead
+    of running a COUNT(*). The estimate is based on table statistics, so it may be off
+    for recently changed tables or for complex filters.
+
+    :param queryset: the QuerySet to count
+    :returns: the estimated count, or None if the planner did not give an estimate
+    """
+    queryset = queryset.order_by()
+    sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    # depending on the driver, the plan may or may not be parsed already
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        logger.warning("Query plan did not include an estimate of rows")
+        return None
 
 
 class ClientConfigurablePagination(PageNumberPagination):
@@ -10,6 +43,13 @@ class ClientConfigurablePagination(PageNumberPagination):
     pagination by EDD's REST API. Note that specific REST views may override
     this behavior.
 
+    Clients opt in to keyset pagination by including a cursor parameter, empty for the
+    first page. Keyset pages are ordered by primary key, and find the following page
+    by filtering on the last key of the previous page, so deep pages are as fast as the
+    first. The count parameter selects how keyset pages report the total count:
+    "exact" runs a COUNT(*), "estimate" uses the query planner, and anything else skips
+    the count.
+
     See REST_FRAMEWORK setting in edd.settings.py.
     """
 
@@ -17,13 +57,94 @@ class ClientConfigurablePagination(PageNumberPagination):
     page_size_query_param = "page_size"
     page_query_param = "page"
     max_page_size = 10000
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view=view)
+        self.request = request
+        self.cursor = self._parse_cursor(request)
+        self.count = self._keyset_count(queryset, request)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            page_size = self.max_page_size
+        queryset = queryset.order_by("pk")
+        if self.cursor:
+            queryset = queryset.filter(pk__gt=self.cursor)
+        # fetch one extra to know if there is a next page
+        results = list(queryset[: page_size + 1])
+        self.has_next = len(results) > page_size
+        results = results[:page_size]
+        self.last = results[-1].pk if results else None
+        return results
+
+    def get_count(self):
+        """
+        Finds the count of results, and if it is only an estimate.
+
+        :returns: tuple of (count, estimated); count is None when not available
+        """
+        if not self.keyset:
+            return self.page.paginator.count, False
+        return self.count
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.last)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        # keyset pages only go forward
+        return None
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        count, estimated = self.get_count()
+        return Response(
+            OrderedDict(
+                [
+                    ("count", count),
+                    ("estimated", estimated),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def _keyset_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == "exact":
+            return queryset.count(), False
+        elif mode == "estimate":
+            return estimate_count(queryset), True
+        return None, False
+
+    def _parse_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            return int(cursor)
+        except ValueError:
+            raise NotFound("Invalid cursor")
 
 
 class LinkHeaderPagination(ClientConfigurablePagination):
     """
     Uses same configuration as ClientConfigurablePagination / DRF PageNumberPagination;
     but uses HTTP X-Total-Count and Link Header values to convey the count of records
-    returned, and links to next/prev sets of data.
+    returned, and links to next/prev sets of data. An estimated count is sent in an
+    X-Estimated-Count header instead of X-Total-Count.
     """
 
     def get_paginated_response(self, data):
@@ -37,5 +158,8 @@ class LinkHeaderPagination(ClientConfigurablePagination):
             links.append(f'<{next_url}>; rel="next"')
         if links:
             headers["Link"] = ", ".join(links)
-        headers["X-Total-Count"] = str(self.page.paginator.count)
+        count, estimated = self.get_count()
+        if count is not None:
+            name = "X-Estimated-Count" if estimated else "X-Total-Count"
+            headers[name] = str(count)
         return Response(data, headers=headers)
@@ -2,11 +2,16 @@
 
 import csv
 import logging
-from uuid import uuid4
 
-from django.db import connection, transaction
+from django.conf import settings
+from django.contrib.postgres.fields.array import IndexTransform
+from django.db import connection, models
+from django.db.models import Func
+from django.db.models.functions import Cast
 from rest_framework_csv import renderers as csv_renderers
 
+from main.export.columnar import ChunkSink, ColumnarExport
+
 logger = logging.getLogger(__name__)
 
 
@@ -74,31 +79,69 @@ class StreamingExportRenderer(object):
         "y",
         "x",
     ]
+    _value_field = models.DecimalField(max_digits=16, decimal_places=5)
+
+    def stream_parquet(self, queryset, packed=None):
+        # columnar export reads its own columns from the queryset, in batches
+        return ColumnarExport(queryset, packed=packed).stream()
+
+    def stream_csv(self, queryset, chunk_rows=None, packed=None):
+        """
+        Generates CSV output for a queryset of MeasurementValue, ordered by primary key.
+        Rows are formatted by Postgres with COPY ... TO STDOUT, one COPY per chunk of
+        rows, so that output is streamed without formatting each row in Python.
 
-    def stream_csv(self, queryset):
-        # limit columns to only those needed to render CSV
-        queryset = queryset.values(*self.columns)
-        # create csv writer
-        writer = csv.writer(Echo())
+        :param queryset: the QuerySet of main.models.MeasurementValue to export
+        :param chunk_rows: (optional) number of rows formatted in each COPY; defaults
+            to the EDD_EXPORT_COPY_CHUNK setting, or 50000
+        :param packed: (optional) the QuerySet of main.models.PackedSeries to export,
+            after the MeasurementValue rows
+        """
+        if chunk_rows is None:
+            chunk_rows = getattr(settings, "EDD_EXPORT_COPY_CHUNK", 50000)
         # yield header using same labels as renderer.ExportRenderer
+        writer = csv.writer(Echo(), lineterminator="\n")
         er_header = ExportRenderer.header
         er_labels = ExportRenderer.labels
-        yield writer.writerow([er_labels.get(x, x) for x in er_header])
-        # prepare to declare cursor
-        raw = str(queryset.query)
-        name = uuid4().hex
-        # create cursor and iterate results to yield csv rows
-        with transaction.atomic(), connection.cursor() as cursor:
-            cursor.execute(f"DECLARE temp_{name} CURSOR FOR {raw}")
-            while True:
-                cursor.execute(f"FETCH 100 FROM temp_{name}")
-                rows = cursor.fetchall()
-                if not rows:
-                    break
-                for row in rows:
-                    # items in index 11 and 12 are arrays for Y and X
-                    # replace with first values
-                    row = list(row)
-                    row[11] = row[11][0] if row[11] else ""
-                    row[12] = row[12][0] if row[12] else ""
-                    yield writer.writerow(row)
+        yield writer.writerow([er_labels.get(x, x) for x in er_header]).encode("utf-8")
+        # x and y are arrays; export only the first values, same as the ExportRenderer
+        queryset = queryset.order_by("pk").annotate(
+            first_y=IndexTransform(1, self._value_field, "y"),
+            first_x=IndexTransform(1, self._value_field, "x"),
+        )
+        columns = self.columns[:-2] + ["first_y", "first_x"]
+        with connection.cursor() as cursor:
+            yield from self._copy_chunks(cursor, queryset, columns, chunk_rows)
+            if packed is not None:
+                # unnest in the select list makes a row per point of each series
+                packed = packed.order_by("pk").annotate(
+                    first_y=Cast(Func("y", function="unnest"), self._value_field),
+                    first_x=Cast(Func("x", function="unnest"), self._value_field),
+                )
+                # each series has many points, so take fewer series in a chunk
+                chunk_series = max(1, chunk_rows // 100)
+                yield from self._copy_chunks(cursor, packed, columns, chunk_series)
+
+    def _copy_chunks(self, cursor, queryset, columns, chunk_size):
+        # each chunk is the rows after the last chunk, up to a boundary primary key
+        last = None
+        while True:
+            chunk = queryset if last is None else queryset.filter(pk__gt=last)
+            keys = chunk.values_list("pk", flat=True)[chunk_size - 1 : chunk_size]
+            boundary = next(iter(keys), None)
+            if boundary is not None:
+                chunk = chunk.filter(pk__lte=boundary)
+            yield from self._copy_csv(cursor, chunk.values_list(*columns))
+            if boundary is None:
+                break
+            last = boundary
+
+    def _copy_csv(self, cursor, queryset):
+        sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+        # COPY does not take query parameters, so parameters are bound client-side
+        query = cursor.mogrify(sql, params).decode("utf-8")
+        sink = ChunkSink()
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV", sink)
+        output = sink.drain()
+        if output:
+            yield output
@@ -73,7 +73,7 @@ class MeasurementValueSerializer(serializers.ModelSerializer):
     updated = UpdateSerializer(read_only=True)
 
     class Meta:
-        model = models.MeasurementValue
+        model = models.MeasurementPoint
         fields = ("measurement", "pk", "updated", "x", "y")
 
 
@@ -125,6 +125,50 @@ class LineSerializer(EDDObjectSerializer):
         )
 
 
+class LineCloneSerializer(serializers.Serializer):
+    lines = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    suffix = serializers.CharField(default=" clone", trim_whitespace=False)
+
+
+class LineBulkEditSerializer(serializers.Serializer):
+    """
+    Validates changes applied to many lines at once. Validated with partial=True,
+    fields left out of the request are not changed on the lines.
+    """
+
+    lines = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(allow_blank=True)
+    control = serializers.BooleanField()
+    contact = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects)
+    experimenter = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects)
+    carbon_source = serializers.ListField(child=serializers.IntegerField())
+    strains = serializers.ListField(child=serializers.UUIDField())
+    metadata = serializers.DictField(child=serializers.CharField(allow_blank=True))
+    remove_metadata = serializers.ListField(child=serializers.CharField())
+
+    def validate(self, data):
+        if not data.get("lines", None):
+            raise serializers.ValidationError('Must specify "lines" to change')
+        return data
+
+    def validate_carbon_source(self, value):
+        return self._load_all(models.CarbonSource.objects, "pk", value)
+
+    def validate_strains(self, value):
+        return self._load_all(models.Strain.objects, "registry_id", value)
+
+    def _load_all(self, queryset, field, values):
+        # load all items in one query, instead of one query per item
+        found = list(queryset.filter(**{f"{field}__in": values}))
+        missing = set(values) - {getattr(item, field) for item in found}
+        if missing:
+            raise serializers.ValidationError(
+                f"Unknown values: {', '.join(map(str, missing))}"
+            )
+        return found
+
+
 class MetadataTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.MetadataType
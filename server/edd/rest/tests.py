@@ -13,7 +13,10 @@ accidentally affect client code.
 
 import codecs
 import csv
+import gzip
+import io
 import logging
+from unittest import skipUnless
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
@@ -25,6 +28,8 @@ from rest_framework.test import APITestCase
 from threadlocals.threadlocals import set_thread_variable
 
 from main import models
+from main.export.columnar import columnar_available
+from main.tests import factory
 
 logger = logging.getLogger(__name__)
 
@@ -262,6 +267,48 @@ class LinesTests(EddApiTestCaseMixin, APITestCase):
         """
         super().setUpTestData()
 
+    def test_line_bulk_edit(self):
+        User = get_user_model()
+        study = models.Study.objects.get(pk=22)  # "Group write study"
+        lines = [models.Line.objects.create(name=f"L{i}", study=study) for i in (1, 2)]
+        for line in lines:
+            line.metadata = {"1": "kept", "2": "removed"}
+            line.save()
+        url = reverse("rest:study-lines-bulk-edit", kwargs={"study_pk": study.pk})
+        data = {
+            "lines": [line.pk for line in lines],
+            "description": "Edited in bulk",
+            "metadata": {"3": "added"},
+            "remove_metadata": ["2"],
+        }
+        # verify that a user with read privileges can't change the lines
+        self.client.force_login(User.objects.get(username="study.reader.user"))
+        self._check_status(
+            self.client.post(url, data, format="json"), status.HTTP_404_NOT_FOUND
+        )
+        self.client.force_login(User.objects.get(username="study.writer.group.user"))
+        response = self._check_status(
+            self.client.post(url, data, format="json"), status.HTTP_200_OK
+        )
+        self.assertEqual(response.json(), {"count": 2})
+        for line in models.Line.objects.filter(pk__in=data["lines"]):
+            self.assertEqual(line.description, "Edited in bulk")
+            self.assertEqual(line.metadata, {"1": "kept", "3": "added"})
+            self.assertEqual(line.name[0], "L")
+
+    def test_line_clone(self):
+        User = get_user_model()
+        study = models.Study.objects.get(pk=22)  # "Group write study"
+        line = models.Line.objects.create(name="Original", study=study)
+        url = reverse("rest:study-lines-clone", kwargs={"study_pk": study.pk})
+        self.client.force_login(User.objects.get(username="study.writer.group.user"))
+        response = self._check_status(
+            self.client.post(url, {"lines": [line.pk]}, format="json"),
+            status.HTTP_201_CREATED,
+        )
+        self.assertEqual([item["name"] for item in response.json()], ["Original clone"])
+        self.assertEqual(study.line_set.count(), 2)
+
 
 class AssaysTests(EddApiTestCaseMixin, APITestCase):
     """
@@ -355,6 +402,111 @@ class ExportTests(EddApiTestCaseMixin, APITestCase):
         # one row for header, plus page_size==5 rows
         self.assertEqual(len(table), 6)
 
+    def test_export_cursor_output(self):
+        url = reverse("rest:export-list")
+        User = get_user_model()
+        admin = User.objects.get(username="system")
+        self.client.force_authenticate(user=admin)
+        params = {"line_id": 8, "page_size": 5, "cursor": "", "count": "estimate"}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, codes.ok)
+        # keyset pages link to a following page by cursor, with an estimated count
+        self.assertRegex(response.get("Link"), r"cursor=\d+.*>; rel=\"next\"")
+        self.assertIn("X-Estimated-Count", response)
+        self.assertNotIn("X-Total-Count", response)
+        first = list(csv.reader(io.StringIO(response.content.decode("utf8"))))
+        # following page has different rows, and exact count when requested
+        next_url = response.get("Link").split(">")[0].lstrip("<")
+        response = self.client.get(next_url.replace("estimate", "exact"))
+        self.assertEqual(response.status_code, codes.ok)
+        expected = models.MeasurementValue.objects.filter(
+            measurement__assay__line_id=8
+        ).count()
+        self.assertEqual(response.get("X-Total-Count"), str(expected))
+        second = list(csv.reader(io.StringIO(response.content.decode("utf8"))))
+        self.assertNotEqual(first[1:], second[1:])
+
+    def test_export_packed_output(self):
+        url = reverse("rest:export-list")
+        User = get_user_model()
+        admin = User.objects.get(username="system")
+        self.client.force_authenticate(user=admin)
+        values = models.MeasurementValue.objects.filter(measurement__assay__line_id=8)
+        expected = values.count()
+        models.PackedSeries.pack(
+            models.Measurement.objects.filter(assay__line_id=8), batch_size=5
+        )
+        response = self.client.get(url, {"line_id": 8, "page_size": expected})
+        self.assertEqual(response.status_code, codes.ok)
+        table = list(csv.reader(io.StringIO(response.content.decode("utf8"))))
+        # packed points are exported as rows, plus one row for header
+        self.assertEqual(len(table), expected + 1)
+        # reading the export leaves the series packed
+        self.assertTrue(
+            models.PackedSeries.objects.filter(measurement__assay__line_id=8).exists()
+        )
+        self.assertFalse(values.exists())
+
+    def test_values_invalid_cursor(self):
+        url = reverse("rest:values-list")
+        User = get_user_model()
+        admin = User.objects.get(username="system")
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(url, {"cursor": "bogus"})
+        self.assertEqual(response.status_code, codes.not_found)
+
+    def test_stream_export_csv(self):
+        url = reverse("rest:stream-export-list")
+        User = get_user_model()
+        admin = User.objects.get(username="system")
+        self.client.force_authenticate(user=admin)
+        expected = models.MeasurementValue.objects.filter(
+            measurement__assay__line_id=8
+        ).count()
+        # small chunks to check rows are not lost or repeated between chunks
+        with self.settings(EDD_EXPORT_COPY_CHUNK=7):
+            response = self.client.get(
+                url, {"line_id": 8}, HTTP_ACCEPT_ENCODING="gzip, deflate"
+            )
+            self.assertEqual(response.status_code, codes.ok)
+            self.assertEqual(response.get("Content-Encoding"), "gzip")
+            content = gzip.decompress(b"".join(response.streaming_content))
+        table = list(csv.reader(io.StringIO(content.decode("utf8"))))
+        self.assertEqual(table[0][0], "Study ID")
+        self.assertEqual(len(table), expected + 1)
+
+    def test_stream_export_without_access(self):
+        url = reverse("rest:stream-export-list")
+        models.PackedSeries.pack(models.Measurement.objects.filter(assay__line_id=8))
+        self.client.force_authenticate(user=factory.UserFactory())
+        # without any ID filters, only values of readable studies are exported
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, codes.ok)
+        content = b"".join(response.streaming_content)
+        table = list(csv.reader(io.StringIO(content.decode("utf8"))))
+        self.assertEqual(len(table), 1)
+        self.assertEqual(table[0][0], "Study ID")
+
+    @skipUnless(columnar_available(), "pyarrow is not installed")
+    def test_stream_export_parquet(self):
+        from pyarrow import parquet
+
+        url = reverse("rest:stream-export-list")
+        User = get_user_model()
+        admin = User.objects.get(username="system")
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(url, {"line_id": 8, "export_format": "parquet"})
+        self.assertEqual(response.status_code, codes.ok)
+        self.assertEqual(response.get("Content-Type"), "application/vnd.apache.parquet")
+        content = b"".join(response.streaming_content)
+        table = parquet.read_table(io.BytesIO(content))
+        expected = models.MeasurementValue.objects.filter(
+            measurement__assay__line_id=8
+        ).count()
+        self.assertEqual(table.num_rows, expected)
+        self.assertIn("study_id", table.column_names)
+        self.assertIn("y", table.column_names)
+
 
 class EddObjectSearchTest(EddApiTestCaseMixin, APITestCase):
     """
@@ -13,14 +13,25 @@ from uuid import UUID
 from django.contrib.auth import get_user_model
 from django.db.models import Q
 from django.http import StreamingHttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from django_filters import filters as django_filters
 from django_filters import rest_framework as filters
-from rest_framework import mixins, response, schemas, viewsets
-from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework import exceptions, mixins, response, schemas, status, viewsets
+from rest_framework.decorators import (
+    action,
+    api_view,
+    permission_classes,
+    renderer_classes,
+)
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, DjangoModelPermissions, IsAuthenticated
 from rest_framework_swagger.renderers import OpenAPIRenderer, SwaggerUIRenderer
 
 from main import models
+from main.export.columnar import ColumnarExport, columnar_available
+from main.lines import clone_lines, edit_lines
 
 from . import paginators, permissions, renderers, serializers
 
@@ -200,6 +211,51 @@ class StudyLinesView(LineFilterMixin, viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         return super().get_queryset().filter(self.get_nested_filter())
 
+    @action(detail=False, methods=["post"])
+    def bulk_edit(self, request, *args, **kwargs):
+        """
+        Applies the same changes to many lines of the study, e.g. to set the strains
+        of every line; fields left out of the request are not changed.
+        """
+        study = self._load_writable_study(request)
+        serializer = serializers.LineBulkEditSerializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        values = dict(serializer.validated_data)
+        count = edit_lines(
+            study,
+            models.Line.objects.filter(pk__in=values.pop("lines")),
+            strains=values.pop("strains", None),
+            carbon_sources=values.pop("carbon_source", None),
+            metadata=values.pop("metadata", None),
+            remove_metadata=values.pop("remove_metadata", None),
+            values=values,
+        )
+        return response.Response({"count": count})
+
+    @action(detail=False, methods=["post"])
+    def clone(self, request, *args, **kwargs):
+        """ Copies lines of the study, with their strains and carbon sources. """
+        study = self._load_writable_study(request)
+        serializer = serializers.LineCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = models.Line.objects.filter(pk__in=serializer.validated_data["lines"])
+        clones = clone_lines(study, lines, serializer.validated_data["suffix"])
+        queryset = self.get_queryset().filter(pk__in=[clone.pk for clone in clones])
+        output = self.get_serializer(queryset, many=True)
+        return response.Response(output.data, status=status.HTTP_201_CREATED)
+
+    def _load_writable_study(self, request):
+        study_id = self.kwargs.get("study_pk", None)
+        try:
+            lookup = Q(uuid=UUID(study_id))
+        except ValueError:
+            lookup = Q(pk=study_id)
+        study = get_object_or_404(models.Study, lookup)
+        # same as changes to studies, hide studies the user cannot write
+        if not study.user_can_write(request.user):
+            raise exceptions.NotFound()
+        return study
+
 
 class AssayFilter(EDDObjectFilter):
     class Meta:
@@ -404,7 +460,11 @@ class ExportViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         return response
 
     def get_queryset(self):
-        qs = models.MeasurementValue.objects.order_by("pk")
+        # points include the values of packed series, in pages ordered by ID
+        qs = models.MeasurementPoint.objects.order_by("pk")
+        if not models.Study.user_role_can_read(self.request.user):
+            access = models.Study.access_filter(self.request.user, via=("study",))
+            qs = qs.filter(access)
         return qs.select_related(
             "measurement__measurement_type",
             "measurement__y_units",
@@ -440,16 +500,54 @@ class StreamingExportViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
 
     def list(self, request, *args, **kwargs):
         # custom implementation of list() ignores serializers
-        queryset = self.filter_queryset(self.get_queryset())
+        queryset = self._readable(self.filter_queryset(self.get_queryset()))
+        packed = self._readable(self._packed_queryset(request))
         renderer = renderers.StreamingExportRenderer()
-        response = StreamingHttpResponse(
-            renderer.stream_csv(queryset), content_type="text/csv"
-        )
+        # cannot use "format" parameter, DRF uses it to pick a renderer
+        export_format = request.query_params.get("export_format", "csv")
+        if export_format == ColumnarExport.extension:
+            if not columnar_available():
+                raise exceptions.ValidationError(
+                    {"export_format": "Columnar exports are not available."}
+                )
+            response = StreamingHttpResponse(
+                renderer.stream_parquet(queryset, packed=packed),
+                content_type=ColumnarExport.content_type,
+            )
+        else:
+            export_format = "csv"
+            stream = renderer.stream_csv(queryset, packed=packed)
+            compress = self._accepts_gzip(request)
+            if compress:
+                stream = compress_sequence(stream)
+            response = StreamingHttpResponse(stream, content_type="text/csv")
+            if compress:
+                response["Content-Encoding"] = "gzip"
+            patch_vary_headers(response, ("Accept-Encoding",))
         # TODO make sure to test with weird non-ascii names
-        name = request.query_params.get("out", "export.csv")
+        name = request.query_params.get("out", f"export.{export_format}")
         response["Content-Disposition"] = f"attachment; filename={name}"
         return response
 
+    def _packed_queryset(self, request):
+        # PackedSeries has the same study and measurement relations as
+        #   MeasurementValue, so the same filters select the packed values
+        queryset = models.PackedSeries.objects.order_by("pk")
+        return self.filter_class(request.query_params, queryset, request=request).qs
+
+    def _readable(self, queryset):
+        # same access check as StudyInternalsFilterMixin, as a subquery of studies;
+        #   distinct() on the joined query would merge repeated points when unnested
+        if models.Study.user_role_can_read(self.request.user):
+            return queryset
+        access = models.Study.access_filter(self.request.user)
+        return queryset.filter(study__in=models.Study.objects.filter(access))
+
+    def _accepts_gzip(self, request):
+        # same check as django.middleware.gzip.GZipMiddleware
+        accept = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        return bool(re_accepts_gzip.search(accept))
+
 
 class MeasurementValueFilter(filters.FilterSet):
     assay = django_filters.ModelChoiceFilter(
@@ -470,7 +568,7 @@ class MeasurementValueFilter(filters.FilterSet):
     y__lt = django_filters.NumberFilter(field_name="y", lookup_expr="0__lte")
 
     class Meta:
-        model = models.MeasurementValue
+        model = models.MeasurementPoint
         fields = {"measurement": ["exact", "in"]}
 
 
@@ -480,7 +578,8 @@ class ValuesFilterMixin(StudyInternalsFilterMixin):
     _filter_joins = ["measurement", "assay", "line", "study"]
 
     def get_queryset(self):
-        return models.MeasurementValue.objects.order_by("pk").select_related("updated")
+        # points include the values of packed series
+        return models.MeasurementPoint.objects.order_by("pk").select_related("updated")
 
 
 class MeasurementValuesViewSet(ValuesFilterMixin, viewsets.ReadOnlyModelViewSet):
@@ -215,6 +215,8 @@ LOGGING = {
         "django.db.backends": {"level": "WARNING", "handlers": ["console"]},
         "edd": {"level": "INFO", "handlers": ["console"]},
         "main": {"level": "INFO", "handlers": ["console"]},
+        # set to INFO to log the time taken by each request to Solr
+        "main.solr.timing": {"level": "WARNING"},
         # for everything else, display warnings and above
         "": {"level": "WARNING", "handlers": ["console"]},
     },
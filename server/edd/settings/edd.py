@@ -47,12 +47,25 @@ ICE_URL = env("ICE_URL", default=None)
 ICE_REQUEST_TIMEOUT = (10, 10)
 ICE_FOLDER_SEARCH_PAGE_SIZE = 100
 ICE_VERIFY_CERT = True
+# ICE_REQUEST_WORKERS: number of requests to ICE made at the same time when resolving parts
+# ICE_REQUEST_WORKERS = 4
+# ICE_ENTRY_CACHE_LENGTH: seconds to remember an ICE entry found when resolving parts
+# ICE_ENTRY_CACHE_LENGTH = 60 * 10
+# ICE_LINK_QUEUE_DELAY: seconds to wait for more changes before updating study links in ICE
+# ICE_LINK_QUEUE_DELAY = 5
+# ICE_LINK_BATCH: number of strains read from the queue at a time when updating links
+# ICE_LINK_BATCH = 100
+# ICE_LINK_RATE_LIMIT: maximum requests per second sent to ICE when updating links
+# ICE_LINK_RATE_LIMIT = 10
 
 
 # Measurement Type related settings
 # --------------------
 # Override REQUIRE_UNIPROT_ACCESSION_IDS to change acceptable protein IDs
 # REQUIRE_UNIPROT_ACCESSION_IDS = True
+# EDD_AUTOCOMPLETE_CACHE_LENGTH: seconds to remember autocomplete results of a search term;
+#   0 turns off caching
+# EDD_AUTOCOMPLETE_CACHE_LENGTH = 30
 
 
 # Import related settings
@@ -62,6 +75,70 @@ EDD_IMPORT_PAGE_SIZE = 1000
 EDD_IMPORT_PAGE_LIMIT = 1000
 EDD_IMPORT_CACHE_LENGTH = 60 * 60 * 24
 EDD_IMPORT_LOOKUP_ERR_LIMIT = 50
+# EDD_IMPORT_LOOKUP_WORKERS: number of identifiers looked up at the same time during import
+# EDD_IMPORT_LOOKUP_WORKERS = 4
+# EDD_IMPORT_LOOKUP_CACHE_LENGTH: seconds to remember a resolved identifier
+# EDD_IMPORT_LOOKUP_CACHE_LENGTH = 60 * 60 * 24
+# EDD_IMPORT_LOOKUP_MISS_CACHE_LENGTH: seconds to remember an identifier that failed to resolve
+# EDD_IMPORT_LOOKUP_MISS_CACHE_LENGTH = 60 * 60
+# EDD_IMPORT_BULK_BATCH_SIZE: maximum rows written per bulk query in an import
+# EDD_IMPORT_BULK_BATCH_SIZE = 1000
+# EDD_PAGE_CODEC: encoding of import pages kept in Redis, "msgpack" (compressed) or "json"
+# EDD_PAGE_CODEC = "msgpack"
+# EDD_BULK_UPDATE_BATCH_SIZE: maximum rows written per query when a bulk operation logs updates
+# EDD_BULK_UPDATE_BATCH_SIZE = 1000
+# EDD_LINE_CREATION_BATCH: lines written per bulk insert when creating lines from an
+#   experiment description or the line creation dialog, or cloning and editing lines
+# EDD_LINE_CREATION_BATCH = 500
+# EDD_VALUE_PARTITIONS: number of hash partitions by study for measurement values, used by
+#   the edd_partition_values command; requires PostgreSQL 11
+# EDD_VALUE_PARTITIONS = 0
+# EDD_DELETE_BATCH_SIZE: number of rows removed in each transaction when deleting lines
+#   and studies in the background
+# EDD_DELETE_BATCH_SIZE = 5000
+
+
+# Export related settings
+# --------------------
+# EDD_EXPORT_PAGE_SIZE: size in bytes of uncompressed export text saved per page
+# EDD_EXPORT_PAGE_SIZE = 1024 * 1024
+# EDD_EXPORT_COLUMNAR_BATCH: rows per row group in columnar (Parquet) exports;
+#   columnar exports are only offered when the optional pyarrow package is installed
+# EDD_EXPORT_COLUMNAR_BATCH = 10000
+# EDD_EXPORT_COPY_CHUNK: rows formatted by each COPY query in streaming CSV exports
+# EDD_EXPORT_COPY_CHUNK = 50000
+
+
+# Search index related settings
+# --------------------
+# EDD_SOLR_QUEUE_DELAY: seconds to wait after a change before sending queued changes
+#   to Solr; changes made during the wait are sent together
+# EDD_SOLR_QUEUE_DELAY = 2
+# EDD_SOLR_QUEUE_BATCH: maximum number of queued items sent to Solr per request
+# EDD_SOLR_QUEUE_BATCH = 500
+# EDD_SOLR_COMMIT_WITHIN: milliseconds Solr may wait before queued changes are visible
+# EDD_SOLR_COMMIT_WITHIN = 5000
+# EDD_SOLR_POOL_SIZE: number of connections to Solr kept open in each process
+# EDD_SOLR_POOL_SIZE = 10
+# EDD_SOLR_RETRIES: number of times to retry a failed request to Solr
+# EDD_SOLR_RETRIES = 3
+# EDD_SOLR_RETRY_BACKOFF: factor for exponential backoff between retries, in seconds
+# EDD_SOLR_RETRY_BACKOFF = 0.2
+
+
+# Permission related settings
+# --------------------
+# EDD_ACCESS_CACHE: set False to always find accessible studies with JOINs on permissions
+#   instead of using cached sets of study IDs per user
+# EDD_ACCESS_CACHE = True
+# EDD_ACCESS_CACHE_EXPIRES: seconds to keep a cached set of study IDs for a user
+# EDD_ACCESS_CACHE_EXPIRES = 60 * 60
+# EDD_PAYLOAD_CACHE_EXPIRES: seconds to keep a cached EDDData payload of a study
+# EDD_PAYLOAD_CACHE_EXPIRES = 60 * 60 * 24
+# EDD_PLOT_PAGE_SIZE: default number of measurements in each page of plot data
+# EDD_PLOT_PAGE_SIZE = 2000
+# EDD_PLOT_PAGE_MAX: largest number of measurements a client may request in one page
+# EDD_PLOT_PAGE_MAX = 10000
 
 
 # Index page related settings
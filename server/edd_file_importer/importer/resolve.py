@@ -0,0 +1,211 @@
+# coding: utf-8
+"""
+Resolves MeasurementType identifiers from import files, e.g. PubChem CIDs or UniProt
+accession IDs, to the MeasurementTypes used in EDD.
+"""
+
+import logging
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import connection
+
+from main.models import GeneIdentifier, MeasurementType, Metabolite, ProteinIdentifier
+from main.redis import ScratchCache
+
+from ..utilities import MTYPE_GROUP_TO_CLASS
+
+logger = logging.getLogger(__name__)
+
+
+class MeasurementTypeResolver(object):
+    """
+    Resolves identifiers to MeasurementTypes of a single MeasurementType.Group. Types
+    already known to EDD are found with one query. Other identifiers go through the
+    load_or_create() of the type class, which may contact external services, using a
+    bounded pool of threads. Results of those lookups are remembered for a while, so
+    that repeated uploads of a file skip the external services.
+    """
+
+    def __init__(self, mtype_group, user, workers=None):
+        """
+        :param mtype_group: the MeasurementType.Group of the identifiers
+        :param user: the user running the import; some lookups depend on the user
+        :param workers: (optional) number of lookups to run at the same time; defaults
+            to the EDD_IMPORT_LOOKUP_WORKERS setting, or 4
+        """
+        self.mtype_group = mtype_group
+        self.mtype_class = MTYPE_GROUP_TO_CLASS[mtype_group]
+        self.user = user
+        if workers is None:
+            workers = getattr(settings, "EDD_IMPORT_LOOKUP_WORKERS", 4)
+        self.workers = max(1, workers)
+
+    def resolve(self, identifiers, err_limit=0):
+        """
+        Resolves identifiers to MeasurementTypes.
+
+        :param identifiers: iterable of identifiers
+        :param err_limit: (optional) stop looking up identifiers after this many
+            failures; the default 0 looks up all identifiers
+        :returns: a tuple of (types, errors); types is a dict of identifiers to
+            MeasurementTypes, and errors a list of identifiers that did not resolve
+        """
+        identifiers = list(identifiers)
+        types = self._find_known(identifiers)
+        remaining = [i for i in identifiers if i not in types]
+        errors = []
+        # results found inside a transaction may be rolled back, and are not visible
+        #   to other threads; so only remember results and use threads outside one
+        in_transaction = connection.in_atomic_block
+        storage = None if in_transaction else self._storage()
+        if storage is not None and remaining:
+            remaining = self._load_cached(storage, remaining, types, errors)
+        if remaining and not self._at_limit(errors, err_limit):
+            if self.workers > 1 and len(remaining) > 1 and not in_transaction:
+                lookups = self._lookup_concurrent(remaining, errors, err_limit)
+            else:
+                lookups = self._lookup_serial(remaining, errors, err_limit)
+            for identifier, mtype in lookups:
+                if mtype is None:
+                    errors.append(identifier)
+                else:
+                    types[identifier] = mtype
+                if storage is not None:
+                    self._save_cached(storage, identifier, mtype)
+        # report errors in the same order as the identifiers
+        order = {identifier: index for index, identifier in enumerate(identifiers)}
+        errors.sort(key=order.get)
+        if err_limit:
+            errors = errors[:err_limit]
+        return types, errors
+
+    def _at_limit(self, errors, err_limit):
+        return err_limit and len(errors) >= err_limit
+
+    def _cache_key(self, identifier):
+        # lookups of some groups depend on the user, e.g. ICE permissions
+        return f"{self.mtype_group}:{self.user.pk}:{identifier}"
+
+    def _find_known(self, identifiers):
+        # maps identifiers to the value of a unique field on the type class
+        Group = MeasurementType.Group
+        if self.mtype_group == Group.GENERIC:
+            queryset = MeasurementType.objects.all()
+            field = "type_name"
+            keys = {i: i for i in identifiers}
+        elif self.mtype_group == Group.METABOLITE:
+            queryset = Metabolite.objects.all()
+            field = "pubchem_cid"
+            keys = {}
+            for identifier in identifiers:
+                match = Metabolite.pubchem_pattern.match(identifier)
+                if match:
+                    keys[identifier] = int(match.group(1))
+        elif self.mtype_group == Group.PROTEINID:
+            queryset = ProteinIdentifier.objects.all()
+            field = "accession_code"
+            keys = {i: ProteinIdentifier.match_accession_id(i) for i in identifiers}
+        elif self.mtype_group == Group.GENEID:
+            queryset = GeneIdentifier.objects.filter(
+                strainlink__isnull=False
+            ).distinct()
+            field = "type_name"
+            keys = {i: i for i in identifiers}
+        else:
+            return {}
+        found = defaultdict(list)
+        for mtype in queryset.filter(**{f"{field}__in": set(keys.values())}):
+            found[getattr(mtype, field)].append(mtype)
+        # anything other than a unique match goes through load_or_create(), which will
+        # report the error, or create a new type
+        return {i: found[key][0] for i, key in keys.items() if len(found[key]) == 1}
+
+    def _load_cached(self, storage, identifiers, types, errors):
+        cached = storage.load_many(self._cache_key(i) for i in identifiers)
+        found = {}
+        for identifier, result in zip(identifiers, cached):
+            if result is None:
+                continue
+            elif result.get("pk") is None:
+                errors.append(identifier)
+            else:
+                found[result["pk"]] = identifier
+        # cached types may have been removed since, look those up again
+        for mtype in self.mtype_class.objects.filter(pk__in=found.keys()):
+            types[found[mtype.pk]] = mtype
+        failed = set(errors)
+        return [i for i in identifiers if i not in types and i not in failed]
+
+    def _lookup(self, identifier):
+        """
+        A simple wrapper function to unify the interface for load_or_create() for the various
+        MeasurementType subclasses.
+        :param identifier: the type name to search for...maybe in EDD, maybe in an external
+            database. EDD is always checked first.
+        :return: the MeasurementType, or None if the type couldn't be found or created (for any
+            reason).
+        TODO: as a future enhancement, add in more detailed error handling to those methods (likely
+        in a parallel implementation to avoid breaking the legacy import).  Also consider
+        unifying the interface in the core models.
+        """
+        try:
+            if self.mtype_group == MeasurementType.Group.GENERIC:
+                try:
+                    return MeasurementType.objects.get(type_name=identifier)
+                except ObjectDoesNotExist:
+                    raise ValidationError(f'Measurement Type "{identifier}" not found')
+            if self.mtype_group == MeasurementType.Group.METABOLITE:
+                return Metabolite.load_or_create(identifier)
+            return self.mtype_class.load_or_create(identifier, self.user)
+        except ValidationError:
+            logger.exception(f"Exception verifying MeasurementType id {identifier}")
+            return None
+
+    def _lookup_concurrent(self, identifiers, errors, err_limit):
+        failed = len(errors)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = {pool.submit(self._lookup_thread, i): i for i in identifiers}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    identifier = pending.pop(future)
+                    mtype = future.result()
+                    yield identifier, mtype
+                    failed += mtype is None
+                if err_limit and failed >= err_limit:
+                    # to maintain responsiveness, skip lookups not yet started
+                    for future in pending:
+                        future.cancel()
+                    break
+
+    def _lookup_serial(self, identifiers, errors, err_limit):
+        failed = len(errors)
+        for identifier in identifiers:
+            mtype = self._lookup(identifier)
+            yield identifier, mtype
+            failed += mtype is None
+            if err_limit and failed >= err_limit:
+                break
+
+    def _lookup_thread(self, identifier):
+        # runs in worker threads; each thread gets its own database connection
+        try:
+            return self._lookup(identifier)
+        finally:
+            connection.close()
+
+    def _save_cached(self, storage, identifier, mtype):
+        if mtype is None:
+            expires = getattr(settings, "EDD_IMPORT_LOOKUP_MISS_CACHE_LENGTH", 60 * 60)
+        else:
+            expires = getattr(settings, "EDD_IMPORT_LOOKUP_CACHE_LENGTH", 60 * 60 * 24)
+        result = {"pk": None if mtype is None else mtype.pk}
+        storage.save(result, name=self._cache_key(identifier), expires=expires)
+
+    def _storage(self):
+        return ScratchCache(
+            f"{__name__}.{self.__class__.__name__}", "MeasurementType lookups"
+        )
@@ -6,7 +6,6 @@ import math
 from collections import OrderedDict
 
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db.models import Count
 from django.utils.translation import ugettext_lazy as _
 
@@ -18,14 +17,12 @@ from main.models import (
     Line,
     MeasurementType,
     MeasurementUnit,
-    Metabolite,
     MetadataType,
 )
 
 from ..codes import FileParseCodes, FileProcessingCodes
 from ..models import Import
 from ..utilities import (
-    MTYPE_GROUP_TO_CLASS,
     ErrorAggregator,
     ImportTooLargeError,
     ParseError,
@@ -33,6 +30,7 @@ from ..utilities import (
     compute_required_context,
     verify_assay_times,
 )
+from .resolve import MeasurementTypeResolver
 
 logger = logging.getLogger(__name__)
 
@@ -337,7 +335,6 @@ class ImportFileHandler(ErrorAggregator):
         category = self.cache.import_.category
         mtype_group = category.default_mtype_group
         err_limit = getattr(settings, "EDD_IMPORT_LOOKUP_ERR_LIMIT", 0)
-        err_count = 0
         types_count = len(parser.unique_mtypes)
         types = (
             f": {parser.unique_mtypes}" if types_count <= 10 else f"{types_count} types"
@@ -347,20 +344,14 @@ class ImportFileHandler(ErrorAggregator):
             f'type "{mtype_group}"{types}'
         )
 
-        for mtype_id in parser.unique_mtypes:
-            try:
-                mtype = self._mtype_lookup(mtype_id, mtype_group)
-                self.cache.mtype_name_to_type[mtype_id] = mtype
-            except ValidationError:
-                logger.exception(f"Exception verifying MeasurementType id {mtype_id}")
-                err_type = MTYPE_GROUP_TO_ID_ERR.get(mtype_group)
-                self.add_error(err_type, occurrence=mtype_id)
-
-                # to maintain responsiveness, stop looking up measurement types after a reasonable
-                # number of errors
-                err_count += 1
-                if err_count == err_limit:
-                    break
+        # to maintain responsiveness, stop looking up measurement types after a reasonable
+        # number of errors
+        resolver = MeasurementTypeResolver(mtype_group, self.cache.user)
+        types, errors = resolver.resolve(parser.unique_mtypes, err_limit=err_limit)
+        self.cache.mtype_name_to_type.update(types)
+        err_type = MTYPE_GROUP_TO_ID_ERR.get(mtype_group)
+        for mtype_id in errors:
+            self.add_error(err_type, occurrence=mtype_id)
 
     def _verify_units(self, parser):
         # Note, we purposefully DON'T use MeasurementUnit.type_group, since allowed units should be
@@ -377,30 +368,6 @@ class ImportFileHandler(ErrorAggregator):
         if missing_units:
             self.add_errors(FileParseCodes.UNSUPPORTED_UNITS, occurrences=missing_units)
 
-    def _mtype_lookup(self, mtype_id, mtype_group):
-        """
-        A simple wrapper function to unify the interface for load_or_create() for the various
-        MeasurementType subclasses.
-        :param mtype_id: the type name to search for...maybe in EDD, maybe in an external database.
-        EDD is always checked first.
-        :param mtype_group: the MeasurementType.Group identifying which class of MeasurementTypes
-        to limit the search to
-        :raise ValidationError: if the type couldn't be found or created (for any reason).
-        TODO: as a future enhancement, add in more detailed error handling to those methods (likely
-        in a parallel implementation to avoid breaking the legacy import).  Also consider
-        unifying the interface in the core models.
-        """
-        if mtype_group == MeasurementType.Group.GENERIC:
-            try:
-                return MeasurementType.objects.get(type_name=mtype_id)
-            except ObjectDoesNotExist:
-                raise ValidationError(f'Measurement Type "{mtype_id}" not found')
-        if mtype_group == MeasurementType.Group.METABOLITE:
-            return Metabolite.load_or_create(mtype_id)
-        else:
-            mtype_class = MTYPE_GROUP_TO_CLASS[mtype_group]
-            return mtype_class.load_or_create(mtype_id, self.cache.user)
-
     def cache_resolved_import(self, import_id, parser, matched_assays, initial_upload):
         """
         Converts MeasurementParseRecords into JSON to send to the legacy import Celery task.
@@ -418,6 +385,8 @@ class ImportFileHandler(ErrorAggregator):
         import_records = (
             OrderedDict()
         )  # maintain the order of items from the file for debugging
+        # parse records grouped by ID of import record, as (file index, record, mtype)
+        grouped = {}
         for index, parse_record in enumerate(parser.series_data):
 
             # extract info from the parse record and build a unique ID for the Measurement to be
@@ -441,38 +410,14 @@ class ImportFileHandler(ErrorAggregator):
             ident = (assay_or_line_pk, protocol.pk, mtype.pk, unit.pk)
 
             # merge parse records that match the same ID (but should have different times)
-            import_record = import_records.get(ident)
-            if not import_record:
-                import_record = self._build_import_record(parse_record, matched_assays)
-                import_records[ident] = import_record
-
-            else:
-                # TODO: after this is working / unit tested, optimize by investigating
-                # Python library options & using a  more efficient search algorithm
-                import_series = import_record["data"]
-                insert_index = None
-                for index, import_data_entry in enumerate(import_series):
-                    import_time = import_data_entry[0]
-                    parsed_time = parse_record.data[0]
-
-                    # detect parse records that clash with each other, e.g. that fall
-                    # exactly on the same line/assay + time + measurement type
-                    if import_time == parsed_time:
-                        self._record_record_clash(
-                            parse_record.line_or_assay_name,
-                            import_time,
-                            import_record,
-                            parse_record,
-                            mtype,
-                        )
-                    elif import_time > parsed_time:
-                        insert_index = index
-                        break
-                if insert_index is not None:
-                    import_series.insert(insert_index, parse_record.data)
-                else:
-                    import_series.append(parse_record.data)
+            if ident not in import_records:
+                import_records[ident] = self._build_import_record(
+                    parse_record, matched_assays
+                )
+                grouped[ident] = []
+            grouped[ident].append((index, parse_record, mtype))
 
+        self._merge_series(import_records, grouped)
         self.raise_errors()  # raise any errors detected during the merge (e.g. duplicate entries)
 
         import_records_list = list(import_records.values())
@@ -508,7 +453,7 @@ class ImportFileHandler(ErrorAggregator):
         broker.set_context(import_id, json.dumps(context))
 
         for page in import_cache_pages:
-            broker.add_page(import_id, json.dumps(page))
+            broker.add_page(import_id, page)
 
         return import_records_list
 
@@ -556,6 +501,40 @@ class ImportFileHandler(ErrorAggregator):
 
         return import_record
 
+    def _merge_series(self, import_records, grouped):
+        """
+        Sets the data of each import record to the time-sorted data of its parse
+        records, and reports parse records that clash on the same time. Each series is
+        sorted once, so clashing records end up next to each other.
+        """
+        clashes = []
+        for ident, records in grouped.items():
+            import_record = import_records[ident]
+            # stable sort keeps records with the same time in the order of the file
+            records.sort(key=lambda item: item[1].data[0])
+            run_start = 0
+            for position, (index, parse_record, mtype) in enumerate(records):
+                parsed_time = parse_record.data[0]
+                if records[run_start][1].data[0] != parsed_time:
+                    run_start = position
+                # a record clashes with every earlier record having the same time
+                for earlier in records[run_start:position]:
+                    import_time = earlier[1].data[0]
+                    clashes.append(
+                        (index, import_time, parse_record, import_record, mtype)
+                    )
+            import_record["data"] = [item[1].data for item in records]
+        # report clashes in the order of the file
+        clashes.sort(key=lambda clash: clash[0])
+        for _index, import_time, parse_record, import_record, mtype in clashes:
+            self._record_record_clash(
+                parse_record.line_or_assay_name,
+                import_time,
+                import_record,
+                parse_record,
+                mtype,
+            )
+
     def _paginate_cache(self, import_records):
         cache_page_size = settings.EDD_IMPORT_PAGE_SIZE
         max_cache_pages = settings.EDD_IMPORT_PAGE_LIMIT
@@ -1,5 +1,4 @@
 # coding: utf-8
-import json
 
 import celery
 from celery import shared_task
@@ -326,8 +325,7 @@ class SeriesCacheParser:
         self.all_records_have_compartment = True
         self.matched_assays = True
         for page in cache_pages:
-            page_json = json.loads(page)
-            for import_record in page_json:
+            for import_record in page:
                 measurement_pk = import_record.get("measurement_id")
                 self.mtype_pks.add(measurement_pk)
 
@@ -340,7 +338,7 @@ class SeriesCacheParser:
                 else:
                     self._add_id(import_record["assay_id"])
 
-            import_records.extend(page_json)
+            import_records.extend(page)
 
         return import_records
 
@@ -0,0 +1,135 @@
+# coding: utf-8
+import threading
+from unittest.mock import MagicMock, call, patch
+
+from main import models
+from main.tests import TestCase
+from main.tests import factory as main_factory
+
+from ..importer.resolve import MeasurementTypeResolver
+
+
+class MeasurementTypeResolverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = main_factory.UserFactory()
+
+    def test_known_types_in_one_query(self):
+        proteins = [
+            main_factory.ProteinFactory(accession_code=code)
+            for code in ("P12345", "Q67890")
+        ]
+        resolver = MeasurementTypeResolver(
+            models.MeasurementType.Group.PROTEINID, self.user
+        )
+        with self.assertNumQueries(1):
+            types, errors = resolver.resolve(["sp|P12345|AATM_RABIT", "Q67890"])
+        self.assertEqual(
+            types, {"sp|P12345|AATM_RABIT": proteins[0], "Q67890": proteins[1]}
+        )
+        self.assertEqual(errors, [])
+
+    def test_unknown_types_use_load_or_create(self):
+        resolver = MeasurementTypeResolver(
+            models.MeasurementType.Group.METABOLITE, self.user
+        )
+        metabolite = main_factory.MetaboliteFactory(pubchem_cid=9999)
+        types, errors = resolver.resolve(["cid:9999", "cid:1234", "bad-id", "bad"])
+        self.assertEqual(types["cid:9999"], metabolite)
+        self.assertEqual(types["cid:1234"].pubchem_cid, 1234)
+        self.assertEqual(errors, ["bad-id", "bad"])
+
+    def test_error_limit(self):
+        resolver = MeasurementTypeResolver(
+            models.MeasurementType.Group.GENERIC, self.user
+        )
+        with patch.object(resolver, "_lookup", return_value=None) as lookup:
+            types, errors = resolver.resolve(["a", "b", "c"], err_limit=2)
+        self.assertEqual(types, {})
+        self.assertEqual(errors, ["a", "b"])
+        self.assertEqual(lookup.call_count, 2)
+
+    def test_lookup_concurrent(self):
+        resolver = MeasurementTypeResolver(
+            models.MeasurementType.Group.GENERIC, self.user, workers=4
+        )
+        threads = set()
+
+        def lookup(identifier):
+            threads.add(threading.get_ident())
+            return identifier.upper()
+
+        identifiers = [f"type-{i}" for i in range(8)]
+        with patch.object(resolver, "_lookup", side_effect=lookup):
+            found = dict(resolver._lookup_concurrent(identifiers, [], 0))
+        self.assertEqual(found, {i: i.upper() for i in identifiers})
+        # lookups run in worker threads, not the calling thread
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_lookup_concurrent_error_limit(self):
+        resolver = MeasurementTypeResolver(
+            models.MeasurementType.Group.GENERIC, self.user, workers=2
+        )
+        release = threading.Event()
+
+        def lookup(identifier):
+            # first two lookups fail, others wait until those failures are seen
+            if identifier not in ("type-0", "type-1"):
+                release.wait(5)
+            return None
+
+        identifiers = [f"type-{i}" for i in range(10)]
+        with patch.object(resolver, "_lookup", side_effect=lookup) as mock_lookup:
+            lookups = resolver._lookup_concurrent(identifiers, [], 2)
+            found = [next(lookups), next(lookups)]
+            release.set()
+            rest = list(lookups)
+        self.assertEqual(sorted(found), [("type-0", None), ("type-1", None)])
+        # lookups not yet started are cancelled at the limit
+        self.assertEqual(rest, [])
+        self.assertLess(mock_lookup.call_count, len(identifiers))
+
+    def test_load_cached(self):
+        resolver = MeasurementTypeResolver(
+            models.MeasurementType.Group.METABOLITE, self.user
+        )
+        metabolite = main_factory.MetaboliteFactory()
+        deleted = main_factory.MetaboliteFactory()
+        deleted_pk = deleted.pk
+        deleted.delete()
+        storage = MagicMock()
+        storage.load_many.return_value = [
+            {"pk": metabolite.pk},
+            {"pk": None},
+            None,
+            {"pk": deleted_pk},
+        ]
+        types, errors = {}, []
+        remaining = resolver._load_cached(
+            storage, ["hit", "miss", "new", "gone"], types, errors
+        )
+        self.assertEqual(types, {"hit": metabolite})
+        self.assertEqual(errors, ["miss"])
+        # uncached identifiers, and cached types deleted since, are looked up again
+        self.assertEqual(remaining, ["new", "gone"])
+
+    def test_save_cached(self):
+        resolver = MeasurementTypeResolver(
+            models.MeasurementType.Group.METABOLITE, self.user
+        )
+        metabolite = main_factory.MetaboliteFactory()
+        storage = MagicMock()
+        with self.settings(
+            EDD_IMPORT_LOOKUP_CACHE_LENGTH=100, EDD_IMPORT_LOOKUP_MISS_CACHE_LENGTH=10
+        ):
+            resolver._save_cached(storage, "hit", metabolite)
+            resolver._save_cached(storage, "miss", None)
+        storage.save.assert_has_calls(
+            [
+                call(
+                    {"pk": metabolite.pk}, name=resolver._cache_key("hit"), expires=100
+                ),
+                call({"pk": None}, name=resolver._cache_key("miss"), expires=10),
+            ]
+        )
@@ -3,7 +3,7 @@
 import json
 import os
 import uuid
-from unittest.mock import call, patch
+from unittest.mock import ANY, call, patch
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -113,8 +113,9 @@ class FileProcessingTests(EddApiTestCaseMixin, ImportTestsMixin, APITestCase):
                     broker.clear_pages.assert_not_called()
                     broker.set_context.assert_called_once_with(import_uuid, context_str)
                     broker.add_page.assert_has_calls(
-                        [call(import_uuid, page) for page in series_pages]
+                        [call(import_uuid, ANY) for page in series_pages]
                     )
+                    self.assertEqual(self._stored_pages(broker), series_pages)
 
                     self._test_success_notification(
                         import_pk,
@@ -451,8 +452,11 @@ class LegacyIntegrationTests(EddApiTestCaseMixin, ImportTestsMixin, APITestCase)
                         cache_producer.set_context.assert_called_once_with(
                             import_.uuid, context_str
                         )
-                        exp_calls = [call(import_.uuid, page) for page in series_pages]
+                        exp_calls = [call(import_.uuid, ANY) for page in series_pages]
                         cache_producer.add_page.assert_has_calls(exp_calls)
+                        self.assertEqual(
+                            self._stored_pages(cache_producer), series_pages
+                        )
 
                 # verify that the data was successfully added to the database
                 self._verify_fba_od_data(import_.study_id)
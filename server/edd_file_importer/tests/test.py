@@ -1,5 +1,6 @@
 # coding: utf-8
 
+from .importer import *  # noqa: F401, F403
 from .parsers import *  # noqa: F401, F403
 from .rest import *  # noqa: F401, F403
 from .tasks import *  # noqa: F401, F403
@@ -3,6 +3,8 @@
 import json
 import math
 
+from edd.utilities import JSONEncoder
+
 from . import factory
 
 CONTEXT_PATH = "generic_import/FBA-OD-generic.xlsx.cache.context.json"
@@ -18,25 +20,32 @@ class ImportTestsMixin(object):
         """
 
         with factory.load_test_file(series_path, "rt") as series_file:
-            series_str = series_file.read()
+            series = json.load(series_file)
 
         # if import can be completed in a single page, just return the series data directly from
         # file
         if page_count == 1:
-            return [series_str]
+            return [series]
 
-        # since we have to page the data, parse the json and break it up into pages of the
-        # requested size
-        series = json.loads(series_str)
+        # since we have to page the data, break it up into pages of the requested size
         item_count = len(series)
 
         pages = []
         for i in range(0, int(math.ceil(item_count / page_size))):
             end_index = min((i + 1) * page_size, item_count)
             page_series = series[i * page_size : end_index]
-            pages.append(json.dumps(page_series))
+            pages.append(page_series)
             self.assertTrue(page_series)
         # verify that data file content matches
         self.assertEqual(len(pages), page_count)
 
         return pages
+
+    def _stored_pages(self, broker):
+        """
+        Finds pages added to a mock ImportBroker, in the same form as loaded from JSON.
+        """
+        return [
+            json.loads(JSONEncoder.dumps(args[1]))
+            for args, kwargs in broker.add_page.call_args_list
+        ]
@@ -10,6 +10,7 @@ from main.models import (
     Measurement,
     MeasurementUnit,
     MeasurementValue,
+    PackedSeries,
     Protocol,
 )
 
@@ -138,6 +139,8 @@ class CytometerRow(object):
                     x_units=self._hours,
                     y_units=self._na,
                 )
+            # points are matched by x as rows; packed series become rows again
+            PackedSeries.unpack(self._assay.measurement_set.filter(pk=obj.pk))
             x = list(map(float, [time]))
             y = list(map(float, [value, variance, self._count]))
             try:
@@ -334,13 +334,28 @@ class IceApi(RestApiClient):
         :return: A Part object representing the response from ICE, or None if an
             Exception occurred but suppress_errors was true.
         """
+        json_dict = self.get_entry_json(entry_id, suppress_errors=suppress_errors)
+        if json_dict:
+            return Entry.of(json_dict, False)
+        return None
+
+    def get_entry_json(self, entry_id, suppress_errors=False):
+        """
+        Retrieves the JSON of an ICE entry, without converting it to a Part object; see
+        get_entry(). Entry.of() converts the result to a Part object.
+
+        :param entry_id: the ICE ID for this entry (either the UUID, part number,
+            locally-unique integer primary key)
+        :param suppress_errors: true to catch and log exception messages and return
+            None instead of raising Exceptions.
+        :return: A dict of the JSON response from ICE, or None if no part was found, or
+            an Exception occurred but suppress_errors was true.
+        """
         rest_url = f"{self.base_url}/rest/parts/{entry_id}"
         try:
             response = self.session.get(url=rest_url)
             response.raise_for_status()
-            json_dict = json.loads(response.text)
-            if json_dict:
-                return Entry.of(json_dict, False)
+            return json.loads(response.text) or None
         except requests.exceptions.Timeout as e:
             if not suppress_errors:
                 raise IceApiException() from e
@@ -3,6 +3,7 @@ Defines utility classes for use in HTTP request generation.
 """
 import logging
 
+from requests.adapters import HTTPAdapter
 from requests.sessions import Session as SessionApi
 
 logger = logging.getLogger(__name__)
@@ -20,6 +21,15 @@ class Session(SessionApi):
         self.verify = verify_ssl_cert
         self.auth = auth
 
+    def set_pool_size(self, size):
+        """
+        Keeps up to size connections open to each host, so that the session can make
+        as many requests at the same time from multiple threads.
+        """
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
     def request(self, method, url, **kwargs):
         # Override to set default arguments and track time taken with requests
         kwargs = self._set_defaults(**kwargs)
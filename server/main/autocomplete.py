@@ -7,7 +7,9 @@ from functools import reduce
 
 from django.conf import settings
 from django.contrib.auth.models import Group
-from django.db.models import Q
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Max, Q
+from django.db.models.functions import Greatest
 from django.http import JsonResponse
 from rest_framework.exceptions import ValidationError
 
@@ -16,12 +18,100 @@ from jbei.rest.clients.ice import IceApi
 
 from . import models as edd_models
 from . import solr
+from .redis import ScratchCache
 
 DEFAULT_RESULT_COUNT = 20
 
 logger = logging.getLogger(__name__)
 
 
+class TrigramSearch(object):
+    """
+    Autocomplete backend using trigram indexes from the PostgreSQL pg_trgm extension.
+    Items match when a field contains the term, or is similar to the term, and the most
+    similar items come first. Both kinds of match use a GIN trigram index on the field,
+    where a regex search on a B-tree indexed field scans the whole table. The results
+    of a term are remembered for a short while, as the same terms repeat while typing.
+    """
+
+    def __init__(self, *fields, cache_length=None):
+        """
+        :param fields: names of the fields searched; each should have a trigram index
+        :param cache_length: (optional) number of seconds to remember results of a
+            term; defaults to the EDD_AUTOCOMPLETE_CACHE_LENGTH setting, or 30
+        """
+        self.fields = fields
+        if cache_length is None:
+            cache_length = getattr(settings, "EDD_AUTOCOMPLETE_CACHE_LENGTH", 30)
+        self.cache_length = cache_length
+
+    def search(self, queryset, term, key=None, ordering=None):
+        """
+        Searches a queryset for items matching a term.
+
+        :param queryset: the queryset of model objects to search
+        :param term: the search term
+        :param key: (optional) name for results of this queryset in the cache; every
+            queryset using the same key must find the same items, e.g. a queryset
+            limited to lines of a study has the study in the key. Results are not
+            cached without a key.
+        :param ordering: (optional) fields used to order results instead of similarity
+        :returns: a list of up to DEFAULT_RESULT_COUNT matching objects
+        """
+        cache = self._cache() if key and self.cache_length else None
+        # matches ignore case, so do the names of cached results
+        name = f"{key}:{term.lower()}"
+        ids = None if cache is None else cache.load(name)
+        if ids is None:
+            ids = self._find(queryset, term)
+            if cache is not None:
+                cache.save(ids, name=name, expires=self.cache_length)
+        found = queryset.filter(pk__in=ids)
+        if ordering:
+            return list(found.order_by(*ordering))
+        found = found.in_bulk()
+        return [found[pk] for pk in ids if pk in found]
+
+    def _find(self, queryset, term):
+        first = self.fields[0]
+        if not term:
+            found = queryset.order_by(first).values_list("pk", flat=True)
+            return list(found.distinct()[:DEFAULT_RESULT_COUNT])
+        re_term = re.escape(term)
+        term_filters = [
+            Q(**{f"{field}__iregex": re_term})
+            | Q(**{f"{field}__trigram_similar": term})
+            for field in self.fields
+        ]
+        similarity = [TrigramSimilarity(field, term) for field in self.fields]
+        rank = Greatest(*similarity) if len(similarity) > 1 else similarity[0]
+        # fields across a relation may repeat items; group to find each item once
+        found = (
+            queryset.filter(reduce(operator.or_, term_filters, Q()))
+            .values("pk", first)
+            .annotate(_rank=Max(rank))
+            .order_by("-_rank", first)
+        )
+        return [row["pk"] for row in found[:DEFAULT_RESULT_COUNT]]
+
+    def _cache(self):
+        return ScratchCache(
+            f"{__name__}.{self.__class__.__name__}", "autocomplete results"
+        )
+
+
+# models searched by search_generic() with trigram indexes; others use regex searches
+AUTOCOMPLETE_TRIGRAM_LOOKUP = {
+    "CarbonSource": TrigramSearch("name"),
+    "GeneIdentifier": TrigramSearch("type_name"),
+    "MeasurementType": TrigramSearch("type_name", "short_name"),
+    "Metabolite": TrigramSearch("type_name", "short_name"),
+    "Phosphor": TrigramSearch("type_name"),
+    "Protocol": TrigramSearch("name"),
+    "ProteinIdentifier": TrigramSearch("type_name"),
+}
+
+
 def search_compartment(request):
     """ Autocomplete for measurement compartments; e.g. intracellular """
     # this list is short, always just return the entire thing instead of searching
@@ -52,6 +142,10 @@ def search_generic(request, model_name, module=edd_models):
             {"error": "Unknown search model %s" % model_name}, status=400
         )
     term = request.GET.get("term", "")
+    backend = AUTOCOMPLETE_TRIGRAM_LOOKUP.get(model_name, None)
+    if module is edd_models and backend is not None:
+        found = backend.search(Model.objects.all(), term, key=model_name)
+        return JsonResponse({"rows": [item.to_json() for item in found]})
     re_term = re.escape(term)
     term_filters = [Q(**{"%s__iregex" % f: re_term}) for f in ifields]
     found = Model.objects.filter(reduce(operator.or_, term_filters, Q()))[
@@ -63,13 +157,12 @@ def search_generic(request, model_name, module=edd_models):
 def search_group(request):
     """ Autocomplete for Groups of users. """
     term = request.GET.get("term", "")
-    re_term = re.escape(term)
-    found = (
-        Group.objects.filter(name__iregex=re_term).order_by("name").values("id", "name")
+    found = TrigramSearch("name").search(
+        Group.objects.all(), term, key="Group", ordering=sort_fields(request)
+    )
+    return JsonResponse(
+        {"rows": [{"id": item.id, "name": item.name} for item in found]}
     )
-    found = optional_sort(request, found)
-    found = found[:DEFAULT_RESULT_COUNT]
-    return JsonResponse({"rows": list(found)})  # force QuerySet to list
 
 
 def search_metaboliteish(request):
@@ -97,34 +190,27 @@ def search_metadata(request, context):
         'Line', and 'Study'. If none of these contexts are provided, then all metadata types
         are searched. """
     term = request.GET.get("term", "")
-    re_term = re.escape(term)
-
-    term_filters = [Q(type_name__iregex=re_term), Q(group__group_name__iregex=re_term)]
-
     # if requested, filter out metadata types that reference a field on the model object
     type_filter = AUTOCOMPLETE_METADATA_LOOKUP.get(context, Q())
-    q_filter = reduce(operator.or_, term_filters, Q()) & type_filter
-    found_qs = edd_models.MetadataType.objects.filter(q_filter).select_related("group")
-    found_qs = optional_sort(request, found_qs)
-
-    return JsonResponse(
-        {"rows": [item.to_json() for item in found_qs[:DEFAULT_RESULT_COUNT]]}
+    queryset = edd_models.MetadataType.objects.filter(type_filter)
+    found = TrigramSearch("type_name", "group__group_name").search(
+        queryset.select_related("group"),
+        term,
+        key=f"MetadataType:{context}",
+        ordering=sort_fields(request),
     )
+    return JsonResponse({"rows": [item.to_json() for item in found]})
 
 
-def optional_sort(request, queryset):
+def sort_fields(request):
     sort_field = request.GET.get("sort", None)
-
-    if not sort_field:
-        return queryset
-
-    return queryset.order_by(sort_field)
+    return [sort_field] if sort_field else None
 
 
 def search_study_lines(request):
     """ Autocomplete search on lines in a study."""
     study_pk = request.GET.get("study", "")
-    name_regex = re.escape(request.GET.get("term", ""))
+    term = request.GET.get("term", "")
     active_param = request.GET.get("active", None)
     active_value = "true" == active_param if active_param in ("true", "false") else None
     active = edd_models.common.qfilter(value=active_value, fields=["active"])
@@ -151,14 +237,17 @@ def search_study_lines(request):
     # if study doesn't exist or requesting user doesn't have read access, return an empty
     # set of lines
     except edd_models.Study.DoesNotExist:
-        query = edd_models.Line.objects.none()
+        return JsonResponse({"rows": []})
 
-    query = query.filter(
-        Q(name__iregex=name_regex) | Q(strains__name__iregex=name_regex)
+    found = TrigramSearch("name", "strains__name").search(
+        query,
+        term,
+        key=f"StudyLine:{study.pk}:{active_value}",
+        ordering=sort_fields(request),
+    )
+    return JsonResponse(
+        {"rows": [{"name": item.name, "id": item.id} for item in found]}
     )
-    query = optional_sort(request, query)
-    query = query.values("name", "id")[:DEFAULT_RESULT_COUNT]
-    return JsonResponse({"rows": list(query)})
 
 
 def search_sbml_exchange(request):
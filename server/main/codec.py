@@ -0,0 +1,87 @@
+# coding: utf-8
+"""
+Codecs converting data to and from the bytes kept in Redis by main.redis.ScratchStorage.
+Values written before a codec was in use are JSON text, so every codec falls back to
+reading JSON from values it did not encode.
+"""
+
+import json
+import logging
+import zlib
+
+from django.conf import settings
+
+from edd.utilities import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+
+class JSONCodec(object):
+    """ Encodes data as JSON text. """
+
+    name = "json"
+
+    def decode(self, value):
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return json.loads(value)
+
+    def encode(self, data):
+        return json.dumps(data, cls=JSONEncoder).encode("utf-8")
+
+
+class MsgpackCodec(JSONCodec):
+    """
+    Encodes data as zlib-compressed MessagePack. Encoded values start with a prefix
+    that cannot begin JSON text, so values without the prefix are decoded as JSON.
+    """
+
+    name = "msgpack"
+    prefix = b"\x00mz"
+
+    def __init__(self, level=1):
+        """
+        :param level: zlib compression level; the default 1 favors speed over size
+        """
+        # delay loading msgpack; it is an optional dependency
+        import msgpack
+
+        self._msgpack = msgpack
+        self.level = level
+
+    def decode(self, value):
+        if not value.startswith(self.prefix):
+            return super().decode(value)
+        packed = zlib.decompress(value[len(self.prefix) :])
+        return self._msgpack.unpackb(packed, raw=False, strict_map_key=False)
+
+    def encode(self, data):
+        packed = self._msgpack.packb(data, use_bin_type=True, default=self._default)
+        return self.prefix + zlib.compress(packed, self.level)
+
+    def _default(self, obj):
+        # types without a MessagePack equivalent (Decimal, UUID, datetime, ...) get the
+        # same treatment as they would in JSON
+        return JSONEncoder().default(obj)
+
+
+codecs = {codec.name: codec for codec in (JSONCodec, MsgpackCodec)}
+
+
+def get_codec(name=None):
+    """
+    Creates a codec.
+
+    :param name: (optional) name of the codec; defaults to the EDD_PAGE_CODEC setting,
+        or "msgpack"
+    :returns: the codec, or a JSONCodec when the requested codec is not available
+    """
+    if name is None:
+        name = getattr(settings, "EDD_PAGE_CODEC", MsgpackCodec.name)
+    try:
+        return codecs[name]()
+    except KeyError:
+        logger.warning(f"Unknown page codec {name}, using JSON")
+    except ImportError as e:
+        logger.warning(f"Page codec {name} is not available, using JSON: {e}")
+    return JSONCodec()
@@ -2,7 +2,9 @@
 from __future__ import absolute_import, unicode_literals
 
 import logging
+import zlib
 
+from django.conf import settings
 from django.http import QueryDict
 
 from main.redis import ScratchStorage
@@ -24,6 +26,9 @@ class ExportBroker(object):
     def _export_name(self, task_id):
         return f"{self.user}:{task_id}"
 
+    def _format_name(self, task_id):
+        return f"{self._export_name(task_id)}:format"
+
     def _name_name(self, task_id):
         return f"{self._export_name(task_id)}:name"
 
@@ -31,9 +36,25 @@ class ExportBroker(object):
         self.storage.delete(path)
 
     def load_export(self, task_id):
+        """
+        Loads a saved export.
+
+        :param task_id: the ID of the task saving the export
+        :returns: a generator of the export content, in chunks of bytes
+        """
         # convert names into storage keys first
         key = self._export_name(task_id)
-        return self.storage.load(key)
+        for page in self.storage.load_pages(key):
+            yield zlib.decompress(page)
+
+    def load_export_format(self, task_id):
+        """
+        Loads the file extension of a saved export; exports saved without a format
+        are CSV.
+        """
+        key = self._format_name(task_id)
+        extension = self.storage.load(key)
+        return extension.decode("utf-8") if extension else "csv"
 
     def load_export_name(self, task_id):
         # convert names into storage keys first
@@ -44,8 +65,37 @@ class ExportBroker(object):
         return QueryDict(self.storage.load(path))
 
     def save_export(self, task_id, name, export):
-        self.storage.save(export.output(), name=self._export_name(task_id))
+        """
+        Saves the output of an export as a list of compressed pages, so that neither
+        the worker building the export nor Redis need to hold the whole export as a
+        single value.
+
+        :param task_id: the ID of the task saving the export
+        :param name: a display name for the export
+        :param export: object with a stream() method generating export text or bytes,
+            and an extension attribute naming the file format
+        """
+        key = self._export_name(task_id)
+        page_size = getattr(settings, "EDD_EXPORT_PAGE_SIZE", 1024 * 1024)
+        buffer = []
+        buffered = 0
+        for chunk in export.stream():
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= page_size:
+                self._save_page(key, buffer)
+                buffer = []
+                buffered = 0
+        # always save a final page, so even empty exports have something to load
+        self._save_page(key, buffer)
         self.storage.save(name, name=self._name_name(task_id))
+        self.storage.save(export.extension, name=self._format_name(task_id))
+
+    def _save_page(self, key, chunks):
+        page = b"".join(chunks)
+        self.storage.append(zlib.compress(page), name=key)
 
     def save_params(self, payload):
         return self.storage.save(payload.urlencode())
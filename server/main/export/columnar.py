@@ -0,0 +1,187 @@
+# coding: utf-8
+"""
+Exports of measurement data in a columnar format (Apache Parquet), for analysis tools
+that can read typed columns much faster than parsing CSV text.
+"""
+
+import logging
+from itertools import chain
+
+from django.conf import settings
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+
+def columnar_available():
+    """ Checks if the optional pyarrow dependency needed for columnar exports exists. """
+    try:
+        import pyarrow  # noqa: F401
+        from pyarrow import parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ChunkSink(object):
+    """
+    Minimal writable file-like object collecting bytes written to it, so that output
+    can be handed off in chunks while a writer is still open.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        """ Returns all bytes written since the last call to drain(). """
+        chunks, self._chunks = self._chunks, []
+        return b"".join(chunks)
+
+    def flush(self):
+        pass
+
+    def tell(self):
+        return self._position
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+
+class ColumnarExport(object):
+    """
+    Outputs measurement values as a Parquet file, with one row per value. Rows are read
+    from a server-side cursor and written in batches, each batch becoming a row group
+    in the output. Points of packed series follow the MeasurementValue rows.
+    """
+
+    content_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    # output column name, queryset lookup, and pyarrow type name for each column
+    columns = [
+        ("study_id", "study_id", "int64"),
+        ("study_name", "study__name", "string"),
+        ("line_id", "measurement__assay__line_id", "int64"),
+        ("line_name", "measurement__assay__line__name", "string"),
+        ("protocol_id", "measurement__assay__protocol_id", "int64"),
+        ("protocol_name", "measurement__assay__protocol__name", "string"),
+        ("assay_id", "measurement__assay_id", "int64"),
+        ("assay_name", "measurement__assay__name", "string"),
+        ("measurement_id", "measurement_id", "int64"),
+        ("type_id", "measurement__measurement_type_id", "int64"),
+        ("type_name", "measurement__measurement_type__type_name", "string"),
+        ("compartment", "measurement__compartment", "string"),
+        ("x_units", "measurement__x_units__unit_name", "string"),
+        ("y_units", "measurement__y_units__unit_name", "string"),
+        ("x", "x", "list<float64>"),
+        ("y", "y", "list<float64>"),
+    ]
+
+    def __init__(self, queryset, packed=None, batch_size=None):
+        """
+        :param queryset: a QuerySet of main.models.MeasurementValue to export
+        :param packed: (optional) a QuerySet of main.models.PackedSeries to export
+        :param batch_size: (optional) number of rows per batch / row group; defaults
+            to the EDD_EXPORT_COLUMNAR_BATCH setting, or 10000
+        """
+        self.queryset = queryset
+        self.packed = packed
+        if batch_size is None:
+            batch_size = getattr(settings, "EDD_EXPORT_COLUMNAR_BATCH", 10000)
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_selection(cls, selection, **kwargs):
+        """ Creates a ColumnarExport for the values of an ExportSelection. """
+        measures = selection.measurements.order_by().values("pk")
+        queryset = models.MeasurementValue.objects.filter(
+            measurement__in=measures
+        ).order_by("measurement__assay__protocol_id", "measurement_id", "x")
+        packed = models.PackedSeries.objects.filter(measurement__in=measures).order_by(
+            "measurement__assay__protocol_id", "measurement_id"
+        )
+        return cls(queryset, packed=packed, **kwargs)
+
+    def output(self):
+        """ Builds the complete Parquet file output. """
+        return b"".join(self.stream())
+
+    def schema(self):
+        """ Creates the pyarrow schema for the export columns. """
+        import pyarrow
+
+        types = {
+            "int64": pyarrow.int64(),
+            "string": pyarrow.string(),
+            "list<float64>": pyarrow.list_(pyarrow.float64()),
+        }
+        return pyarrow.schema(
+            [pyarrow.field(name, types[kind]) for name, _, kind in self.columns]
+        )
+
+    def stream(self):
+        """
+        Generates the Parquet file output in chunks of bytes, one chunk per batch of
+        rows, plus a final chunk with the file footer.
+        """
+        # delay loading pyarrow; it is an optional dependency
+        import pyarrow
+        from pyarrow import parquet
+
+        schema = self.schema()
+        sink = ChunkSink()
+        writer = parquet.ParquetWriter(sink, schema)
+        try:
+            for batch in self._batches():
+                names = [name for name, _, _ in self.columns]
+                data = dict(zip(names, batch))
+                writer.write_batch(pyarrow.RecordBatch.from_pydict(data, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    def _batches(self):
+        # converts rows from cursor into lists of column values, batch_size rows at a time
+        lookups = [lookup for _, lookup, _ in self.columns]
+        converters = [self._converter(kind) for _, _, kind in self.columns]
+        rows = self.queryset.values_list(*lookups).iterator(chunk_size=self.batch_size)
+        if self.packed is not None:
+            rows = chain(rows, self._packed_rows(lookups))
+        batch = [[] for _ in self.columns]
+        count = 0
+        for row in rows:
+            for column, convert, value in zip(batch, converters, row):
+                column.append(convert(value))
+            count += 1
+            if count >= self.batch_size:
+                yield batch
+                batch = [[] for _ in self.columns]
+                count = 0
+        if count:
+            yield batch
+
+    def _packed_rows(self, lookups):
+        # packed series have the same lookups; x and y are last, with a row per point
+        series = self.packed.values_list(*lookups).iterator(chunk_size=self.batch_size)
+        for row in series:
+            for x, y in zip(row[-2], row[-1]):
+                yield row[:-2] + ([x], [] if y is None else [y])
+
+    def _converter(self, kind):
+        # database returns Decimal values in arrays; convert to float for pyarrow
+        if kind == "list<float64>":
+            return lambda value: None if value is None else [float(v) for v in value]
+        return lambda value: value
@@ -9,7 +9,7 @@ from django.http import QueryDict
 from django.utils.translation import ugettext_lazy as _
 
 from .. import models
-from . import table
+from . import columnar, table
 
 logger = logging.getLogger(__name__)
 
@@ -259,6 +259,12 @@ class ExportOptionForm(forms.Form):
         label=_("Field separators"),
         required=False,
     )
+    file_format = forms.ChoiceField(
+        choices=table.ExportOption.FILE_FORMAT_CHOICE,
+        initial=table.ExportOption.CSV_FILE,
+        label=_("File format"),
+        required=False,
+    )
     data_format = forms.ChoiceField(
         choices=table.ExportOption.FORMAT_CHOICE,
         label=_("Include measurement data"),
@@ -313,6 +319,12 @@ class ExportOptionForm(forms.Form):
         super().__init__(*args, **kwargs)
         self._options = None
         self._init_options()
+        if not columnar.columnar_available():
+            self.fields["file_format"].choices = [
+                choice
+                for choice in table.ExportOption.FILE_FORMAT_CHOICE
+                if choice[0] != table.ExportOption.PARQUET_FILE
+            ]
 
     @classmethod
     def initial_from_user_settings(cls, user):
@@ -356,6 +368,7 @@ class ExportOptionForm(forms.Form):
             line_section=data.get("line_section", False),
             protocol_section=data.get("protocol_section", False),
             columns=columns,
+            file_format=data.get("file_format") or table.ExportOption.CSV_FILE,
         )
         return data
 
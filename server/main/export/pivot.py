@@ -0,0 +1,95 @@
+# coding: utf-8
+"""
+Pivots measurement values into wide tables, with one column per x value. Alignment of
+values to columns is done with NumPy on blocks of rows, instead of looking up every
+x value of a table in every row.
+"""
+
+import logging
+from itertools import chain, repeat
+
+logger = logging.getLogger(__name__)
+
+
+class ValuePivot(object):
+    """
+    Collects (row, x, y) triples for a block of rows, then aligns the y values to
+    the columns of a sorted list of scalar x values in one vectorized pass.
+    """
+
+    def __init__(self, all_x):
+        """
+        :param all_x: sorted sequence of numeric x values, one per column
+        """
+        # delay loading numpy, same as in main.utilities.interpolate_at
+        import numpy
+
+        self._numpy = numpy
+        self.x = numpy.array(all_x, dtype=float)
+        self.clear()
+
+    def __len__(self):
+        return self._count
+
+    def add(self, xs, ys):
+        """
+        Adds a row of values to the pivot.
+
+        :param xs: sequence of x values for the row; each item is a one-item list,
+            and a row without any values has [None] or None
+        :param ys: sequence of y values, in the same order as xs; each item is a
+            list of any length
+        """
+        row = self._count
+        self._count += 1
+        # measurements without values aggregate to a single null
+        if not xs or xs[0] is None:
+            return
+        start = len(self._y)
+        self._rows.extend(repeat(row, len(xs)))
+        self._x.extend(chain.from_iterable(xs))
+        if list(map(len, ys)).count(1) == len(ys):
+            self._y.extend(chain.from_iterable(ys))
+            return
+        for index, y in enumerate(ys, start):
+            if len(y) == 1:
+                self._y.append(y[0])
+            else:
+                # non-scalar y gets formatted as text, replacing a NaN placeholder
+                self._text[index] = ":".join(map(str, map(float, y)))
+                self._y.append(float("nan"))
+
+    def clear(self):
+        """ Drops all collected rows. """
+        self._count = 0
+        self._rows = []
+        self._x = []
+        self._y = []
+        self._text = {}
+
+    def pivot(self):
+        """
+        Creates lists of y value strings aligned to the x columns, one list for each
+        row added since the last call to pivot() or clear(). Cells without a value
+        are empty strings.
+        """
+        numpy = self._numpy
+        width = len(self.x)
+        # grid has index into cell text for each position; the last text is empty
+        grid = numpy.full((self._count, width), len(self._y), dtype=numpy.intp)
+        if self._rows and width:
+            rows = numpy.array(self._rows, dtype=numpy.intp)
+            xs = numpy.array(self._x, dtype=float)
+            cols = numpy.searchsorted(self.x, xs)
+            # only keep values with an exact match in the columns
+            found = cols < width
+            found[found] = self.x[cols[found]] == xs[found]
+            grid[rows[found], cols[found]] = numpy.flatnonzero(found)
+        # cast to float to remove 0-padding, same as main.export.table.value_str
+        cells = list(map(str, map(float, self._y)))
+        for index, text in self._text.items():
+            cells[index] = text
+        cells.append("")
+        result = numpy.array(cells, dtype=object)[grid].tolist()
+        self.clear()
+        return result
@@ -336,7 +336,7 @@ class SbmlExport(object):
         """
         # TODO: change to .order_by('x__0') once Django supports ordering on transform
         # https://code.djangoproject.com/ticket/24747
-        values_qs = models.MeasurementValue.objects.filter(x__len=1, y__len=1).order_by(
+        values_qs = models.MeasurementPoint.objects.filter(x__len=1, y__len=1).order_by(
             "x"
         )
         return (
@@ -344,9 +344,7 @@ class SbmlExport(object):
                 measurement_format=models.Measurement.Format.SCALAR
             )
             .select_related("assay__line")
-            .prefetch_related(
-                Prefetch("measurementvalue_set", queryset=values_qs, to_attr="values")
-            )
+            .prefetch_related(Prefetch("points", queryset=values_qs, to_attr="values"))
         )
 
     def output(self, time, matches):
@@ -504,7 +502,7 @@ class SbmlExport(object):
         for mlist in self._measures.values():
             for m in mlist:
                 if m.is_carbon_ratio():
-                    points = models.MeasurementValue.objects.filter(
+                    points = models.MeasurementPoint.objects.filter(
                         measurement=m, x__0=time
                     )
                     if points.exists():
@@ -538,7 +536,7 @@ class SbmlExport(object):
             reaction_note_body = builder.create_note_body()
         notes = builder.parse_note_body(reaction_note_body)
         for name in builder.read_note_associations(notes):
-            values = models.MeasurementValue.objects.filter(
+            values = models.MeasurementPoint.objects.filter(
                 measurement__in=self._omics.get(name, []), x__0=time
             ).select_related("measurement__measurement_type")
             for v in values:
@@ -556,10 +554,10 @@ class SbmlExport(object):
 
     def _update_range_bounds(self, measurements, interpolate):
         measurement_qs = models.Measurement.objects.filter(pk__in=measurements)
-        values_qs = models.MeasurementValue.objects.filter(x__len=1).order_by("x")
+        values_qs = models.MeasurementPoint.objects.filter(x__len=1).order_by("x")
         # capture lower/upper bounds of t values for all measurements
         trange = measurement_qs.aggregate(
-            max_t=Max("measurementvalue__x"), min_t=Min("measurementvalue__x")
+            max_t=Max("points__x"), min_t=Min("points__x")
         )
         if trange["max_t"]:
             self._max = min(trange["max_t"][0], self._max or sys.maxsize)
@@ -568,9 +566,7 @@ class SbmlExport(object):
         # iff no interpolation, capture intersection of t values bounded by max & min
         m_inter = measurement_qs.exclude(
             assay__protocol__in=interpolate
-        ).prefetch_related(
-            Prefetch("measurementvalue_set", queryset=values_qs, to_attr="values")
-        )
+        ).prefetch_related(Prefetch("points", queryset=values_qs, to_attr="values"))
         for m in m_inter:
             points = {p.x[0] for p in m.values if self._min <= p.x[0] <= self._max}
             if self._points is None:
@@ -677,7 +673,7 @@ class SbmlExport(object):
                 # TODO: change to .order_by('x__0') once Django supports ordering on transform
                 # https://code.djangoproject.com/ticket/24747
                 values = list(
-                    models.MeasurementValue.objects.filter(measurement__in=measurements)
+                    models.MeasurementPoint.objects.filter(measurement__in=measurements)
                     .select_related("measurement__y_units")
                     .order_by("x")
                 )
@@ -796,7 +792,7 @@ class SbmlExportMeasurementsForm(SbmlForm):
                 "y_units",
                 "measurement_type",
             )
-            .prefetch_related("measurementvalue_set")
+            .prefetch_related("points")
         )
         if qfilter is not None:
             f.queryset = f.queryset.filter(qfilter)
@@ -860,9 +856,7 @@ class SbmlExportMeasurementsForm(SbmlForm):
     def x_range(self):
         """Returns the bounding range of X-values used for all Measurements in the form."""
         f = self.fields["measurement"]
-        x_range = f.queryset.aggregate(
-            max=Max("measurementvalue__x"), min=Min("measurementvalue__x")
-        )
+        x_range = f.queryset.aggregate(max=Max("points__x"), min=Min("points__x"))
         # can potentially get None if there are no values; use __getitem__ default AND `or [0]`
         x_max = x_range.get("max", [0]) or [0]
         x_min = x_range.get("min", [0]) or [0]
@@ -981,7 +975,7 @@ class SbmlExportOdForm(SbmlExportMeasurementsForm):
         for line in self._clean_collect_data_lines(data.values()):
             count = 0
             for m in self._measures_by_line[line.pk]:
-                count += len(m.measurementvalue_set.all())
+                count += len(m.points.all())
                 if count > 1:
                     break
             if count < 2:
@@ -4,13 +4,15 @@ import logging
 import operator
 from collections import OrderedDict
 from functools import reduce
-from itertools import islice
+from heapq import merge
+from itertools import chain, islice
 
 from django.contrib.postgres.aggregates import ArrayAgg, JSONBAgg
-from django.db.models import Prefetch, Q
+from django.db.models import F, Prefetch, Q
 from django.utils.translation import ugettext_lazy as _
 
 from .. import models
+from .pivot import ValuePivot
 
 logger = logging.getLogger(__name__)
 
@@ -285,6 +287,12 @@ class ExportOption(object):
         (SUMMARY_DATA, _("Summarize")),
         (NONE_DATA, _("None")),
     )
+    CSV_FILE = "csv"
+    PARQUET_FILE = "parquet"
+    FILE_FORMAT_CHOICE = (
+        (CSV_FILE, _("Text table (CSV)")),
+        (PARQUET_FILE, _("Columnar data of points (Parquet)")),
+    )
 
     def __init__(
         self,
@@ -296,6 +304,7 @@ class ExportOption(object):
         columns=None,
         blank_columns=None,
         blank_mod=0,
+        file_format=CSV_FILE,
     ):
         self.layout = layout
         self.separator = separator
@@ -305,6 +314,7 @@ class ExportOption(object):
         self.columns = columns if columns is not None else []
         self.blank_columns = blank_columns if blank_columns is not None else []
         self.blank_mod = blank_mod
+        self.file_format = file_format
 
     @classmethod
     def coerce_separator(cls, value):
@@ -344,6 +354,11 @@ class CellQuote(object):
 class TableExport(object):
     """ Outputs tables for export of EDD objects. """
 
+    content_type = "text/csv"
+    extension = "csv"
+    # number of measurements fetched per round-trip to the server-side cursor
+    chunk_size = 100
+
     def __init__(self, selection, options, worklist=None):
         self.selection = selection
         self.options = options
@@ -352,17 +367,24 @@ class TableExport(object):
 
     def output(self):
         """ Builds the CSV of the table export output. """
-        # store tables; protocol PK keys table for measurements under a protocol, 'line' keys table
-        #   for line-only section (if enabled), 'all' keys table including everything.
-        tables = OrderedDict()
+        return "".join(self.stream())
+
+    def stream(self):
+        """
+        Generates the CSV of the table export output in pieces, one row at a time.
+        Joining all the pieces gives the same text as output(). Measurements are
+        read through a server-side cursor, so memory use stays flat as the number
+        of exported points grows.
+        """
+        tables = []
         if self.options.line_section:
-            tables["line"] = OrderedDict()
-            tables["line"]["header"] = self._output_line_header()
-        if not self.options.protocol_section:
-            tables["all"] = OrderedDict()
-            tables["all"]["header"] = self._output_header()
-        self._do_export(tables)
-        return self._build_output(tables)
+            tables.append(self._stream_line_table())
+        if self.options.protocol_section:
+            tables.extend(self._stream_protocol_tables())
+        else:
+            header = self._output_header(self._measure_models())
+            tables.append(self._stream_table(header, self.selection.measurements))
+        return self._join_tables(tables)
 
     def _build_output(self, tables):
         layout = self.options.layout
@@ -406,9 +428,26 @@ class TableExport(object):
             out.append(row_separator.join(rows))
         return table_separator.join(out)
 
-    def _do_export(self, tables):
-        # add data from each exported measurement; already sorted by protocol
-        measures = self.selection.measurements.select_related(
+    def _join_tables(self, tables):
+        """
+        Joins the rows of tables into CSV text, yielding one row of text at a time.
+
+        :param tables: iterable of tables, each an iterable of rows of cell values
+        """
+        cell_separator = self.options.separator
+        cell_format = CellQuote(separator_string=cell_separator)
+        table_prefix = ""
+        for table in tables:
+            prefix = table_prefix
+            for row in table:
+                cells = map(cell_format.quote, map(str, row))
+                yield prefix + cell_separator.join(cells)
+                prefix = "\n"
+            table_prefix = "\n\n"
+
+    def _measures(self, queryset, with_values=True):
+        """ Adds related objects and aggregated values needed for export rows. """
+        queryset = queryset.select_related(
             # add proteinidentifier so export does not repeatedly query for protein-specific stuff
             "measurement_type__proteinidentifier",
             "x_units",
@@ -424,67 +463,187 @@ class TableExport(object):
             # eliminate some subqueries and/or repeated queries by collecting values in arrays
             strain_names=ArrayAgg("assay__line__strains__name", distinct=True),
             cs_names=ArrayAgg("assay__line__carbon_source__name", distinct=True),
-            vids=ArrayAgg("measurementvalue"),
-            # aggregating arrays instead of values, use JSONB
-            vxs=JSONBAgg("measurementvalue__x"),
-            vys=JSONBAgg("measurementvalue__y"),
         )
+        if with_values:
+            queryset = queryset.annotate(
+                vids=ArrayAgg("measurementvalue"),
+                # aggregating arrays instead of values, use JSONB
+                vxs=JSONBAgg("measurementvalue__x"),
+                vys=JSONBAgg("measurementvalue__y"),
+                packed_x=F("packed__x"),
+                packed_y=F("packed__y"),
+            )
+            return map(
+                self._add_packed_values, queryset.iterator(chunk_size=self.chunk_size)
+            )
+        return queryset.iterator(chunk_size=self.chunk_size)
+
+    def _add_packed_values(self, measurement):
+        # points of a PackedSeries are added to the values aggregated from rows
+        if measurement.packed_x:
+            if measurement.vids == [None]:
+                # a measurement without value rows aggregates to a single null
+                measurement.vids, measurement.vxs, measurement.vys = [], [], []
+            for x, y in zip(measurement.packed_x, measurement.packed_y):
+                measurement.vids.append(None)
+                measurement.vxs.append([x])
+                measurement.vys.append([] if y is None else [y])
+        return measurement
+
+    def _measure_models(self):
+        # with a line section, measurement tables leave out the line columns
+        if self.options.line_section:
+            return [models.Assay, models.Measurement, models.Protocol]
+        return None
+
+    def _measure_values(self, measurement):
+        # sorted list of (id, x, y) for values aggregated on the measurement
+        values = zip(measurement.vids, measurement.vxs, measurement.vys)
+        # a measurement without values aggregates to a single row of nulls; points
+        #   from a PackedSeries have no ID, but always have x
+        values = (v for v in values if v[1] is not None)
+        return sorted(values, key=lambda a: a[1][0] if a[1] else 0)
+
+    def _stream_line_rows(self):
+        # rows for each line, in order of first appearance in the measurements
+        seen = set()
+        line_only = [models.Line, models.Study]
+        measures = self._measures(self.selection.measurements, with_values=False)
         for measurement in measures:
-            assay = measurement.assay
-            protocol = assay.protocol
-            line = assay.line
-            if self.options.line_section:
-                line_only = [models.Line, models.Study]
-                other_only = [models.Assay, models.Measurement, models.Protocol]
-                # add row to line table w/ Study, Line columns only
-                if line.id not in tables["line"]:
-                    row = self._output_row_with_measure(measurement, models=line_only)
-                    tables["line"][line.id] = row
-                # create row for protocol/all table w/ Protocol, Assay, Measurement columns only
-                row = self._output_row_with_measure(measurement, models=other_only)
+            if measurement.assay.line_id not in seen:
+                seen.add(measurement.assay.line_id)
+                yield self._output_row_with_measure(measurement, models=line_only)
+
+    def _stream_line_table(self):
+        rows = chain([self._output_line_header()], self._stream_line_rows())
+        if self.options.layout == ExportOption.LINE_COLUMN_BY_DATA:
+            # number of lines is small enough to transpose in memory
+            rows = zip(*rows)
+        yield from rows
+
+    def _stream_protocol_tables(self):
+        measures = self.selection.measurements
+        protocol_ids = (
+            measures.order_by("assay__protocol_id")
+            .values_list("assay__protocol_id", flat=True)
+            .distinct()
+        )
+        header = self._output_header(self._measure_models())
+        for protocol_id in protocol_ids:
+            queryset = measures.filter(assay__protocol_id=protocol_id)
+            yield self._stream_table(header, queryset)
+
+    def _stream_table(self, header, queryset):
+        """
+        Generates the rows of a table for the measurements in a queryset, using the
+        layout set in export options.
+        """
+        layout = self.options.layout
+        row_models = self._measure_models()
+        if layout == ExportOption.DATA_COLUMN_BY_POINT:
+            yield header
+            for measurement in self._measures(queryset):
+                row = self._output_row_with_measure(measurement, models=row_models)
+                for _vid, x, y in self._measure_values(measurement):
+                    yield row + [value_str(x), value_str(y)]
+        elif layout == ExportOption.LINE_COLUMN_BY_DATA:
+            # each output row has a cell per measurement; collect rows of metadata
+            #   cells to transpose, then generate rows of values ordered by x
+            index = {}
+            columns = [header]
+            for measurement in self._measures(queryset, with_values=False):
+                index[measurement.pk] = len(index)
+                row = self._output_row_with_measure(measurement, models=row_models)
+                columns.append(row)
+            yield from zip(*columns)
+            yield from self._stream_transposed_values(queryset, index)
+        else:
+            found = self._table_x_values(queryset)
+            yield header + [key for key, x in found]
+            if all(len(x) == 1 for key, x in found):
+                yield from self._stream_pivot_rows(queryset, [x[0] for key, x in found])
             else:
-                # create row for protocol/all table
-                row = self._output_row_with_measure(measurement)
-            table, table_key = self._init_tables_for_protocol(tables, protocol)
-            values = sorted(
-                zip(measurement.vids, measurement.vxs, measurement.vys),
-                key=lambda a: a[1][0],
+                # multi-dimensional x values cannot align numerically; use the strings
+                all_x = [key for key, x in found]
+                for measurement in self._measures(queryset):
+                    row = self._output_row_with_measure(measurement, models=row_models)
+                    yield row + self._output_pivot(all_x, measurement)
+
+    def _stream_pivot_rows(self, queryset, all_x):
+        # generates rows with metadata cells, then a cell per x value in all_x;
+        #   values are aligned to columns one block of measurements at a time
+        pivot = ValuePivot(all_x)
+        row_models = self._measure_models()
+        rows = []
+        for measurement in self._measures(queryset):
+            rows.append(self._output_row_with_measure(measurement, models=row_models))
+            pivot.add(measurement.vxs, measurement.vys)
+            if len(rows) >= self.chunk_size:
+                yield from map(operator.add, rows, pivot.pivot())
+                rows = []
+        if rows:
+            yield from map(operator.add, rows, pivot.pivot())
+
+    def _stream_transposed_values(self, queryset, index):
+        # generates rows of values with the same x, with a cell per measurement
+        values = (
+            models.MeasurementValue.objects.filter(
+                measurement__in=queryset.order_by().values("pk")
             )
-            if self.options.layout == ExportOption.DATA_COLUMN_BY_POINT:
-                for value in values:
-                    arow = row[:]
-                    arow.append(value_str(value[1]))  # x-values
-                    arow.append(value_str(value[2]))  # y-values
-                    table[value[0]] = arow  # value IDs
-            else:
-                # keep track of all x values encountered in the table
-                xx = self._x_values[table_key] = self._x_values.get(table_key, {})
-                # do value_str to the float-casted version of x to eliminate 0-padding
-                xx.update({value_str(v[1]): v[1] for v in values})
-                squashed = {value_str(v[1]): value_str(v[2]) for v in values}
-                row.append(squashed)
-                table[measurement.id] = row
-
-    def _init_tables_for_protocol(self, tables, protocol):
-        if self.options.protocol_section:
-            if protocol.id not in tables:
-                tables[protocol.id] = OrderedDict()
-                header = []
-                if self.options.line_section:
-                    header += self._output_measure_header()
-                else:
-                    header += self._output_header()
-                tables[protocol.id]["header"] = header
-            table_key = protocol.id
-        else:
-            table_key = "all"
-        table = tables[table_key]
-        return (table, table_key)
+            .order_by("x")
+            .values_list("measurement_id", "x", "y")
+        )
+        packed = models.PackedSeries.objects.filter(
+            measurement__in=queryset.order_by().values("pk")
+        )
+        packed_values = sorted(
+            (
+                (series.measurement_id, x, y)
+                for series in packed.iterator()
+                for x, y in series.points()
+            ),
+            key=operator.itemgetter(1),
+        )
+        values = merge(
+            values.iterator(chunk_size=self.chunk_size),
+            packed_values,
+            key=operator.itemgetter(1),
+        )
+        current_x = None
+        row = None
+        for measurement_id, x, y in values:
+            x_str = value_str(x)
+            if x_str != current_x:
+                if row is not None:
+                    yield row
+                current_x = x_str
+                row = [x_str] + [""] * len(index)
+            row[index[measurement_id] + 1] = value_str(y)
+        if row is not None:
+            yield row
+
+    def _table_x_values(self, queryset):
+        # find all x values in the table, as (string, value) sorted by numeric values
+        values = (
+            models.MeasurementValue.objects.filter(
+                measurement__in=queryset.order_by().values("pk")
+            )
+            .values_list("x", flat=True)
+            .distinct()
+        )
+        packed = models.PackedSeries.objects.filter(
+            measurement__in=queryset.order_by().values("pk")
+        ).values_list("x", flat=True)
+        # do value_str to the float-casted version of x to eliminate 0-padding
+        found = {value_str(x): x for x in values.iterator()}
+        for xs in packed.iterator():
+            found.update((value_str([x]), [x]) for x in xs)
+        return sorted(found.items(), key=lambda a: a[1])
 
     def _output_header(self, models=None):
         row = []
         for column in self.options.columns:
-            if models is None or column._model in models:
+            if models is None or column.model in models:
                 row.append(column.heading)
         if self.options.layout == ExportOption.DATA_COLUMN_BY_POINT:
             row.append("X")
@@ -501,7 +660,7 @@ class TableExport(object):
         if columns is None:
             columns = self.options.columns
         for column in columns:
-            if models is None or column._model in models:
+            if models is None or column.model in models:
                 instance = column.convert_instance_from_line(line, protocol)
                 row.append(column.get_value(instance, **kwargs))
         return row
@@ -509,13 +668,18 @@ class TableExport(object):
     def _output_row_with_measure(self, measure, models=None):
         row = []
         for column in self.options.columns:
-            if models is None or column._model in models:
+            if models is None or column.model in models:
                 instance = column.convert_instance_from_measure(measure)
                 row.append(column.get_value(instance))
         return row
 
-    def _output_measure_header(self):
-        return self._output_header([models.Assay, models.Measurement, models.Protocol])
+    def _output_pivot(self, all_x, measurement):
+        # all_x is list of x value strings; returns y value strings aligned to all_x
+        squashed = {
+            value_str(x): value_str(y)
+            for _vid, x, y in self._measure_values(measurement)
+        }
+        return [squashed.get(x, "") for x in all_x]
 
     def _output_unsquash(self, all_x, squashed):
         # all_x is list of 2-tuple from dict.items()
@@ -532,6 +696,10 @@ class WorklistExport(TableExport):
         super().__init__(selection, options)
         self.worklist = worklist
 
+    def stream(self):
+        # worklists are small enough to build in one piece
+        yield self.output()
+
     def output(self):
         # store tables
         tables = OrderedDict()
@@ -26,6 +26,7 @@ from jbei.rest.auth import HmacAuth
 from jbei.rest.clients.ice import IceApi
 
 from . import models
+from .lines import edit_lines
 from .models import (
     Assay,
     Attachment,
@@ -623,6 +624,8 @@ class MetadataEditMixin(object):
         if meta is None:
             meta = {}
         updating, removing = self.process_metadata_inputs(meta)
+        # bulk edits apply removals to many objects, keep them around
+        self.metadata_removing = removing
         if self.is_editing():
             replacement = dict(self.instance.metadata)
             replacement.update(updating)
@@ -768,6 +771,33 @@ class LineForm(BulkEditMixin, MetadataEditMixin, forms.ModelForm):
             self.save_m2m()
         return line
 
+    def save_bulk(self, lines):
+        """
+        Applies the fields of a validated bulk edit form to many lines at once,
+        instead of validating and saving a form for each line.
+
+        :param lines: queryset of Lines to change
+        :returns: the number of lines changed
+        """
+        values = {}
+        relations = {}
+        for name in self.fields:
+            field = Line._meta.get_field(name)
+            if field.many_to_many:
+                relations[name] = self.cleaned_data[name]
+            elif name != "metadata":
+                values[name] = self.cleaned_data[name]
+        metadata = self.cleaned_data.get("metadata", None)
+        return edit_lines(
+            self._study,
+            lines,
+            values=values,
+            strains=relations.get("strains", None),
+            carbon_sources=relations.get("carbon_source", None),
+            metadata=metadata,
+            remove_metadata=getattr(self, "metadata_removing", None),
+        )
+
 
 class AssayForm(BulkEditMixin, MetadataEditMixin, forms.ModelForm):
     """ Form to create/edit an assay. """
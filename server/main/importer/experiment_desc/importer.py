@@ -6,6 +6,7 @@ import json
 import logging
 import traceback
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
 from pprint import pformat
 
@@ -17,9 +18,11 @@ from django.urls import reverse
 from django.utils.translation import ugettext as _
 from requests import codes
 
+from jbei.rest.clients.ice.api import Entry as IceEntry
 from jbei.rest.clients.ice.api import Strain as IceStrain
 from main.importer.parser import ImportFileTypeFlags
 from main.models import Assay, Line, Strain
+from main.redis import ScratchCache
 from main.tasks import create_ice_connection
 
 # avoiding loading a ton of names to the module by only loading the namespace to constants
@@ -252,6 +255,10 @@ class IcePartResolver(object):
     2) Use part UUID from ICE to locate a matching Strain (if any) in EDD's database
     3) Create a Strain in EDD's database for any not found in step 2
     4) Replace part numbers in the input with local EDD strain primary keys
+
+    Folders and parts are requested from ICE with a bounded number of concurrent
+    requests, and parts found in ICE are remembered for a short time, so that
+    re-submitting a corrected file does not query ICE again for the same parts.
     """
 
     def __init__(
@@ -301,6 +308,12 @@ class IcePartResolver(object):
         # folder entries found that passed filters
         self.total_filtered_entry_count = 0
 
+        # results of concurrent requests to ICE, waiting to be processed
+        self._prefetched_entries = {}
+        self._prefetched_folders = {}
+        self._entry_cache = None
+        self.workers = max(1, getattr(settings, "ICE_REQUEST_WORKERS", 4))
+
     def _validate_strain_info_abort(self):
         # return None to abort strain resolution; otherwise an ICE connection
 
@@ -408,6 +421,7 @@ class IcePartResolver(object):
             return
 
         ice.result_limit = getattr(settings, "ICE_FOLDER_SEARCH_PAGE_SIZE", 100)
+        ice.session.set_pool_size(self.workers)
 
         # query ICE for UUID's part numbers found in the input file
         # NOTE: important to preserve EDD's ability to function without ICE here, so we need some
@@ -587,6 +601,10 @@ class IcePartResolver(object):
         """
         self.individual_entries_found = 0
         part_ids = self.unique_part_ids
+        # skip parts already found in folders
+        remaining = [i for i in part_ids if i not in self.parts_by_ice_id]
+        self._entry_cache = self._entry_storage()
+        self._prefetched_entries = self._prefetch(ice, remaining, self._fetch_entry)
         return self._query_ice(ice, part_ids, self._query_ice_entry, "strain")
 
     def _query_ice_folder_contents(self, ice):
@@ -595,10 +613,83 @@ class IcePartResolver(object):
         any that weren't found.
         """
         folder_ids = self.unique_folder_ids
+        self._prefetched_folders = self._prefetch(ice, folder_ids, self._fetch_folder)
         return self._query_ice(
             ice, folder_ids, self._query_folder_contents, _ICE_FOLDERS
         )
 
+    def _prefetch(self, ice, resource_ids, fetch_function):
+        """
+        Runs requests to ICE for resources concurrently. Results are processed later,
+        one at a time and in input order, by the query functions of _query_ice().
+
+        :returns: a dict of resource ID to a tuple of (result, error)
+        """
+        prefetched = {}
+        if self.workers < 2 or len(resource_ids) < 2:
+            # nothing to gain from threads, query functions make the requests
+            return prefetched
+
+        def fetch(resource_id):
+            try:
+                return fetch_function(ice, resource_id), None
+            except Exception as e:
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(fetch, i): i for i in resource_ids}
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                result, error = future.result()
+                prefetched[futures[future]] = (result, error)
+                if error is not None:
+                    # errors are likely systemic; skip requests not yet started, the
+                    # query functions will make any requests still needed
+                    for pending in futures:
+                        pending.cancel()
+        return prefetched
+
+    def _take_prefetched(self, prefetched, ice, resource_id, fetch_function):
+        if resource_id not in prefetched:
+            return fetch_function(ice, resource_id)
+        result, error = prefetched.pop(resource_id)
+        if error is not None:
+            raise error
+        return result
+
+    def _entry_storage(self):
+        return ScratchCache(f"{__name__}.{self.__class__.__name__}", "ICE entries")
+
+    def _entry_cache_key(self, entry_id):
+        # ICE permissions differ per user, so results are only shared for the same user
+        return f"{self.importer.ice_username}:{entry_id}"
+
+    def _fetch_entry(self, ice, entry_id):
+        """
+        Finds the JSON of an ICE entry, first from recently found entries, then from ICE.
+        Runs in worker threads.
+        """
+        cache = self._entry_cache
+        key = self._entry_cache_key(entry_id)
+        json_dict = None if cache is None else cache.load(key)
+        if json_dict:
+            return json_dict
+        json_dict = ice.get_entry_json(entry_id, suppress_errors=True)
+        # only cache entries found, parts may be added to ICE after a failed attempt
+        if json_dict and cache is not None:
+            expires = getattr(settings, "ICE_ENTRY_CACHE_LENGTH", 60 * 10)
+            cache.save(json_dict, name=key, expires=expires)
+        return json_dict
+
+    def _fetch_folder(self, ice, folder_id):
+        """ Gets a folder and all its entries from ICE. Runs in worker threads. """
+        folder = ice.get_folder_entries(folder_id, sort="created")
+        if folder:
+            # read all pages of entries now, instead of on-demand
+            folder.entries = list(folder.entries)
+        return folder
+
     def _query_ice_entry(self, ice, entry_id):
         # check the cache first to see whether this part is already found, e.g. by inclusion in a
         # folder that's already been checked
@@ -606,7 +697,10 @@ class IcePartResolver(object):
         if entry:
             return entry
 
-        entry = ice.get_entry(entry_id, suppress_errors=True)
+        json_dict = self._take_prefetched(
+            self._prefetched_entries, ice, entry_id, self._fetch_entry
+        )
+        entry = IceEntry.of(json_dict, False) if json_dict else None
         if entry:
             self._process_entry(entry_id, entry)
             self.individual_entries_found += 1
@@ -647,7 +741,9 @@ class IcePartResolver(object):
         Queries ICE to get all entries in a single folder, filtering the returned entries if
         requested, then caches the results
         """
-        folder = ice.get_folder_entries(folder_id, sort="created")
+        folder = self._take_prefetched(
+            self._prefetched_folders, ice, folder_id, self._fetch_folder
+        )
         filtered_entries = []
         unfiltered_entry_count = 0
         self.total_filtered_entry_count = 0
@@ -1199,6 +1295,7 @@ class CombinatorialCreationImporter(object):
         created_lines_list, total_assay_count = self._create_lines_and_assays(
             line_def_inputs, options
         )
+        self.performance.end_study_populate(len(created_lines_list), total_assay_count)
 
         ###########################################################################################
         # Package up and return results
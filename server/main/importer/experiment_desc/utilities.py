@@ -6,9 +6,20 @@ import logging
 from collections import OrderedDict, Sequence, defaultdict
 
 from arrow import utcnow
+from django.conf import settings
+from django.db import connection
 from six import string_types
 
-from main.models import SYSTEM_META_TYPES, Assay, Line, MetadataType, Protocol, Strain
+from main.models import (
+    SYSTEM_META_TYPES,
+    Assay,
+    BulkUpdate,
+    Line,
+    MetadataType,
+    Protocol,
+    Strain,
+)
+from main.signals import lines_created
 
 from .constants import (
     BAD_GENERIC_INPUT_CATEGORY,
@@ -188,7 +199,9 @@ class NewLineAndAssayVisitor(object):
 class LineAndAssayCreationVisitor(NewLineAndAssayVisitor):
     """
     A NewLineAndAssayVisitor that's responsible for database I/O to create new Lines and Assays
-    for both the "generate lines" GUI or Experiment Description file upload.
+    for both the "generate lines" GUI or Experiment Description file upload. Lines, assays,
+    and their relations are collected and written with bulk inserts, one batch at a time;
+    call flush() after the last visit to write the final batch.
     """
 
     def __init__(
@@ -198,6 +211,7 @@ class LineAndAssayCreationVisitor(NewLineAndAssayVisitor):
         replicate_count,
         omit_all_strains=False,
         omit_missing_strains=False,
+        batch_size=None,
     ):
         super(LineAndAssayCreationVisitor, self).__init__(
             study_pk,
@@ -208,6 +222,14 @@ class LineAndAssayCreationVisitor(NewLineAndAssayVisitor):
         self.lines_created = []
         self.require_strains = True
         self.cache = cache
+        if batch_size is None:
+            batch_size = getattr(settings, "EDD_LINE_CREATION_BATCH", 500)
+        self.batch_size = max(1, batch_size)
+        # objects waiting for the next flush
+        self._lines = []
+        self._assays = []
+        # maps M2M field name -> list of (line, [related objects])
+        self._relations = defaultdict(list)
 
     def visit_line(self, line_name, description, line_metadata_dict, replicate_num):
 
@@ -247,12 +269,13 @@ class LineAndAssayCreationVisitor(NewLineAndAssayVisitor):
 
             line_attrs[meta_type.type_field] = values
 
-        # create the line.  This must be done before setting M2M relations, so they'll have a
-        # line pk to use
-        line = Line.objects.create(**line_attrs)
+        if len(self._lines) >= self.batch_size:
+            self.flush()
+
+        # the line is saved on the next flush, assays and relations only need the instance
+        line = Line(**line_attrs)
 
-        # save M2M and 1-to-M relations. Note: This MUST be done after Line is saved to the
-        # database and has a primary key to use in relation tables
+        # collect M2M and 1-to-M relations, to save after the Line has a primary key
         for pk, meta_type in self.cache.many_related_mtypes.items():
             value_pks = line_metadata_dict.get(pk)
             if not value_pks:
@@ -272,14 +295,9 @@ class LineAndAssayCreationVisitor(NewLineAndAssayVisitor):
                 continue
 
             many_related_mtype = cache.many_related_mtypes[pk]
+            self._relations[many_related_mtype.type_field].append((line, values))
 
-            # note: line.metadata_add doesn't support multiple values in a single
-            # query...TypeError.  Resulting method would be too complex with this feature?
-            # TODO: ponder changing line.meta_add(values) -> meta_add(*values)
-            line_attr = getattr(line, many_related_mtype.type_field)
-            # add in bulk, which will leave the line instance out of sync
-            line_attr.add(*values)
-
+        self._lines.append(line)
         self.lines_created.append(line)
 
         return line
@@ -293,15 +311,55 @@ class LineAndAssayCreationVisitor(NewLineAndAssayVisitor):
             str(pk): str(value) for pk, value in assay_metadata_dict.items() if value
         }
 
-        assay = Assay.objects.create(
+        # line may not have a primary key until the next flush
+        assay = Assay(
             name=assay_name,
             study_id=line.study_id,
-            line_id=line.pk,
+            line=line,
             protocol_id=protocol_pk,
             metadata=hstore_compliant_dict,
         )
+        self._assays.append(assay)
         assays_list.append(assay)
 
+    def flush(self):
+        """
+        Writes collected lines, their relations, and assays to the database.
+        """
+        if not (self._lines or self._assays):
+            return
+        with BulkUpdate():
+            Line.bulk_insert(self._lines, batch_size=self.batch_size)
+            strain_ids = set()
+            for field_name, relations in self._relations.items():
+                field = Line._meta.get_field(field_name)
+                through = field.remote_field.through
+                source = through._meta.get_field(field.m2m_field_name()).attname
+                target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+                rows = [
+                    through(**{source: line.pk, target: value.pk})
+                    for line, values in relations
+                    for value in values
+                ]
+                through.objects.bulk_create(rows, batch_size=self.batch_size)
+                if field_name == "strains":
+                    strain_ids.update(
+                        value.pk for _, values in relations for value in values
+                    )
+            for assay in self._assays:
+                # set the ID from lines saved since the assay was visited
+                assay.line_id = assay.line.pk
+            Assay.bulk_insert(self._assays, batch_size=self.batch_size)
+        lines_created.send(
+            sender=self.__class__,
+            study_id=self.study_pk,
+            strain_ids=strain_ids,
+            using=connection.alias,
+        )
+        self._lines = []
+        self._assays = []
+        self._relations = defaultdict(list)
+
 
 class LineAndAssayNamingVisitor(NewLineAndAssayVisitor):
     """
@@ -1061,6 +1119,7 @@ class CombinatorialDescriptionInput(object):
         )
 
         self._visit_study(visitor, cache)
+        visitor.flush()
         return visitor
 
     def _visit_study(self, visitor, cache):
@@ -1258,6 +1317,20 @@ class CombinatorialCreationPerformance(object):
             }
         )
 
+    def end_study_populate(self, line_count, assay_count):
+        now = utcnow()
+        self.study_populate_delta = now - self._subsection_start_time
+        self._subsection_start_time = now
+        logger.info(
+            "Done creating %(line_count)d lines and %(assay_count)d assays in "
+            "%(seconds)0.3f seconds"
+            % {
+                "line_count": line_count,
+                "assay_count": assay_count,
+                "seconds": self.study_populate_delta.total_seconds(),
+            }
+        )
+
     def end_naming_check(self):
         now = utcnow()
         self.naming_check_delta = now - self._subsection_start_time
@@ -11,6 +11,7 @@ from django.utils.translation import ugettext as _
 from six import string_types
 
 from .. import models, redis
+from ..codec import get_codec
 
 logger = logging.getLogger(__name__)
 MType = namedtuple("MType", ["compartment", "type", "unit"])
@@ -36,8 +37,11 @@ class ImportBoundsException(ImportException):
 
 class ImportBroker:
     def __init__(self):
-        self.storage = redis.ScratchStorage(
-            key_prefix=f"{__name__}.{self.__class__.__name__}"
+        key_prefix = f"{__name__}.{self.__class__.__name__}"
+        self.storage = redis.ScratchStorage(key_prefix=key_prefix)
+        # pages are the bulk of import data, store those with a compact encoding
+        self.page_storage = redis.ScratchStorage(
+            key_prefix=key_prefix, codec=get_codec()
         )
 
     def _import_name(self, import_id):
@@ -49,9 +53,15 @@ class ImportBroker:
         self.storage.save(context, name=name, expires=expires)
 
     def add_page(self, import_id, page):
+        """
+        Stores a page of series data for the specified import
+        :param page: list of series data, the same as sent to
+            TableImport.import_series_data()
+        :return: the number of pages stored for the import
+        """
         name = f"{self._import_name(import_id)}:pages"
         expires = getattr(settings, "EDD_IMPORT_CACHE_LENGTH", None)
-        _, count = self.storage.append(page, name=name, expires=expires)
+        _, count = self.page_storage.append(page, name=name, expires=expires)
         return count
 
     def check_bounds(self, import_id, page, expected_count):
@@ -92,9 +102,140 @@ class ImportBroker:
     def load_pages(self, import_id):
         """
         Fetches the pages of series data for the specified import
-        :returns: a generator of the stored values (binary strings)
+        :returns: a generator of the stored pages of series data
+        """
+        return self.page_storage.load_pages(f"{self._import_name(import_id)}:pages")
+
+
+class BulkMeasurementWriter:
+    """
+    Collects the Measurement and MeasurementValue writes for a page of import data,
+    and sends them to the database in bulk when flush() is called. New measurements
+    are created with a single bulk INSERT, points at new x values with another, and
+    points replacing the y values at existing x values with a set-based UPDATE.
+
+    Bulk queries bypass the model signal handlers, so the writer sets the Update
+    references on the objects it writes itself.
+    """
+
+    def __init__(self, update):
+        self.update = update
+        self._batch_size = getattr(settings, "EDD_IMPORT_BULK_BATCH_SIZE", 1000)
+        # lookup key => Measurement, for records requested while processing the page
+        self._records = {}
+        # Measurement instances not yet in the database
+        self._created = []
+        # IDs of Measurement records that already exist in the database
+        self._touched = set()
+        # id(Measurement) => (Measurement, {xkey: (x, y)})
+        self._points = {}
+        # count of points repeating an x value already seen in this page
+        self._repeated = 0
+
+    def find_pending(self, key):
+        """Finds a record already requested with the given key, or None."""
+        return self._records.get(key, None)
+
+    def touch(self, key, record):
+        """Registers an existing Measurement as receiving points in this page."""
+        self._records[key] = record
+        self._touched.add(record.pk)
+        return record
+
+    def create(self, key, record):
+        """Registers an unsaved Measurement to create when the page is flushed."""
+        record.update_ref = self.update
+        self._records[key] = record
+        self._created.append(record)
+        return record
+
+    def add_points(self, record, points):
+        """
+        Adds points to write for a record; a later point with the same x value as an
+        earlier point replaces the earlier y value.
+
+        :param record: a Measurement returned from touch() or create()
+        :param points: iterable of (x, y) tuples, each a list of numbers
         """
-        return self.storage.load_pages(f"{self._import_name(import_id)}:pages")
+        _, series = self._points.setdefault(id(record), (record, {}))
+        for x, y in points:
+            key = self._xkey(x)
+            if key in series:
+                self._repeated += 1
+            series[key] = (x, y)
+
+    def flush(self):
+        """
+        Writes all collected records and points to the database.
+
+        :return: a tuple with a summary of point counts in the form (added, updated)
+        """
+        if self._created:
+            models.Measurement.objects.bulk_create(
+                self._created, batch_size=self._batch_size
+            )
+        if self._touched:
+            # force refresh of Update on existing records
+            models.Measurement.objects.filter(pk__in=self._touched).update(
+                update_ref=self.update
+            )
+            # packed points become rows, to match and replace values at existing x
+            models.PackedSeries.unpack(
+                models.Measurement.objects.filter(pk__in=self._touched)
+            )
+        existing = self._load_existing()
+        to_create = []
+        to_update = []
+        for record, series in self._points.values():
+            for key, (x, y) in series.items():
+                value_id = existing.get((record.pk, key), None)
+                if value_id is None:
+                    to_create.append(
+                        models.MeasurementValue(
+                            measurement_id=record.pk,
+                            study_id=record.study_id,
+                            updated=self.update,
+                            x=x,
+                            y=y,
+                        )
+                    )
+                else:
+                    to_update.append(
+                        models.MeasurementValue(pk=value_id, updated=self.update, y=y)
+                    )
+        models.MeasurementValue.objects.bulk_create(
+            to_create, batch_size=self._batch_size
+        )
+        models.MeasurementValue.objects.bulk_update(
+            to_update, ["updated", "y"], batch_size=self._batch_size
+        )
+        added = len(to_create)
+        updated = len(to_update) + self._repeated
+        self._reset()
+        return (added, updated)
+
+    def _load_existing(self):
+        # maps (measurement ID, xkey) => value ID, for values on pre-existing records
+        if not self._touched:
+            return {}
+        qs = models.MeasurementValue.objects.filter(measurement_id__in=self._touched)
+        return {
+            (measurement_id, self._xkey(x)): value_id
+            for value_id, measurement_id, x in qs.values_list(
+                "id", "measurement_id", "x"
+            ).iterator()
+        }
+
+    def _reset(self):
+        self._records = {}
+        self._created = []
+        self._touched = set()
+        self._points = {}
+        self._repeated = 0
+
+    def _xkey(self, x):
+        # database stores values with 5 decimal places; compare at the same precision
+        return tuple(round(float(v), 5) for v in x)
 
 
 class TableImport(object):
@@ -366,15 +507,15 @@ class TableImport(object):
         return result
 
     def create_measurements(self, series):
-        added = 0
-        updated = 0
-        # TODO: During a standard-size biolector import (~50000 measurement values) this loop runs
-        # very slowly on my test machine, consistently taking an entire second per set (approx 300
-        # values each). To an end user, this makes the submission appear to hang for over a
-        # minute, which might make them behave erratically...
-
-        # TODO: try doing loop twice, first with models.Measurement.objects.bulk_create()
-        # then with models.MeasurementValue.objects.bulk_create()
+        """
+        Creates measurements and values for a page of series data. Writes are collected
+        in a BulkMeasurementWriter, so that the whole page results in a handful of bulk
+        queries instead of several queries per point.
+
+        :param series: list of resolved series items, as in import_series_data
+        :return: a tuple with a summary of measurement counts in the form (added, updated)
+        """
+        writer = BulkMeasurementWriter(models.Update.load_update())
         for (index, item) in enumerate(series):
             points = item.get("data", [])
             meta = item.get("metadata_by_id", {})
@@ -392,16 +533,18 @@ class TableImport(object):
                 # END uncovered
             else:
                 assay = item["assay_obj"]
-                record = self._load_measurement_record(item)
-                (points_added, points_updated) = self._process_measurement_points(
-                    record, points
+                record = self._load_measurement_record(item, writer)
+                writer.add_points(
+                    record,
+                    (
+                        (self._extract_value(x), self._extract_value(y))
+                        for x, y in points
+                    ),
                 )
-                added += points_added
-                updated += points_updated
                 self._process_metadata(assay, meta)
-        return (added, updated)
+        return writer.flush()
 
-    def _load_measurement_record(self, item):
+    def _load_measurement_record(self, item, writer):
         assay = item["assay_obj"]
         points = item.get("data", [])
         mtype = self._mtype(item)
@@ -414,39 +557,32 @@ class TableImport(object):
             "x_units": self._hours,
             "y_units_id": mtype.unit,
         }
+        # earlier items in the same page may already have requested this record
+        key = (
+            assay.pk,
+            mtype.compartment,
+            mtype.type,
+            find["measurement_format"],
+            mtype.unit,
+        )
+        record = writer.find_pending(key)
+        if record is not None:
+            return record
         logger.debug(f"Finding measurements for {find}")
         records = assay.measurement_set.filter(**find)
-
-        if records.count() > 0:
+        # only SELECT query once
+        record = records.first()
+        if record is not None:
             # TODO uncovered
             if self.replace:
                 records.delete()
             else:
-                # only SELECT query once
-                record = records[0]
-                # force refresh of Update
-                record.save(update_fields=["update_ref"])
+                writer.touch(key, record)
                 return record
             # END uncovered
         find.update(experimenter=self._user, study_id=assay.study_id)
         logger.debug("Creating measurement with: %s", find)
-        return assay.measurement_set.create(**find)
-
-    def _process_measurement_points(self, record, points):
-        total_added = 0
-        total_updated = 0
-        for x, y in points:
-            (xvalue, yvalue) = (self._extract_value(x), self._extract_value(y))
-            obj, created = record.measurementvalue_set.update_or_create(
-                study_id=record.study_id, x=xvalue, defaults={"y": yvalue}
-            )
-            if created:
-                total_added += 1
-            else:
-                # TODO uncovered
-                total_updated += 1
-                # END uncovered
-        return (total_added, total_updated)
+        return writer.create(key, models.Measurement(assay=assay, **find))
 
     def _process_metadata(self, assay, meta):
         if len(meta) > 0:
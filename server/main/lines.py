@@ -0,0 +1,183 @@
+# coding: utf-8
+"""
+Changes to many lines of a study at once. Edits and clones apply to the whole selection
+with a handful of queries, instead of validating and saving each line; every line
+changed gets the same Update.
+"""
+
+from django.conf import settings
+from django.contrib.postgres.fields import JSONField
+from django.db import connection, transaction
+from django.db.models import F, Func, TextField, Value
+
+from . import models
+from .signals import lines_created, lines_modified
+
+
+class MetadataMerge(Func):
+    """
+    Removes keys from, then adds values to, a JSONB metadata column; without loading
+    the metadata of each row. Keys are removed one at a time, as the operator removing
+    an array of keys needs PostgreSQL 10.
+    """
+
+    def __init__(self, expression, updating=None, removing=None, **extra):
+        removing = [
+            Value(key, output_field=TextField()) for key in sorted(removing or ())
+        ]
+        super().__init__(
+            expression,
+            *removing,
+            Value(dict(updating or {}), output_field=JSONField()),
+            output_field=JSONField(),
+            **extra,
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        compiled = [compiler.compile(arg) for arg in self.source_expressions]
+        column, *removing, updating = (sql for sql, _ in compiled)
+        params = [param for _, args in compiled for param in args]
+        sql = column
+        for key in removing:
+            sql = f"({sql} - {key}::text)"
+        return f"({sql} || {updating})", params
+
+
+def edit_lines(
+    study,
+    lines,
+    values=None,
+    strains=None,
+    carbon_sources=None,
+    metadata=None,
+    remove_metadata=None,
+    batch_size=None,
+):
+    """
+    Applies the same changes to many lines of a study.
+
+    :param study: the Study containing the lines; other lines are not changed
+    :param lines: queryset of the Lines to change
+    :param values: (optional) dict of field names to values, for fields of Line other
+        than metadata and many-to-many relations
+    :param strains: (optional) Strains replacing the strains of every line
+    :param carbon_sources: (optional) CarbonSources replacing the carbon sources of
+        every line
+    :param metadata: (optional) dict of metadata values set on every line
+    :param remove_metadata: (optional) metadata keys removed from every line
+    :param batch_size: (optional) maximum rows in each insert; defaults to the
+        EDD_LINE_CREATION_BATCH setting, or 500
+    :returns: the number of lines changed
+    """
+    line_ids = list(lines.filter(study_id=study.pk).values_list("pk", flat=True))
+    if not line_ids:
+        return 0
+    if batch_size is None:
+        batch_size = getattr(settings, "EDD_LINE_CREATION_BATCH", 500)
+    # fields of Line are split over the edd_object table and the line table
+    parent_values, line_values = {}, {}
+    for name, value in (values or {}).items():
+        field = models.Line._meta.get_field(name)
+        if field.model is models.EDDObject:
+            parent_values[field.name] = value
+        else:
+            line_values[field.name] = value
+    if metadata or remove_metadata:
+        parent_values.update(
+            metadata=MetadataMerge(F("metadata"), metadata, remove_metadata)
+        )
+    with transaction.atomic(), models.BulkUpdate() as bulk:
+        before = _study_strain_ids(study)
+        models.EDDObject.objects.filter(pk__in=line_ids).update(
+            updated=bulk.update, **parent_values
+        )
+        if line_values:
+            models.Line.objects.filter(pk__in=line_ids).update(**line_values)
+        relations = {"strains": strains, "carbon_source": carbon_sources}
+        for field_name, related in relations.items():
+            if related is not None:
+                _replace_relations(field_name, line_ids, related, batch_size)
+        for pk in line_ids:
+            bulk.log(models.Line(pk=pk, updated=bulk.update))
+        after = _study_strain_ids(study)
+        lines_modified.send(
+            sender=models.Line,
+            study_id=study.pk,
+            added_strain_ids=after - before,
+            removed_strain_ids=before - after,
+            using=connection.alias,
+        )
+    return len(line_ids)
+
+
+def clone_lines(study, lines, suffix=" clone", batch_size=None):
+    """
+    Copies lines of a study, with their strains, carbon sources, and metadata.
+
+    :param study: the Study containing the lines; other lines are not copied
+    :param lines: queryset of the Lines to copy
+    :param suffix: (optional) text added to the name of each copy
+    :param batch_size: (optional) maximum rows in each insert; defaults to the
+        EDD_LINE_CREATION_BATCH setting, or 500
+    :returns: list of the new Lines
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, "EDD_LINE_CREATION_BATCH", 500)
+    originals = lines.filter(study_id=study.pk).order_by("pk")
+    originals = list(originals.prefetch_related("carbon_source", "strains"))
+    clones = [
+        models.Line(
+            name=f"{line.name}{suffix}",
+            description=line.description,
+            metadata=dict(line.metadata),
+            study_id=study.pk,
+            control=line.control,
+            contact_id=line.contact_id,
+            # same as a new line in LineForm, fall back to the study contact
+            experimenter_id=line.experimenter_id or study.contact_id,
+        )
+        for line in originals
+    ]
+    strain_ids = set()
+    with transaction.atomic(), models.BulkUpdate():
+        models.Line.bulk_insert(clones, batch_size=batch_size)
+        for field_name in ("carbon_source", "strains"):
+            pairs = [
+                (clone.pk, related.pk)
+                for line, clone in zip(originals, clones)
+                for related in getattr(line, field_name).all()
+            ]
+            _insert_relations(field_name, pairs, batch_size)
+            if field_name == "strains":
+                strain_ids.update(pk for _, pk in pairs)
+        lines_created.send(
+            sender=models.Line,
+            study_id=study.pk,
+            strain_ids=strain_ids,
+            using=connection.alias,
+        )
+    return clones
+
+
+def _insert_relations(field_name, pairs, batch_size):
+    # pairs are tuples of (line ID, related ID)
+    field = models.Line._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = through._meta.get_field(field.m2m_field_name()).attname
+    target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+    rows = [through(**{source: line_id, target: pk}) for line_id, pk in pairs]
+    through.objects.bulk_create(rows, batch_size=batch_size)
+
+
+def _replace_relations(field_name, line_ids, related, batch_size):
+    field = models.Line._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = through._meta.get_field(field.m2m_field_name()).attname
+    through.objects.filter(**{f"{source}__in": line_ids}).delete()
+    pairs = [(line_id, item.pk) for line_id in line_ids for item in related]
+    _insert_relations(field_name, pairs, batch_size)
+
+
+def _study_strain_ids(study):
+    queryset = models.Strain.objects.filter(line__study_id=study.pk)
+    return set(queryset.values_list("pk", flat=True))
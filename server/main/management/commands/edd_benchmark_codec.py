@@ -0,0 +1,80 @@
+# coding: utf-8
+"""
+Command compares the codecs used for pages of import data stored in Redis, measuring
+the encoded size and the time to encode and decode the pages of a parsed BioLector
+file. No database or Redis access is needed.
+"""
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from edd_utils.parsers.biolector import getRawImportRecordsAsJSON
+from main.codec import codecs
+
+# main/management/commands -> main/static/main/example
+main_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+default_file = os.path.join(main_dir, "static", "main", "example", "Biolector.xml")
+
+
+class Command(BaseCommand):
+    help = "Compares size and speed of page codecs on a parsed BioLector file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            default=default_file,
+            help="BioLector XML file to parse; default is the example BioLector file.",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=getattr(settings, "EDD_IMPORT_PAGE_SIZE", 1000),
+            help="Number of records in each page; default is EDD_IMPORT_PAGE_SIZE.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="Number of times to encode and decode all pages; default 10.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["file"], "rb") as stream:
+                records = getRawImportRecordsAsJSON(stream)
+        except OSError as e:
+            raise CommandError(f"Could not read {options['file']}: {e}") from e
+        size = max(1, options["page_size"])
+        pages = [records[i : i + size] for i in range(0, len(records), size)]
+        points = sum(len(record["data"]) for record in records)
+        self.stdout.write(
+            f"Encoding {len(records)} records with {points} points "
+            f"in {len(pages)} pages, {options['repeat']} times"
+        )
+        for name, codec_class in codecs.items():
+            try:
+                codec = codec_class()
+            except ImportError as e:
+                self.stdout.write(f"{name}: not available ({e})")
+                continue
+            self.measure(name, codec, pages, options["repeat"])
+
+    def measure(self, name, codec, pages, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            encoded = [codec.encode(page) for page in pages]
+        encode_time = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            decoded = [codec.decode(value) for value in encoded]
+        decode_time = (time.perf_counter() - start) / repeat
+        if decoded != pages:
+            self.stderr.write(self.style.ERROR(f"{name}: decoded pages do not match!"))
+        total = sum(map(len, encoded))
+        self.stdout.write(
+            f"{name:8} {total / 1024:10.1f} KiB  "
+            f"encode {encode_time * 1000:8.2f} ms  decode {decode_time * 1000:8.2f} ms"
+        )
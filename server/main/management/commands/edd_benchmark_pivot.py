@@ -0,0 +1,89 @@
+# coding: utf-8
+"""
+Command times pivoting of synthetic measurement values into the wide table layouts
+of exports, comparing alignment of values with per-row dict lookups against the
+vectorized ValuePivot. No database access is needed.
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.export.pivot import ValuePivot
+from main.export.table import value_str
+
+
+class Command(BaseCommand):
+    help = "Times pivoting of synthetic measurement values for wide table exports."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--measurements",
+            type=int,
+            default=10000,
+            help="Number of measurements (rows) to pivot; default 10000.",
+        )
+        parser.add_argument(
+            "--points",
+            type=int,
+            default=500,
+            help="Number of distinct x values (columns) in the table; default 500.",
+        )
+        parser.add_argument(
+            "--block",
+            type=int,
+            default=100,
+            help="Number of rows aligned by each call to ValuePivot; default 100.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for the random values."
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        all_x = [round(i * 0.25, 5) for i in range(options["points"])]
+        rows = self.build_rows(rng, all_x, options["measurements"])
+        self.stdout.write(
+            f"Pivoting {len(rows)} measurements x {len(all_x)} timepoints "
+            f"({sum(len(xs) for xs, ys in rows)} values)"
+        )
+        start = time.perf_counter()
+        expected = list(self.pivot_dict(all_x, rows))
+        dict_time = time.perf_counter() - start
+        start = time.perf_counter()
+        result = list(self.pivot_vector(all_x, rows, options["block"]))
+        vector_time = time.perf_counter() - start
+        if result != expected:
+            self.stderr.write(self.style.ERROR("Pivot outputs do not match!"))
+        self.stdout.write(f"dict lookup: {dict_time:.3f}s")
+        self.stdout.write(f"ValuePivot:  {vector_time:.3f}s")
+        self.stdout.write(
+            self.style.SUCCESS(f"Speedup: {dict_time / vector_time:.1f}x")
+        )
+
+    def build_rows(self, rng, all_x, count):
+        # each measurement has values at a random ~90% of the x values, in the same
+        #   form as the aggregated values on exported measurements
+        rows = []
+        for _ in range(count):
+            points = [x for x in all_x if rng.random() < 0.9]
+            xs = [[x] for x in points]
+            ys = [[round(rng.uniform(0, 100), 5)] for x in points]
+            rows.append((xs, ys))
+        return rows
+
+    def pivot_dict(self, all_x, rows):
+        # approach used before ValuePivot; stringify and look up every x in every row
+        header = [value_str([x]) for x in all_x]
+        for xs, ys in rows:
+            squashed = {value_str(x): value_str(y) for x, y in zip(xs, ys)}
+            yield [squashed.get(x, "") for x in header]
+
+    def pivot_vector(self, all_x, rows, block):
+        pivot = ValuePivot(all_x)
+        for xs, ys in rows:
+            pivot.add(xs, ys)
+            if len(pivot) >= block:
+                yield from pivot.pivot()
+        yield from pivot.pivot()
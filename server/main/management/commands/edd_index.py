@@ -3,10 +3,16 @@
 Populate the Solr indexes used by EDD.
 """
 
-from django.core.management.base import BaseCommand
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 from django_auth_ldap.backend import LDAPBackend, _LDAPUser
 
 from main import solr
+from main.codec import JSONCodec
+from main.redis import ScratchStorage
 
 
 class Command(BaseCommand):
@@ -16,6 +22,10 @@ class Command(BaseCommand):
     study_core = solr.StudySearch()
     user_core = solr.UserSearch()
     measurement_core = solr.MeasurementTypeSearch()
+    # seconds to keep checkpoints of an interrupted re-index
+    checkpoint_expires = 60 * 60 * 24 * 7
+    # milliseconds before Solr must commit a batch; a full commit happens before swap
+    commit_within = 60 * 1000
 
     def __init__(self, *args, **kwargs):
         super(Command, self).__init__(*args, **kwargs)
@@ -30,32 +40,57 @@ class Command(BaseCommand):
             dest="force",
             help="Forces a re-index",
         )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            default=False,
+            dest="resume",
+            help="Continues an interrupted re-index, skipping batches already sent",
+        )
+        parser.add_argument(
+            "--workers",
+            default=1,
+            dest="workers",
+            type=int,
+            help="Number of batches to send to Solr concurrently (default 1)",
+        )
+        parser.add_argument(
+            "--batch",
+            default=500,
+            dest="batch",
+            type=int,
+            help="Number of items in each batch sent to Solr (default 500)",
+        )
 
     def handle(self, *args, **options):
+        self.storage = ScratchStorage(codec=JSONCodec())
+        self.options = options
+
         self.stdout.write("Checking user index")
-        if options["force"] or len(self.user_core) == 0:
+        if self._check(self.user_core):
             users_qs = self.user_core.get_queryset()
-            self.user_core.swap().clear()
-            user_updates = map(self._copy_groups, users_qs)
             self.stdout.write(f"Indexing {users_qs.count()} users")
-            self.user_core.update(user_updates)
-            self.user_core.swap_execute()
+            self._reindex(self.user_core, users_qs, prepare=self._copy_groups)
 
         self.stdout.write("Checking studies index")
-        if options["force"] or len(self.study_core) == 0:
+        if self._check(self.study_core):
             study_qs = self.study_core.get_queryset()
-            self.study_core.swap().clear()
             self.stdout.write(f"Indexing {study_qs.count()} studies")
-            self.study_core.update(study_qs)
-            self.study_core.swap_execute()
+            self._reindex(self.study_core, study_qs)
 
         self.stdout.write("Checking metabolite index")
-        if options["force"] or len(self.measurement_core) == 0:
+        if self._check(self.measurement_core):
             metabolite_qs = solr.MeasurementTypeSearch.get_queryset()
-            self.measurement_core.swap().clear()
             self.stdout.write(f"Indexing {metabolite_qs.count()} metabolites")
-            self.measurement_core.update(metabolite_qs)
-            self.measurement_core.swap_execute()
+            self._reindex(self.measurement_core, metabolite_qs)
+
+    def _check(self, core):
+        # re-index on force, on resume of a checkpointed core, or when the core is empty
+        if self.options["force"]:
+            return True
+        if self.options["resume"] and self.storage.page_count(self._name(core)):
+            return True
+        return len(core) == 0
 
     def _copy_groups(self, user):
         # Normally should use the following line:
@@ -68,3 +103,104 @@ class Command(BaseCommand):
             # _mirror_groups fails when ldap_user is not Active
             user.groups.clear()
         return user
+
+    def _index_batch(self, core, queryset, prepare, start, end):
+        # runs in worker threads; each thread gets its own database connection
+        try:
+            docs = queryset.filter(pk__gte=start, pk__lte=end)
+            if prepare is not None:
+                docs = map(prepare, docs)
+            # a commit is sent after all batches, instead of after each batch
+            core.update(docs, commit_within=self.commit_within)
+        finally:
+            connection.close()
+
+    def _name(self, core):
+        return f"edd_index:{core.core}"
+
+    def _partition(self, queryset):
+        # split primary keys into (start, end, count) ranges of the batch size
+        batch = max(1, self.options["batch"])
+        pks = list(queryset.order_by("pk").values_list("pk", flat=True))
+        for i in range(0, len(pks), batch):
+            chunk = pks[i : i + batch]
+            yield chunk[0], chunk[-1], len(chunk)
+
+    def _load_checkpoint(self, name, ranges):
+        # checkpoints are [batch, start, end, count] pages; inserts and deletes since
+        #   the interrupted run shift the ranges, so discard checkpoints not matching
+        #   the ranges of this run
+        batch = max(1, self.options["batch"])
+        done = set()
+        for page in self.storage.load_pages(name):
+            if not isinstance(page, list) or len(page) != 4 or page[0] != batch:
+                self.stdout.write("Discarding checkpoint of a different batch size")
+                return set()
+            done.add(tuple(page[1:]))
+        if not done.issubset(ranges):
+            self.stdout.write("Discarding checkpoint of items changed since")
+            return set()
+        return done
+
+    def _reindex(self, core, queryset, prepare=None):
+        # name of the main core, before swap() points core at the swap core
+        name = self._name(core)
+        ranges = list(self._partition(queryset))
+        done = set()
+        if self.options["resume"]:
+            done = self._load_checkpoint(name, ranges)
+        if done:
+            self.stdout.write(f"Resuming with {len(done)} batches already indexed")
+        else:
+            self.storage.delete(name)
+        core.swap()
+        if not done:
+            core.clear()
+        total = sum(count for _, _, count in ranges)
+        self._progress = sum(count for _, _, count in done)
+        self._started = time.monotonic()
+        self._sent = 0
+        error = self._send_batches(core, name, queryset, prepare, ranges, done, total)
+        if error is not None:
+            # point back at the main core, the swap core is incomplete
+            core.swap()
+            raise CommandError(
+                f"Failed indexing {core}; run again with --resume to continue"
+            ) from error
+        core.commit()
+        core.swap_execute()
+        self.storage.delete(name)
+
+    def _send_batches(self, core, name, queryset, prepare, ranges, done, total):
+        # returns the first error of a batch, after all running batches have stopped
+        batch = max(1, self.options["batch"])
+        with ThreadPoolExecutor(max_workers=max(1, self.options["workers"])) as pool:
+            futures = {}
+            for start, end, count in ranges:
+                if (start, end, count) not in done:
+                    args = (core, queryset, prepare, start, end)
+                    futures[pool.submit(self._index_batch, *args)] = (start, end, count)
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    start, end, count = futures[future]
+                    self.storage.append(
+                        [batch, start, end, count],
+                        name=name,
+                        expires=self.checkpoint_expires,
+                    )
+                    self._report(count, total)
+            except Exception as e:
+                for future in futures:
+                    future.cancel()
+                return e
+        return None
+
+    def _report(self, count, total):
+        self._progress += count
+        self._sent += count
+        elapsed = time.monotonic() - self._started
+        rate = self._sent / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Indexed {self._progress} of {total} ({rate:.1f} documents/second)"
+        )
@@ -0,0 +1,58 @@
+# coding: utf-8
+"""
+Moves values of scalar measurements to or from compact packed series.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from main import models
+
+
+class Command(BaseCommand):
+    help = (
+        "Packs the values of scalar measurements into one row per measurement, "
+        "or unpacks them back into one row per value."
+    )
+
+    def add_arguments(self, parser):
+        # Add all parent arguments
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            "--study",
+            action="append",
+            default=[],
+            dest="study",
+            help="Slug or ID of a study to process; may repeat (default all studies)",
+        )
+        parser.add_argument(
+            "--unpack",
+            action="store_true",
+            default=False,
+            dest="unpack",
+            help="Moves packed values back into individual rows",
+        )
+        parser.add_argument(
+            "--batch",
+            default=500,
+            dest="batch",
+            type=int,
+            help="Number of measurements processed in each transaction (default 500)",
+        )
+
+    def handle(self, *args, **options):
+        measurements = models.Measurement.objects.all()
+        studies = options["study"]
+        if studies:
+            ids = [s for s in studies if s.isdigit()]
+            slugs = [s for s in studies if not s.isdigit()]
+            measurements = measurements.filter(
+                Q(study_id__in=ids) | Q(study__slug__in=slugs)
+            )
+        batch = max(1, options["batch"])
+        if options["unpack"]:
+            count = models.PackedSeries.unpack(measurements, batch_size=batch)
+            self.stdout.write(f"Unpacked values of {count} measurements")
+        else:
+            count = models.PackedSeries.pack(measurements, batch_size=batch)
+            self.stdout.write(f"Packed values of {count} measurements")
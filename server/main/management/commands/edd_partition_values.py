@@ -0,0 +1,55 @@
+# coding: utf-8
+"""
+Partitions the measurement_value table by study.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from main import partition
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the table of measurement values as hash partitions by study. "
+        "The table is locked while values are copied."
+    )
+
+    def add_arguments(self, parser):
+        # Add all parent arguments
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            "--partitions",
+            default=None,
+            dest="partitions",
+            type=int,
+            help=(
+                "Number of partitions, or 0 to remove partitions "
+                "(default EDD_VALUE_PARTITIONS setting)"
+            ),
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            default=False,
+            dest="check",
+            help="Only reports the current number of partitions",
+        )
+
+    def handle(self, *args, **options):
+        current = partition.partition_count(connection)
+        self.stdout.write(f"Measurement values have {current} partitions")
+        if options["check"]:
+            return
+        partitions = options["partitions"]
+        if partitions is None:
+            partitions = getattr(settings, "EDD_VALUE_PARTITIONS", 0)
+        if partitions == current:
+            self.stdout.write("Nothing to do")
+            return
+        try:
+            partition.repartition(connection, partitions)
+        except partition.PartitionError as e:
+            raise CommandError(str(e)) from e
+        self.stdout.write(f"Measurement values now have {partitions} partitions")
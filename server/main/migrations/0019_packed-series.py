@@ -0,0 +1,70 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:37
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("main", "0018_provisional-types")]
+
+    operations = [
+        migrations.CreateModel(
+            name="PackedSeries",
+            fields=[
+                (
+                    "measurement",
+                    models.OneToOneField(
+                        help_text="The Measurement containing these points of data.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="packed",
+                        serialize=False,
+                        to="main.Measurement",
+                        verbose_name="Measurement",
+                    ),
+                ),
+                (
+                    "x",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(),
+                        help_text="X-axis value of each point, sorted.",
+                        size=None,
+                        verbose_name="X",
+                    ),
+                ),
+                (
+                    "y",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(null=True),
+                        help_text="Y-axis value of each point, in the same order as X.",
+                        size=None,
+                        verbose_name="Y",
+                    ),
+                ),
+                (
+                    "study",
+                    models.ForeignKey(
+                        help_text="The Study containing these points.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="main.Study",
+                        verbose_name="Study",
+                    ),
+                ),
+                (
+                    "updated",
+                    models.ForeignKey(
+                        help_text="The Update triggering the latest setting of these points.",
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="main.Update",
+                        verbose_name="Updated",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Packed Series",
+                "db_table": "measurement_packed",
+            },
+        )
+    ]
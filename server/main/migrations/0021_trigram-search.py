@@ -0,0 +1,59 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:49
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("main", "0019_packed-series")]
+
+    operations = [
+        # trigram indexes for autocomplete need the pg_trgm extension
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="eddobject",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"], name="edd_object_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="measurementtype",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["type_name"],
+                name="measurement_type_name_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="measurementtype",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["short_name"],
+                name="measurement_type_short_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="metadatagroup",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["group_name"],
+                name="metadata_group_name_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="metadatatype",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["type_name"],
+                name="metadata_type_name_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        # auth.Group is not an EDD model, index its name directly
+        migrations.RunSQL(
+            sql="CREATE INDEX auth_group_name_trgm ON auth_group "
+            "USING gin (name gin_trgm_ops);",
+            reverse_sql="DROP INDEX auth_group_name_trgm;",
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.28 on 2026-10-18 22:19
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+# rows of packed points get a negative ID from measurement and position in the series
+CREATE_VIEW = """
+CREATE VIEW measurement_point AS
+SELECT v.id::bigint AS id, v.study_id, v.measurement_id, v.updated_id, v.x, v.y
+FROM measurement_value v
+UNION ALL
+SELECT
+    -(p.measurement_id::bigint * 4294967296 + point.n) AS id,
+    p.study_id,
+    p.measurement_id,
+    p.updated_id,
+    ARRAY[point.x]::numeric(16,5)[] AS x,
+    CASE WHEN point.y IS NULL THEN '{}'::numeric(16,5)[]
+    ELSE ARRAY[point.y]::numeric(16,5)[] END AS y
+FROM measurement_packed p
+CROSS JOIN LATERAL unnest(p.x, p.y) WITH ORDINALITY AS point(x, y, n);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("main", "0021_trigram-search")]
+
+    operations = [
+        migrations.RunSQL(sql=CREATE_VIEW, reverse_sql="DROP VIEW measurement_point;"),
+        migrations.CreateModel(
+            name="MeasurementPoint",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "x",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.DecimalField(decimal_places=5, max_digits=16),
+                        help_text="X-axis value(s) for this point.",
+                        size=None,
+                        verbose_name="X",
+                    ),
+                ),
+                (
+                    "y",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.DecimalField(decimal_places=5, max_digits=16),
+                        help_text="Y-axis value(s) for this point.",
+                        size=None,
+                        verbose_name="Y",
+                    ),
+                ),
+            ],
+            options={"db_table": "measurement_point", "managed": False},
+        ),
+    ]
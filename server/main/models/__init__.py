@@ -15,7 +15,9 @@ from .core import (  # noqa: F401
     EDDObject,
     Line,
     Measurement,
+    MeasurementPoint,
     MeasurementValue,
+    PackedSeries,
     Protocol,
     Strain,
     Study,
@@ -41,6 +43,6 @@ from .permission import (  # noqa: F401
     UserPermission,
 )
 from .sbml import MetaboliteExchange, MetaboliteSpecies, SBMLTemplate  # noqa: F401
-from .update import Datasource, Update  # noqa: F401
+from .update import BulkUpdate, Datasource, Update  # noqa: F401
 from .user import User, patch_user_model  # noqa: F401
 from .worklist import WorklistColumn, WorklistTemplate  # noqa: F401
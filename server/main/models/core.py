@@ -1,27 +1,34 @@
 # coding: utf-8
 """
-The core models: Study, Line, Assay, Measurement, MeasurementValue.
+The core models: Study, Line, Assay, Measurement, MeasurementValue, PackedSeries,
+MeasurementPoint.
 """
 
 import json
+import logging
 import os
 from collections import defaultdict
 from itertools import chain
+from uuid import uuid4
 
 import arrow
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
-from django.db.models import Q
+from django.contrib.postgres.indexes import GinIndex
+from django.db import connection, models, transaction
+from django.db.models import Exists, OuterRef, Q
 from django.template.defaultfilters import slugify
 from django.utils.translation import ugettext_lazy as _
 from six import string_types
 
+from ..redis import StudyAccessCache
 from .common import EDDSerialize, qfilter
 from .measurement_type import MeasurementType, MeasurementUnit, Metabolite
 from .metadata import EDDMetadata, MetadataType
 from .permission import StudyPermission
-from .update import Update
+from .update import BulkUpdate, Update
+
+logger = logging.getLogger(__name__)
 
 
 class Comment(models.Model):
@@ -153,11 +160,46 @@ class Attachment(models.Model):
         return self.object_ref.user_can_read(user)
 
 
+def _insert_rows(model, objects, fields, batch_size=None):
+    """
+    Inserts rows for objects into the table of a model, with only the given fields;
+    bulk_create() cannot insert only the rows of a multi-table inheritance subclass.
+
+    :param model: the model class owning the table
+    :param objects: the objects to insert
+    :param fields: the concrete fields of the table to insert
+    :param batch_size: (optional) maximum rows in each insert
+    """
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(f.column) for f in fields)
+    row = "({})".format(", ".join(["%s"] * len(fields)))
+    rows = [
+        [f.get_db_prep_save(getattr(item, f.attname), connection) for f in fields]
+        for item in objects
+    ]
+    size = connection.ops.bulk_batch_size(fields, rows)
+    size = max(1, min(batch_size or size, size))
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), size):
+            batch = rows[i : i + size]
+            cursor.execute(
+                f"INSERT INTO {qn(model._meta.db_table)} ({columns}) "
+                f"VALUES {', '.join([row] * len(batch))}",
+                list(chain.from_iterable(batch)),
+            )
+
+
 class EDDObject(EDDMetadata, EDDSerialize):
     """ A first-class EDD object, with update trail, comments, attachments. """
 
     class Meta:
         db_table = "edd_object"
+        # trigram index for autocomplete searches on names
+        indexes = [
+            GinIndex(
+                fields=["name"], name="edd_object_name_trgm", opclasses=["gin_trgm_ops"]
+            )
+        ]
 
     name = models.CharField(
         help_text=_("Name of this object."), max_length=255, verbose_name=_("Name")
@@ -238,6 +280,46 @@ class EDDObject(EDDMetadata, EDDSerialize):
             return self._comment_count
         return self.comments.count()
 
+    @classmethod
+    def bulk_insert(cls, objects, batch_size=None):
+        """
+        Inserts new objects of a subclass with bulk queries, one for the edd_object rows
+        and one for the rows of the subclass table; bulk_create() does not support the
+        multi-table inheritance of EDDObject. Signal handlers for saving are NOT run.
+        Objects get a UUID and the current Update, the same as handlers would do, and
+        the rows adding the Update to the updates of each object go through BulkUpdate.
+
+        :param objects: list of unsaved instances of the subclass
+        :param batch_size: (optional) maximum rows in each insert
+        :returns: the list of objects, now with primary keys set
+        """
+        if not objects:
+            return objects
+        parent_link = cls._meta.parents[EDDObject]
+        parent_fields = [
+            f for f in EDDObject._meta.concrete_fields if not f.primary_key
+        ]
+        with BulkUpdate() as bulk:
+            parents = []
+            for item in objects:
+                if item.uuid is None:
+                    item.uuid = uuid4()
+                if item.created_id is None:
+                    item.created = bulk.update
+                item.updated = bulk.update
+                values = {f.attname: getattr(item, f.attname) for f in parent_fields}
+                parents.append(EDDObject(**values))
+            EDDObject.objects.bulk_create(parents, batch_size=batch_size)
+            for item, parent in zip(objects, parents):
+                item.id = parent.pk
+                setattr(item, parent_link.attname, parent.pk)
+            _insert_rows(cls, objects, cls._meta.local_concrete_fields, batch_size)
+            for item in objects:
+                item._state.adding = False
+                item._state.db = cls.objects.db
+                bulk.log(item)
+        return objects
+
     @classmethod
     def metadata_type_frequencies(cls):
         return dict(
@@ -421,9 +503,14 @@ class Study(SlugMixin, EDDObject):
         return self.name
 
     def to_solr_json(self):
-        """ Convert the Study model to a dict structure formatted for Solr JSON. """
+        """
+        Convert the Study model to a dict structure formatted for Solr JSON. Uses values
+        aggregated in the query from main.solr.StudySearch.get_queryset() when present,
+        instead of running queries for each study.
+        """
         created = self.created
         updated = self.updated
+        acl = self._get_solr_acl()
         return {
             "id": self.pk,
             "uuid": self.uuid,
@@ -440,17 +527,29 @@ class Study(SlugMixin, EDDObject):
             "modified": updated.mod_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
             "attachment_count": self.get_attachment_count(),
             "comment_count": self.get_comment_count(),
-            "metabolite": [m.to_solr_value() for m in self.get_metabolite_types_used()],
-            "protocol": [p.to_solr_value() for p in self.get_protocols_used()],
-            "part": [s.to_solr_value() for s in self.get_strains_used()],
-            "aclr": [
-                p.__str__() for p in self.get_combined_permission() if p.is_read()
-            ],
-            "aclw": [
-                p.__str__() for p in self.get_combined_permission() if p.is_write()
-            ],
+            "metabolite": self._get_solr_values(
+                "_solr_metabolite", self.get_metabolite_types_used
+            ),
+            "protocol": self._get_solr_values(
+                "_solr_protocol", self.get_protocols_used
+            ),
+            "part": self._get_solr_values("_solr_part", self.get_strains_used),
+            "aclr": [who for kind, who in acl if kind in StudyPermission.CAN_VIEW],
+            "aclw": [who for kind, who in acl if kind in StudyPermission.CAN_EDIT],
         }
 
+    def _get_solr_acl(self):
+        # list of (permission_type, ACL value) for permissions on the study
+        if hasattr(self, "_solr_acl"):
+            # aggregated values have single-character type prepended to ACL value
+            return [(entry[:1], entry[1:]) for entry in self._solr_acl]
+        return [(p.permission_type, str(p)) for p in self.get_combined_permission()]
+
+    def _get_solr_values(self, attr, lookup):
+        if hasattr(self, attr):
+            return getattr(self, attr)
+        return [item.to_solr_value() for item in lookup()]
+
     def allow_metadata(self, metatype):
         return metatype.for_context == MetadataType.STUDY
 
@@ -460,8 +559,12 @@ class Study(SlugMixin, EDDObject):
         Creates a filter expression to limit queries to objects where a user has a given access
         level to the study containing the objects under query. Note that in nearly all cases, this
         call should be used in concert with a .distinct() on the queryset using the filter, as it
-        uses a JOIN, and will return multiple copies of an object if the user in the argument has
-        multiple permission routes to the parent Study.
+        may use a JOIN, and will return multiple copies of an object if the user in the argument
+        has multiple permission routes to the parent Study.
+
+        For logged-in users outside of a transaction, the IDs of accessible studies are
+        cached, and the filter is a simple lookup on those IDs, without any JOIN. The
+        cached IDs are invalidated by signal handlers when any permission changes.
 
         Examples:
 
@@ -497,6 +600,13 @@ class Study(SlugMixin, EDDObject):
         def filter_key(*args):
             return "__".join(via + list(args))
 
+        ids = Study._cached_access_ids(user, access)
+        if ids is not None:
+            return Q(**{filter_key("pk", "in"): ids})
+        return Study._permission_filter(user, access, filter_key)
+
+    @staticmethod
+    def _permission_filter(user, access, filter_key):
         # set access filter for public/anonymous access
         access_filter = Q(
             **{filter_key("everyonepermission", "permission_type", "in"): access}
@@ -522,6 +632,34 @@ class Study(SlugMixin, EDDObject):
 
         return access_filter
 
+    @staticmethod
+    def _cached_access_ids(user, access):
+        # returns list of study IDs accessible to user, or None if caching is not possible
+        if not getattr(user, "pk", None) or connection.in_atomic_block:
+            # do not cache possibly uncommitted permissions from inside a transaction
+            return None
+        if not getattr(settings, "EDD_ACCESS_CACHE", True):
+            return None
+        try:
+            cache = StudyAccessCache()
+            key, ids = cache.load(user, access)
+            if ids is None:
+                access_filter = Study._permission_filter(
+                    user, access, lambda *args: "__".join(args)
+                )
+                ids = list(
+                    Study.objects.filter(access_filter)
+                    .values_list("pk", flat=True)
+                    .distinct()
+                )
+                cache.save(
+                    key, ids, getattr(settings, "EDD_ACCESS_CACHE_EXPIRES", None)
+                )
+            return ids
+        except Exception as e:
+            logger.warning(f"Failed to use cached study access: {e}")
+            return None
+
     @staticmethod
     def user_role_can_read(user):
         """
@@ -1164,8 +1302,16 @@ class Measurement(EDDMetadata, EDDSerialize):
         return self.compartment == Measurement.Compartment.EXTRACELLULAR
 
     def data(self):
-        """ Return the data associated with this measurement. """
-        return self.measurementvalue_set.all()
+        """
+        Return the data associated with this measurement; the MeasurementValue rows,
+        followed by unsaved MeasurementValue objects for any points in a PackedSeries.
+        """
+        values = list(self.measurementvalue_set.all())
+        try:
+            values.extend(self.packed.values())
+        except PackedSeries.DoesNotExist:
+            pass
+        return values
 
     @property
     def name(self):
@@ -1184,11 +1330,9 @@ class Measurement(EDDMetadata, EDDSerialize):
 
     # TODO also handle vectors
     def extract_data_xvalues(self, defined_only=False):
-        qs = self.measurementvalue_set.all()
-        if defined_only:
-            qs = qs.exclude(Q(y=None) | Q(y__len=0))
-        # first index unpacks single value from tuple; second index unpacks first value from X
-        return [x[0][0] for x in qs.values_list("x")]
+        values = self.valid_data() if defined_only else self.data()
+        # index unpacks first value from X
+        return [value.x[0] for value in values]
 
     # this shouldn't need to handle vectors
     def interpolate_at(self, x):
@@ -1258,3 +1402,212 @@ class MeasurementValue(models.Model):
 
     def is_defined(self):
         return self.y is not None and len(self.y) > 0
+
+
+class PackedSeries(models.Model):
+    """
+    Compact storage for the values of a Measurement in Measurement.Format.SCALAR. Each
+    point is an item in arrays of x and y values, instead of a MeasurementValue row; a
+    point without a defined y value has a null y item. The values of a Measurement are
+    its MeasurementValue rows plus the points of its PackedSeries, if any; the
+    MeasurementPoint view reads both as rows. Code writing individual values as rows
+    unpacks the series first; the edd_pack_values command packs them again.
+    """
+
+    class Meta:
+        db_table = "measurement_packed"
+        verbose_name_plural = _("Packed Series")
+
+    measurement = models.OneToOneField(
+        Measurement,
+        help_text=_("The Measurement containing these points of data."),
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="packed",
+        verbose_name=_("Measurement"),
+    )
+    study = models.ForeignKey(
+        Study,
+        help_text=_("The Study containing these points."),
+        on_delete=models.CASCADE,
+        verbose_name=_("Study"),
+    )
+    x = ArrayField(
+        models.FloatField(),
+        help_text=_("X-axis value of each point, sorted."),
+        verbose_name=_("X"),
+    )
+    y = ArrayField(
+        models.FloatField(null=True),
+        help_text=_("Y-axis value of each point, in the same order as X."),
+        verbose_name=_("Y"),
+    )
+    updated = models.ForeignKey(
+        Update,
+        help_text=_("The Update triggering the latest setting of these points."),
+        on_delete=models.PROTECT,
+        verbose_name=_("Updated"),
+    )
+
+    def __str__(self):
+        return "PackedSeries{%d}{%d points}" % (self.measurement_id, len(self.x))
+
+    def points(self):
+        """ Pairs of ([x], [y]) lists for each point, the same shape as MeasurementValue. """
+        return [([x], [] if y is None else [y]) for x, y in zip(self.x, self.y)]
+
+    def values(self):
+        """ Creates unsaved MeasurementValue objects for the points of the series. """
+        return [
+            MeasurementValue(
+                measurement_id=self.measurement_id,
+                study_id=self.study_id,
+                updated_id=self.updated_id,
+                x=x,
+                y=y,
+            )
+            for x, y in self.points()
+        ]
+
+    @classmethod
+    def pack(cls, measurements, batch_size=500):
+        """
+        Moves the MeasurementValue rows of scalar measurements into packed series.
+        Measurements with any value that is not a single x and at most one y are left
+        as rows. Points in the rows replace packed points at the same x value. A series
+        keeps a single Update, the latest of its points; the Update of each point is
+        lost, and points unpacked later all refer to the latest Update.
+
+        :param measurements: QuerySet of Measurement to pack
+        :param batch_size: number of measurements packed in each transaction
+        :returns: the number of measurements packed
+        """
+        values = MeasurementValue.objects.filter(measurement_id=OuterRef("pk"))
+        irregular = values.exclude(x__len=1, y__len__lte=1)
+        ids = list(
+            measurements.filter(measurement_format=Measurement.Format.SCALAR)
+            .annotate(has_values=Exists(values), irregular=Exists(irregular))
+            .filter(has_values=True, irregular=False)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        for start in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                cls._pack_batch(ids[start : start + batch_size])
+        return len(ids)
+
+    @classmethod
+    def _pack_batch(cls, ids):
+        existing = cls.objects.select_for_update().in_bulk(ids)
+        series = {}
+        for pk, packed in existing.items():
+            series[pk] = (packed, dict(zip(packed.x, packed.y)))
+        rows = MeasurementValue.objects.filter(measurement_id__in=ids).values_list(
+            "pk", "measurement_id", "study_id", "updated_id", "x", "y"
+        )
+        # only delete rows read here, rows written in the meantime stay as rows
+        moved = []
+        for pk, measurement_id, study_id, updated_id, x, y in rows.iterator():
+            moved.append(pk)
+            if measurement_id not in series:
+                packed = cls(measurement_id=measurement_id, study_id=study_id)
+                series[measurement_id] = (packed, {})
+            packed, points = series[measurement_id]
+            packed.updated_id = max(packed.updated_id or 0, updated_id)
+            points[float(x[0])] = float(y[0]) if y else None
+        for packed, points in series.values():
+            packed.x = sorted(points)
+            packed.y = [points[x] for x in packed.x]
+        cls.objects.bulk_create(
+            [
+                packed
+                for packed, _ in series.values()
+                if packed.measurement_id not in existing
+            ]
+        )
+        cls.objects.bulk_update(existing.values(), ["x", "y", "updated"])
+        MeasurementValue.objects.filter(pk__in=moved).delete()
+
+    @classmethod
+    def unpack(cls, measurements, batch_size=500):
+        """
+        Moves the points of packed series back into MeasurementValue rows, e.g. before
+        editing individual values.
+
+        :param measurements: QuerySet of Measurement to unpack
+        :param batch_size: number of measurements unpacked in each transaction
+        :returns: the number of measurements unpacked
+        """
+        ids = list(
+            cls.objects.filter(measurement__in=measurements.order_by().values("pk"))
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        for start in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                batch_ids = ids[start : start + batch_size]
+                batch = cls.objects.select_for_update().filter(pk__in=batch_ids)
+                values = list(chain.from_iterable(packed.values() for packed in batch))
+                MeasurementValue.objects.bulk_create(values, batch_size=batch_size)
+                cls.objects.filter(pk__in=batch_ids).delete()
+        return len(ids)
+
+
+class MeasurementPoint(models.Model):
+    """
+    Read-only view of all values of measurements: the MeasurementValue rows, plus a
+    row for each point of a PackedSeries. Rows of packed points have negative IDs,
+    derived from the measurement and the position of the point, so all rows can be
+    paged by ID. A packed point without a y value has an empty y.
+    """
+
+    class Meta:
+        db_table = "measurement_point"
+        managed = False
+
+    id = models.BigIntegerField(primary_key=True)
+    study = models.ForeignKey(
+        Study,
+        help_text=_("The Study containing this Value."),
+        on_delete=models.DO_NOTHING,
+        related_name="+",
+        verbose_name=_("Study"),
+    )
+    measurement = models.ForeignKey(
+        Measurement,
+        help_text=_("The Measurement containing this point of data."),
+        on_delete=models.DO_NOTHING,
+        related_name="points",
+        verbose_name=_("Measurement"),
+    )
+    x = ArrayField(
+        models.DecimalField(max_digits=16, decimal_places=5),
+        help_text=_("X-axis value(s) for this point."),
+        verbose_name=_("X"),
+    )
+    y = ArrayField(
+        models.DecimalField(max_digits=16, decimal_places=5),
+        help_text=_("Y-axis value(s) for this point."),
+        verbose_name=_("Y"),
+    )
+    updated = models.ForeignKey(
+        Update,
+        help_text=_("The Update triggering the setting of this point."),
+        on_delete=models.DO_NOTHING,
+        related_name="+",
+        verbose_name=_("Updated"),
+    )
+
+    def __str__(self):
+        return "(%s, %s)" % (self.x, self.y)
+
+    @property
+    def fx(self):
+        return float(self.x[0]) if self.x else None
+
+    @property
+    def fy(self):
+        return float(self.y[0]) if self.y else None
+
+    def is_defined(self):
+        return self.y is not None and len(self.y) > 0
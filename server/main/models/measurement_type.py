@@ -11,6 +11,7 @@ import requests
 from celery.exceptions import Retry
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.db import models, transaction
 from django.utils.translation import ugettext as _u
@@ -36,6 +37,19 @@ class MeasurementType(EDDSerialize, models.Model):
 
     class Meta:
         db_table = "measurement_type"
+        # trigram index for autocomplete searches on names
+        indexes = [
+            GinIndex(
+                fields=["type_name"],
+                name="measurement_type_name_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["short_name"],
+                name="measurement_type_short_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     class Group(object):
         """
@@ -10,6 +10,7 @@ from importlib import import_module
 from uuid import uuid4
 
 from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.db.models import F, Func
 from django.utils.encoding import python_2_unicode_compatible
@@ -47,6 +48,14 @@ class MetadataGroup(models.Model):
 
     class Meta:
         db_table = "metadata_group"
+        # trigram index for autocomplete searches on names
+        indexes = [
+            GinIndex(
+                fields=["group_name"],
+                name="metadata_group_name_trgm",
+                opclasses=["gin_trgm_ops"],
+            )
+        ]
 
     group_name = models.CharField(
         help_text=_("Name of the group/class of metadata."),
@@ -73,6 +82,14 @@ class MetadataType(models.Model, EDDSerialize):
     class Meta:
         db_table = "metadata_type"
         unique_together = (("type_name", "for_context"),)
+        # trigram index for autocomplete searches on names
+        indexes = [
+            GinIndex(
+                fields=["type_name"],
+                name="metadata_type_name_trgm",
+                opclasses=["gin_trgm_ops"],
+            )
+        ]
 
     # optionally link several metadata types into a common group
     group = models.ForeignKey(
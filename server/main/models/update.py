@@ -3,13 +3,19 @@
 Models and related classes for dealing with Update objects.
 """
 
+from collections import defaultdict
+
 import arrow
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
-from threadlocals.threadlocals import get_current_request
+from threadlocals.threadlocals import (
+    get_current_request,
+    get_thread_variable,
+    set_thread_variable,
+)
 
 from .common import EDDSerialize
 
@@ -19,6 +25,86 @@ class UpdateManager(models.Manager):
         return super(UpdateManager, self).get_queryset().select_related("mod_by")
 
 
+class BulkUpdate(object):
+    """
+    Context manager for operations saving many objects, e.g. imports or cloning lines.
+    Every object saved inside the context gets the same Update, and the rows adding that
+    Update to the updates of each object are written with a single bulk insert when the
+    context exits. Contexts nest; an inner context joins the outer one.
+
+        with BulkUpdate(user=user, path="clone lines"):
+            for line in lines:
+                line.save()
+    """
+
+    _key = "bulk_update"
+
+    def __init__(self, update=None, user=None, path=None, batch_size=None):
+        """
+        :param update: (optional) the Update to use; by default, one is created with
+            Update.load_update() on entering the context
+        :param user: (optional) the user passed to Update.load_update()
+        :param path: (optional) the path passed to Update.load_update()
+        :param batch_size: (optional) maximum rows in each insert; defaults to the
+            EDD_BULK_UPDATE_BATCH_SIZE setting, or 1000
+        """
+        self.update = update
+        self._user = user
+        self._path = path
+        if batch_size is None:
+            batch_size = getattr(settings, "EDD_BULK_UPDATE_BATCH_SIZE", 1000)
+        self._batch_size = batch_size
+        self._outer = None
+        # maps (through model, object field, update field) to set of (object, update) IDs
+        self._pending = defaultdict(set)
+
+    @classmethod
+    def current(cls):
+        """ Finds the BulkUpdate active in the current thread, if any. """
+        return get_thread_variable(cls._key)
+
+    def __enter__(self):
+        self._outer = self.current()
+        if self._outer is not None:
+            return self._outer
+        if self.update is None:
+            self.update = Update.load_update(user=self._user, path=self._path)
+        set_thread_variable(self._key, self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._outer is not None:
+            return False
+        set_thread_variable(self._key, None)
+        # when leaving on an exception, the transaction is likely to roll back anyway
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def flush(self):
+        """ Writes all collected rows of object updates. """
+        for (through, source, target), pairs in self._pending.items():
+            rows = [
+                through(**{source: object_id, target: update_id})
+                for object_id, update_id in pairs
+            ]
+            through.objects.bulk_create(
+                rows, batch_size=self._batch_size, ignore_conflicts=True
+            )
+        self._pending.clear()
+
+    def log(self, instance):
+        """ Collects a row adding the Update of an object to its updates. """
+        field = instance._meta.get_field("updates")
+        through = field.remote_field.through
+        key = (
+            through,
+            through._meta.get_field(field.m2m_field_name()).attname,
+            through._meta.get_field(field.m2m_reverse_field_name()).attname,
+        )
+        self._pending[key].add((instance.pk, instance.updated_id))
+
+
 @python_2_unicode_compatible
 class Update(models.Model, EDDSerialize):
     """ A user update; referenced from other models that track creation and/or modification.
@@ -77,6 +163,9 @@ class Update(models.Model, EDDSerialize):
             script name and arguments here.
         :return: an Update instance persisted to the database
         """
+        bulk = BulkUpdate.current()
+        if bulk is not None:
+            return bulk.update
         User = get_user_model()
         request = get_current_request()
         if request is None:
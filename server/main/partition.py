@@ -0,0 +1,157 @@
+# coding: utf-8
+"""
+Declarative partitioning of the measurement_value table by study. Values are spread
+over a fixed number of hash partitions of study_id, so that queries filtered to a study
+scan a single partition, and deleting or vacuuming the values of a study only touches
+that partition. Partitioning requires PostgreSQL 11 or later.
+"""
+
+import logging
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL 11 adds hash partitions, and indexes and foreign keys on partitioned tables
+MINIMUM_VERSION = 110000
+TABLE = "measurement_value"
+
+
+class PartitionError(Exception):
+    pass
+
+
+def partition_count(connection, table=TABLE):
+    """
+    Counts partitions of a table.
+
+    :param connection: the database connection
+    :param table: (optional) name of the table; defaults to measurement_value
+    :returns: the number of partitions, or 0 when the table is not partitioned
+    """
+    if connection.pg_version < MINIMUM_VERSION:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(i.inhrelid) FROM pg_partitioned_table p "
+            "LEFT JOIN pg_inherits i ON i.inhparent = p.partrelid "
+            "WHERE p.partrelid = %s::regclass",
+            [table],
+        )
+        return cursor.fetchone()[0]
+
+
+def repartition(connection, partitions, table=TABLE):
+    """
+    Rebuilds a table as hash partitions of study_id, or as a plain table when the
+    number of partitions is 0. Rows are copied to the new table in one transaction,
+    holding an exclusive lock on the table for the whole copy; run during a
+    maintenance window on large databases.
+
+    :param connection: the database connection
+    :param partitions: the number of partitions, or 0 for no partitions
+    :param table: (optional) name of the table; defaults to measurement_value
+    :raises PartitionError: if the database does not support partitioning
+    """
+    if partitions < 0:
+        raise PartitionError(f"Invalid number of partitions {partitions}")
+    if partitions and connection.pg_version < MINIMUM_VERSION:
+        raise PartitionError("Partitioning measurement values requires PostgreSQL 11")
+    qn = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # a table with pending deferred constraint checks cannot be altered
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+        # indexes, constraints, and sequence are re-created on the new table
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = %s::regclass AND NOT indisprimary",
+            [table],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('c', 'f')",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        # views reading the table, e.g. measurement_point, block dropping it
+        cursor.execute(
+            "SELECT DISTINCT v.relname, pg_get_viewdef(v.oid) FROM pg_depend d "
+            "JOIN pg_rewrite r ON r.oid = d.objid "
+            "JOIN pg_class v ON v.oid = r.ev_class "
+            "WHERE d.classid = 'pg_rewrite'::regclass "
+            "AND d.refobjid = %s::regclass AND v.relkind = 'v'",
+            [table],
+        )
+        views = cursor.fetchall()
+        statements = rebuild_statements(
+            qn, partitions, indexes, constraints, sequence, table=table, views=views
+        )
+        for statement in statements:
+            cursor.execute(statement)
+    logger.info(f"Rebuilt {table} with {partitions} partitions")
+
+
+def rebuild_statements(
+    quote_name, partitions, indexes, constraints, sequence, table=TABLE, views=()
+):
+    """
+    Creates the SQL statements rebuilding a table, with hash partitions of study_id
+    when the number of partitions is more than 0.
+
+    :param quote_name: function quoting names for the database
+    :param partitions: the number of partitions, or 0 for no partitions
+    :param indexes: definitions of the non-primary indexes of the table
+    :param constraints: pairs of (name, definition) for check and foreign key
+        constraints of the table
+    :param sequence: name of the sequence for the id column
+    :param table: (optional) name of the table; defaults to measurement_value
+    :param views: (optional) pairs of (name, definition) for views of the table
+    :returns: a list of SQL statements
+    """
+    qn = quote_name
+    new_table = f"{table}_new"
+    partition_by = " PARTITION BY HASH (study_id)" if partitions else ""
+    # build and fill the new table
+    statements = [
+        f"CREATE TABLE {qn(new_table)} "
+        f"(LIKE {qn(table)} INCLUDING DEFAULTS){partition_by}"
+    ]
+    statements.extend(
+        f"CREATE TABLE {qn(f'{new_table}_p{i}')} PARTITION OF {qn(new_table)} "
+        f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})"
+        for i in range(partitions)
+    )
+    statements.append(f"INSERT INTO {qn(new_table)} SELECT * FROM {qn(table)}")
+    # swap in the new table; dropping the old table also drops old partitions
+    statements.extend(f"DROP VIEW {qn(name)}" for name, _ in views)
+    statements += [
+        f"ALTER SEQUENCE {sequence} OWNED BY NONE",
+        f"DROP TABLE {qn(table)}",
+        f"ALTER TABLE {qn(new_table)} RENAME TO {qn(table)}",
+    ]
+    statements.extend(
+        f"ALTER TABLE {qn(f'{new_table}_p{i}')} RENAME TO {qn(f'{table}_p{i}')}"
+        for i in range(partitions)
+    )
+    # primary key of a partitioned table must include the partition key
+    key = "id, study_id" if partitions else "id"
+    statements.append(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY ({key})")
+    # indexes of a partitioned table are defined ON ONLY the parent table; the
+    #   re-created index must also apply to the new partitions
+    statements.extend(index.replace(" ON ONLY ", " ON ", 1) for index in indexes)
+    statements.extend(
+        f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}"
+        for name, definition in constraints
+    )
+    statements.extend(
+        f"CREATE VIEW {qn(name)} AS {definition}" for name, definition in views
+    )
+    statements += [
+        f"ALTER SEQUENCE {sequence} OWNED BY {qn(table)}.id",
+        f"ANALYZE {qn(table)}",
+    ]
+    return statements
@@ -0,0 +1,191 @@
+# coding: utf-8
+"""
+Prepares measurement values for plotting. Values are aggregated per measurement in the
+database, measurements are paged with a cursor on the measurement ID, and long series
+of values can be downsampled to a budget of points per series.
+"""
+
+import logging
+import math
+
+from django.conf import settings
+from django.contrib.postgres.fields import JSONField
+from django.db.models import Aggregate, Count
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+
+class ValuePairs(Aggregate):
+    """
+    Aggregates the x and y arrays of MeasurementValue rows into a JSON array of
+    [x, y] pairs, sorted by x.
+    """
+
+    function = "jsonb_agg"
+    template = (
+        "%(function)s(jsonb_build_array(%(expressions)s) ORDER BY %(expressions)s)"
+    )
+
+    def __init__(self, x="x", y="y", **extra):
+        super().__init__(x, y, output_field=JSONField(), **extra)
+
+
+def _scalar_points(values):
+    # converts [[x], [y]] pairs to (x, y) floats; None when any pair is not scalar
+    points = []
+    for x, y in values:
+        if len(x) != 1 or len(y) != 1:
+            return None
+        points.append((float(x[0]), float(y[0])))
+    return points
+
+
+def lttb(points, threshold):
+    """
+    Downsamples points with the Largest-Triangle-Three-Buckets algorithm, keeping the
+    points that best preserve the visual shape of the series.
+
+    :param points: list of (x, y) numeric pairs, sorted by x
+    :param threshold: maximum number of points to keep; at least three
+    :returns: list of the kept points, including the first and last points
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    # first and last points are always kept; the rest are split into buckets
+    size = (count - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(math.floor(i * size)) + 1
+        end = int(math.floor((i + 1) * size)) + 1
+        # average of next bucket is the third point of the triangle
+        next_end = min(int(math.floor((i + 2) * size)) + 1, count)
+        next_bucket = points[end:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+        ax, ay = points[a]
+        best_area = -1
+        a_next = start
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                a_next = j
+        sampled.append(points[a_next])
+        a = a_next
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points, threshold):
+    """
+    Downsamples points by keeping the minimum and maximum y value of each bucket of
+    consecutive points, so that peaks are never dropped.
+
+    :param points: list of (x, y) numeric pairs, sorted by x
+    :param threshold: maximum number of points to keep; at least two
+    :returns: list of the kept points, in x order
+    """
+    count = len(points)
+    if threshold >= count or threshold < 2:
+        return list(points)
+    buckets = threshold // 2
+    size = count / buckets
+    sampled = []
+    for i in range(buckets):
+        bucket = points[int(i * size) : int((i + 1) * size)]
+        if not bucket:
+            continue
+        low = min(bucket, key=lambda p: p[1])
+        high = max(bucket, key=lambda p: p[1])
+        sampled.extend(sorted({low, high}))
+    return sampled
+
+
+samplers = {"lttb": lttb, "minmax": minmax}
+
+
+class PlotData(object):
+    """
+    Builds pages of measurements and their values for plotting.
+    """
+
+    def __init__(self, measurements, limit=None, points=None, method="lttb"):
+        """
+        :param measurements: QuerySet of main.models.Measurement to plot
+        :param limit: (optional) maximum measurements in a page; defaults to the
+            EDD_PLOT_PAGE_SIZE setting, or 2000
+        :param points: (optional) maximum points kept per measurement; all points
+            are kept by default
+        :param method: name of the downsampling method, "lttb" (default) or "minmax"
+        """
+        default = getattr(settings, "EDD_PLOT_PAGE_SIZE", 2000)
+        maximum = getattr(settings, "EDD_PLOT_PAGE_MAX", 10000)
+        self.measurements = measurements
+        self.limit = max(1, min(limit or default, maximum))
+        self.points = points
+        if method not in samplers:
+            raise ValueError(f"Unknown downsampling method {method}")
+        self.sampler = samplers[method]
+
+    def page(self, cursor=None):
+        """
+        Creates a page of measurement data following the cursor.
+
+        :param cursor: (optional) ID of the last measurement of the previous page
+        :returns: dict with total_measures, types, measures, data, and a next cursor;
+            next is None on the last page
+        """
+        total_measures = (
+            self.measurements.order_by()
+            .values("assay_id")
+            .annotate(count=Count("assay_id"))
+        )
+        measurements = self.measurements.order_by("pk")
+        if cursor is not None:
+            measurements = measurements.filter(pk__gt=cursor)
+        # fetch one extra to know if there is a next page
+        measure_list = list(measurements[: self.limit + 1])
+        has_next = len(measure_list) > self.limit
+        measure_list = measure_list[: self.limit]
+        ids = [m.pk for m in measure_list]
+        types = models.MeasurementType.objects.filter(measurement__in=ids).distinct()
+        return {
+            "total_measures": {x["assay_id"]: x["count"] for x in total_measures},
+            "types": {t.pk: t.to_json() for t in types},
+            "measures": [m.to_json() for m in measure_list],
+            "data": self._values(ids),
+            "next": ids[-1] if has_next else None,
+        }
+
+    def _values(self, ids):
+        if not ids:
+            return {}
+        rows = (
+            models.MeasurementValue.objects.filter(measurement_id__in=ids)
+            .order_by()
+            .values("measurement_id")
+            .annotate(values=ValuePairs())
+            .values_list("measurement_id", "values")
+        )
+        data = dict(rows)
+        # points of packed series merge into points from rows, still sorted by x
+        packed = models.PackedSeries.objects.filter(measurement_id__in=ids)
+        for series in packed:
+            points = [list(point) for point in series.points()]
+            values = data.get(series.measurement_id, []) + points
+            data[series.measurement_id] = sorted(values, key=lambda p: p[0])
+        return {pk: self._downsample(values) for pk, values in data.items()}
+
+    def _downsample(self, values):
+        if not self.points or len(values) <= self.points:
+            return values
+        points = _scalar_points(values)
+        if points is None:
+            # only series of scalar values are downsampled
+            return values
+        return [[[x], [y]] for x, y in self.sampler(points, self.points)]
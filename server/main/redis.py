@@ -6,6 +6,8 @@ from uuid import uuid4
 from django.conf import settings
 from django_redis import get_redis_connection
 
+from .codec import JSONCodec
+
 logger = logging.getLogger(__name__)
 
 
@@ -46,17 +48,30 @@ class LatestViewedStudies(object):
 class ScratchStorage(object):
     """ Interfaces with Redis to keep scratch storage """
 
-    def __init__(self, key_prefix=None, **kwargs):
+    def __init__(self, key_prefix=None, codec=None, **kwargs):
         """
         :param key_prefix: an optional prefix to prepend to all cache entries created by this
             ScratchStorage instance.
+        :param codec: an optional codec from main.codec; when set, data is encoded before
+            saving and decoded after loading. Otherwise data is stored as-is.
         """
         super(ScratchStorage, self).__init__(**kwargs)
         self._key_prefix = key_prefix
         if self._key_prefix is None:
             self._key_prefix = f"{__name__}.{self.__class__.__name__}"
+        self._codec = codec
         self._redis = get_redis_connection(settings.EDD_LATEST_CACHE)
 
+    def _decode(self, value):
+        if self._codec is None or value is None:
+            return value
+        return self._codec.decode(value)
+
+    def _encode(self, data):
+        if self._codec is None:
+            return data
+        return self._codec.encode(data)
+
     def _key(self, name):
         return f"{self._key_prefix}:{name}"
 
@@ -85,7 +100,22 @@ class ScratchStorage(object):
         :param name: name of the value returned from ScratchStorage.save()
         :returns: the data stored at the named key.
         """
-        return self._redis.get(self._key(name))
+        return self._decode(self._redis.get(self._key(name)))
+
+    def load_many(self, names):
+        """
+        Loads data from several named keys at once.
+
+        :param names: names of values returned from ScratchStorage.save()
+        :returns: a list of the data stored at each named key, with None for any name
+            without stored data
+        """
+        names = list(names)
+        if not names:
+            return []
+        return [
+            self._decode(value) for value in self._redis.mget(*map(self._key, names))
+        ]
 
     def save(self, data, name=None, expires=None):
         """
@@ -99,7 +129,7 @@ class ScratchStorage(object):
         """
         expires = 60 * 60 * 24 if expires is None else expires
         name = self.check_name(name)
-        self._redis.set(self._key(name), data, nx=True, ex=expires)
+        self._redis.set(self._key(name), self._encode(data), nx=True, ex=expires)
         return name
 
     def expire(self, name, seconds):
@@ -129,7 +159,7 @@ class ScratchStorage(object):
         :returns: a generator of the stored values
         """
         for page in self._redis.lrange(self._key(name), 0, -1):
-            yield page
+            yield self._decode(page)
 
     def append(self, data, name=None, expires=None):
         """
@@ -144,8 +174,312 @@ class ScratchStorage(object):
         expires = 60 * 60 * 24 if expires is None else expires
         name = self.check_name(name)
         with self._redis.pipeline() as pipe:
-            pipe.rpush(self._key(name), data)
+            pipe.rpush(self._key(name), self._encode(data))
             pipe.expire(self._key(name), expires)
             result = pipe.execute()
         # (name, # of cache pages)
         return name, result[0]
+
+
+class ScratchCache(object):
+    """
+    Remembers results in ScratchStorage, on a best-effort basis. Results are only an
+    optimization, so failing to reach Redis is not an error: the failure is logged as a
+    warning, a failed load is a cache miss, and a failed save is skipped.
+    """
+
+    def __init__(self, key_prefix, label, codec=None, **kwargs):
+        """
+        :param key_prefix: the prefix for all cache entries, see ScratchStorage
+        :param label: describes what is cached in warnings, e.g. "autocomplete results"
+        :param codec: (optional) a codec from main.codec; defaults to JSONCodec
+        """
+        self._label = label
+        try:
+            self._storage = ScratchStorage(
+                key_prefix=key_prefix, codec=codec or JSONCodec(), **kwargs
+            )
+        except Exception as e:
+            logger.warning(f"Not caching {label}: {e}")
+            self._storage = None
+
+    def load(self, name):
+        """
+        Loads a cached result.
+
+        :param name: the name of the result
+        :returns: the result, or None when nothing is cached or loading failed
+        """
+        if self._storage is None:
+            return None
+        try:
+            return self._storage.load(name)
+        except Exception as e:
+            logger.warning(f"Failed loading cached {self._label}: {e}")
+            return None
+
+    def load_many(self, names):
+        """
+        Loads several cached results at once.
+
+        :param names: the names of the results
+        :returns: a list of results, with None for each name without a cached result
+        """
+        names = list(names)
+        if self._storage is None:
+            return [None] * len(names)
+        try:
+            return self._storage.load_many(names)
+        except Exception as e:
+            logger.warning(f"Failed loading cached {self._label}: {e}")
+            return [None] * len(names)
+
+    def save(self, data, name, expires=None):
+        """
+        Caches a result.
+
+        :param data: the result to cache
+        :param name: the name of the result
+        :param expires: (optional) number of seconds to keep the result; see
+            ScratchStorage.save()
+        :returns: True if the result is cached
+        """
+        if self._storage is None:
+            return False
+        try:
+            self._storage.save(data, name=name, expires=expires)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed caching {self._label}: {e}")
+            return False
+
+
+class IndexQueue(object):
+    """
+    Interfaces with Redis to collect the IDs of items changed in a search index, so
+    changes from many saves can be sent to the index together. IDs are kept in sets,
+    so repeated changes to an item only result in one update.
+    """
+
+    def __init__(self, name, key_prefix=None, **kwargs):
+        """
+        :param name: name of the index using the queue
+        :param key_prefix: an optional prefix to prepend to all keys used by the queue
+        """
+        super(IndexQueue, self).__init__(**kwargs)
+        self._name = name
+        self._key_prefix = key_prefix
+        if self._key_prefix is None:
+            self._key_prefix = f"{__name__}.{self.__class__.__name__}"
+        self._redis = get_redis_connection(settings.EDD_LATEST_CACHE)
+
+    def _key(self, kind):
+        return f"{self._key_prefix}:{self._name}:{kind}"
+
+    def _pop(self, kind, count):
+        return [int(value) for value in self._redis.spop(self._key(kind), count)]
+
+    def add(self, *ids):
+        """
+        Marks IDs as needing an update in the index.
+
+        :param ...ids: one or more IDs of items to update
+        """
+        with self._redis.pipeline() as pipe:
+            pipe.sadd(self._key("update"), *ids)
+            pipe.srem(self._key("remove"), *ids)
+            pipe.execute()
+
+    def remove(self, *ids):
+        """
+        Marks IDs as needing removal from the index.
+
+        :param ...ids: one or more IDs of items to remove
+        """
+        with self._redis.pipeline() as pipe:
+            pipe.sadd(self._key("remove"), *ids)
+            pipe.srem(self._key("update"), *ids)
+            pipe.execute()
+
+    def claim(self, expires):
+        """
+        Claims the job of scheduling the next flush of the queue. Only the first
+        claim succeeds, until the claim is released or expires.
+
+        :param expires: number of seconds until the claim expires
+        :returns: True if the claim succeeded and the caller must schedule a flush
+        """
+        return bool(self._redis.set(self._key("scheduled"), 1, nx=True, ex=expires))
+
+    def release(self):
+        """ Releases a claim, so that later changes schedule a new flush. """
+        self._redis.delete(self._key("scheduled"))
+
+    def pop_updates(self, count):
+        """
+        Takes IDs needing an update out of the queue.
+
+        :param count: maximum number of IDs to take
+        :returns: a list of IDs
+        """
+        return self._pop("update", count)
+
+    def pop_removals(self, count):
+        """
+        Takes IDs needing removal out of the queue.
+
+        :param count: maximum number of IDs to take
+        :returns: a list of IDs
+        """
+        return self._pop("remove", count)
+
+
+class IceLinkQueue(IndexQueue):
+    """
+    Interfaces with Redis to collect the IDs of strains with changed links to a study,
+    so that the links in ICE are updated together. Strains to link replace earlier
+    changes to unlink the same strain, and vice versa.
+    """
+
+    def __init__(self, study_id, **kwargs):
+        """
+        :param study_id: the ID of the study in the links
+        """
+        super().__init__(f"study:{study_id}", **kwargs)
+
+    def link(self, *ids):
+        """ Marks strain IDs as needing a link to the study. """
+        self.add(*ids)
+
+    def unlink(self, *ids):
+        """ Marks strain IDs as needing removal of links to the study. """
+        self.remove(*ids)
+
+    def pop_links(self, count):
+        """ Takes up to count strain IDs needing a link out of the queue. """
+        return self.pop_updates(count)
+
+    def pop_unlinks(self, count):
+        """ Takes up to count strain IDs needing removal of a link out of the queue. """
+        return self.pop_removals(count)
+
+
+class StudyAccessCache(object):
+    """
+    Interfaces with Redis to keep sets of the IDs of studies a user can access. All
+    cached sets are invalidated together, by incrementing a version number that is
+    part of every key.
+    """
+
+    def __init__(self, key_prefix=None, **kwargs):
+        """
+        :param key_prefix: an optional prefix to prepend to all keys used by the cache
+        """
+        super(StudyAccessCache, self).__init__(**kwargs)
+        self._key_prefix = key_prefix
+        if self._key_prefix is None:
+            self._key_prefix = f"{__name__}.{self.__class__.__name__}"
+        self._redis = get_redis_connection(settings.EDD_LATEST_CACHE)
+
+    def _key(self, user, access):
+        version = int(self._redis.get(f"{self._key_prefix}:version") or 0)
+        access = "".join(sorted(access))
+        return f"{self._key_prefix}:{version}:{user.pk}:{access}"
+
+    def invalidate(self):
+        """ Invalidates all cached sets of study IDs. """
+        self._redis.incr(f"{self._key_prefix}:version")
+
+    def load(self, user, access):
+        """
+        Loads the cached study IDs a user can access.
+
+        :param user: the user
+        :param access: iterable of permission types granting access
+        :returns: a tuple of (key, IDs); the IDs are None when nothing is cached
+        """
+        key = self._key(user, access)
+        with self._redis.pipeline() as pipe:
+            pipe.exists(key)
+            pipe.smembers(key)
+            exists, members = pipe.execute()
+        if not exists:
+            return key, None
+        # an empty set cannot be stored in Redis, so a placeholder is added
+        return key, [int(pk) for pk in members if pk != b""]
+
+    def save(self, key, ids, expires=None):
+        """
+        Saves the study IDs a user can access.
+
+        :param key: the key returned from StudyAccessCache.load()
+        :param ids: iterable of study IDs
+        :param expires: (optional) number of seconds until the cached IDs expire;
+            defaults to one hour
+        """
+        expires = 60 * 60 if expires is None else expires
+        with self._redis.pipeline() as pipe:
+            pipe.sadd(key, "", *ids)
+            pipe.expire(key, expires)
+            pipe.execute()
+
+
+class PayloadCache(object):
+    """
+    Interfaces with Redis to keep serialized payloads built from the database. Each
+    payload is stored under the versions of the named sources it was built from; when
+    a source changes, incrementing its version makes the payloads built from it stale.
+    """
+
+    def __init__(self, key_prefix=None, **kwargs):
+        """
+        :param key_prefix: an optional prefix to prepend to all keys used by the cache
+        """
+        super(PayloadCache, self).__init__(**kwargs)
+        self._key_prefix = key_prefix
+        if self._key_prefix is None:
+            self._key_prefix = f"{__name__}.{self.__class__.__name__}"
+        self._redis = get_redis_connection(settings.EDD_LATEST_CACHE)
+
+    def _version_key(self, source):
+        return f"{self._key_prefix}:version:{source}"
+
+    def invalidate(self, *sources):
+        """ Increments the versions of the named sources. """
+        with self._redis.pipeline() as pipe:
+            for source in sources:
+                pipe.incr(self._version_key(source))
+            pipe.execute()
+
+    def versions(self, *sources):
+        """
+        Finds the current versions of the named sources.
+
+        :returns: a string combining the sources and their versions, identifying
+            payloads built from those sources
+        """
+        values = self._redis.mget(*(self._version_key(s) for s in sources))
+        return "-".join(f"{s}.{int(v or 0)}" for s, v in zip(sources, values))
+
+    def load(self, name, version):
+        """
+        Loads a cached payload.
+
+        :param name: name of the payload
+        :param version: the version string from PayloadCache.versions()
+        :returns: the payload bytes, or None when nothing is cached
+        """
+        return self._redis.get(f"{self._key_prefix}:{name}:{version}")
+
+    def save(self, name, version, payload, expires=None):
+        """
+        Saves a payload.
+
+        :param name: name of the payload
+        :param version: the version string from PayloadCache.versions()
+        :param payload: the serialized payload
+        :param expires: (optional) number of seconds until the payload expires;
+            defaults to one day
+        """
+        expires = 60 * 60 * 24 if expires is None else expires
+        self._redis.set(f"{self._key_prefix}:{name}:{version}", payload, ex=expires)
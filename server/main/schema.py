@@ -119,7 +119,7 @@ class MeasurementValueNode(StudyAccessMixin, DjangoObjectType):
 
     class Meta:
         interfaces = (graphene.Node,)
-        model = models.MeasurementValue
+        model = models.MeasurementPoint
 
 
 class Query(object):
@@ -148,3 +148,14 @@ class Query(object):
     all_values = gfilter.DjangoFilterConnectionField(
         MeasurementValueNode, filterset_class=rest_views.MeasurementValueFilter
     )
+
+    def resolve_all_values(self, info, **kwargs):
+        # values include the points of packed series, limited to readable studies
+        queryset = models.MeasurementPoint.objects.all()
+        user = info.context.user
+        if not models.Study.user_role_can_read(user):
+            access = models.Study.access_filter(
+                user, via=MeasurementValueNode._filter_joins
+            )
+            queryset = queryset.filter(access).distinct()
+        return queryset
@@ -3,6 +3,7 @@
 #   this directory to the signals module.
 
 from .core import *  # noqa: F401, F403
+from .edddata import *  # noqa: F401, F403
 from .permission import *  # noqa: F401, F403
 from .sbml import *  # noqa: F401, F403
 from .solr import *  # noqa: F401, F403
@@ -17,8 +17,9 @@ from django.db.models.signals import (
 )
 
 from .. import models, tasks
+from ..redis import IceLinkQueue
 from .dispatcher import receiver
-from .signals import study_modified
+from .signals import lines_created, lines_modified, study_modified
 
 logger = logging.getLogger(__name__)
 
@@ -88,7 +89,11 @@ def log_update(sender, instance, created, raw, using, **kwargs):
     if raw:
         # cannot access database when doing raw signal
         return
-    instance.updates.add(instance.updated)
+    bulk = models.BulkUpdate.current()
+    if bulk is None:
+        instance.updates.add(instance.updated)
+    else:
+        bulk.log(instance)
 
 
 # ----- Study signal handlers -----
@@ -156,7 +161,7 @@ def study_update_ice(sender, instance, created, raw, using, **kwargs):
     )
     queryset = models.Strain.objects.filter(eligible).distinct()
     to_link = set(queryset.values_list("id", flat=True))
-    partial = functools.partial(submit_ice_link, instance, to_link)
+    partial = functools.partial(submit_ice_link, instance.pk, to_link)
     connection.on_commit(partial)
 
 
@@ -215,6 +220,37 @@ def line_removed(sender, instance, **kwargs):
     connection.on_commit(partial)
 
 
+@receiver(lines_created)
+def lines_created_ice(sender, study_id, strain_ids, using, **kwargs):
+    """
+    Links the study to the ICE entries of strains used in lines created in bulk, where
+    m2m_changed is not sent for each line.
+    """
+    if not strain_ids or check_ice_cannot_proceed():
+        return
+    connection.on_commit(functools.partial(submit_ice_link, study_id, strain_ids))
+
+
+@receiver(lines_modified)
+def lines_modified_ice(
+    sender, study_id, added_strain_ids, removed_strain_ids, using, **kwargs
+):
+    """
+    Updates ICE entries of strains added to or removed from a study by changes to
+    lines in bulk, where m2m_changed is not sent for each line.
+    """
+    if check_ice_cannot_proceed():
+        return
+    if added_strain_ids:
+        connection.on_commit(
+            functools.partial(submit_ice_link, study_id, added_strain_ids)
+        )
+    if removed_strain_ids:
+        connection.on_commit(
+            functools.partial(submit_ice_unlink, study_id, removed_strain_ids)
+        )
+
+
 @receiver(m2m_changed, sender=models.Line.strains.through)
 def line_strain_changed(
     sender, instance, action, reverse, model, pk_set, using, **kwargs
@@ -261,37 +297,48 @@ def strain_removed(line, pk_set):
 
 def submit_ice_unlink(study_id, to_remove):
     """
-    Schedules tasks to unlink the given study from every ICE entry in to_remove.
+    Queues removal of links to the given study from every ICE entry in to_remove.
 
     :param study_id: ID of Study to be unlinked
     :param to_remove: iterable of IDs for Strains to be unlinked
     """
-    for strain in to_remove:
-        try:
-            tasks.unlink_ice_entry_from_study.delay(strain, study_id)
-        except tasks.unlink_ice_entry_from_study.OperationalError:  # pragma: no cover
-            # this happens when the message queue goes away
-            logger.error(
-                "Failed to submit task unlink_ice_entry_from_study(%d, %d)",
-                strain,
-                study_id,
-            )
+    queue_ice_links(study_id, to_remove, unlink=True)
 
 
 def submit_ice_link(study_id, to_link):
     """
-    Schedules tasks to link the given study to every ICE entry in to_link.
+    Queues links to the given study for every ICE entry in to_link.
 
     :param study_id: ID of Study to be linked
     :param to_link: iterable of IDs for Strains to be linked
     """
-    for strain in to_link:
+    queue_ice_links(study_id, to_link)
+
+
+def queue_ice_links(study_id, strain_ids, unlink=False):
+    """
+    Queues changes to the links in ICE between a study and strains, and schedules a
+    task to send the queued changes if one is not already scheduled for the study.
+    Changing many lines in a short time will then result in a single task per study.
+
+    :param study_id: ID of the Study in the links
+    :param strain_ids: iterable of IDs for Strains in the links
+    :param unlink: True if the links are removed
+    """
+    strain_ids = list(strain_ids)
+    if not strain_ids:
+        return
+    queue = IceLinkQueue(study_id)
+    if unlink:
+        queue.unlink(*strain_ids)
+    else:
+        queue.link(*strain_ids)
+    delay = getattr(settings, "ICE_LINK_QUEUE_DELAY", 5)
+    # claim expires in case the scheduled task is lost
+    if queue.claim(delay + 60):
         try:
-            tasks.link_ice_entry_to_study.delay(strain, study_id)
-        except tasks.link_ice_entry_to_study.OperationalError:  # pragma: no cover
+            tasks.sync_ice_links.apply_async(args=(study_id,), countdown=delay)
+        except tasks.sync_ice_links.OperationalError:  # pragma: no cover
             # this happens when the message queue goes away
-            logger.error(
-                "Failed to submit task link_ice_entry_to_study(%d, %d)",
-                strain,
-                study_id,
-            )
+            queue.release()
+            logger.error("Failed to submit task sync_ice_links(%d)", study_id)
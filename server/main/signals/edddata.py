@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from edd.profile.models import UserProfile
+
+from .. import models
+from ..redis import PayloadCache
+from .dispatcher import receiver
+from .signals import lines_created, lines_modified, study_modified
+
+logger = logging.getLogger(__name__)
+# items appearing in the EDDData of a study
+study_items = (models.Line, models.Assay, models.Measurement)
+# shared items, filtered down to those used in the EDDData of a study
+shared_items = (
+    models.CarbonSource,
+    models.GeneIdentifier,
+    models.MeasurementType,
+    models.Metabolite,
+    models.Phosphor,
+    models.ProteinIdentifier,
+    models.Protocol,
+    models.Strain,
+)
+# items appearing in the EDDData common to all studies
+misc_items = (
+    get_user_model(),
+    models.MeasurementUnit,
+    models.MetadataType,
+    UserProfile,
+)
+
+
+def study_source(study_id):
+    """ Name of the cached payload source for items belonging to a study. """
+    return f"study:{study_id}"
+
+
+def invalidate_payloads(*sources):
+    """
+    Invalidates cached EDDData payloads built from the named sources. Done both
+    immediately and again after the transaction commits, so that a payload built
+    from the state before the commit is not kept.
+    """
+
+    def invalidate():
+        try:
+            PayloadCache().invalidate(*sources)
+        except Exception as e:
+            logger.error(f"Failed to invalidate cached EDDData: {e}")
+
+    invalidate()
+    connection.on_commit(invalidate)
+
+
+@receiver(study_modified)
+def study_payload_modified(sender, study, using, **kwargs):
+    invalidate_payloads(study_source(study.pk))
+
+
+@receiver((lines_created, lines_modified))
+def study_lines_created(sender, study_id, **kwargs):
+    invalidate_payloads(study_source(study_id))
+
+
+@receiver((post_save, post_delete), sender=study_items)
+def study_item_modified(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_payloads(study_source(instance.study_id))
+
+
+@receiver((post_save, post_delete), sender=shared_items)
+def shared_item_modified(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_payloads("shared")
+
+
+@receiver((post_save, post_delete), sender=misc_items)
+def misc_item_modified(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_payloads("misc")
+
+
+@receiver(
+    m2m_changed, sender=(models.Line.strains.through, models.Line.carbon_source.through)
+)
+def line_relation_modified(sender, instance, action, reverse, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # instance is a Strain or CarbonSource, possibly used in many studies
+        invalidate_payloads("shared")
+    else:
+        invalidate_payloads(study_source(instance.study_id))
@@ -1,17 +1,48 @@
 # -*- coding: utf-8 -*-
 
-from django.db.models.signals import post_delete, post_save
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 from .. import models
+from ..redis import StudyAccessCache
 from .dispatcher import receiver
 from .signals import study_modified
 
+logger = logging.getLogger(__name__)
 permissions = (models.UserPermission, models.GroupPermission, models.EveryonePermission)
 
 
+def invalidate_access():
+    """
+    Invalidates cached sets of the studies users may access. Done both immediately and
+    again after the transaction commits, so that a set computed from the state before
+    the commit is not kept.
+    """
+
+    def invalidate():
+        try:
+            StudyAccessCache().invalidate()
+        except Exception as e:
+            logger.error(f"Failed to invalidate cached study access: {e}")
+
+    invalidate()
+    connection.on_commit(invalidate)
+
+
 @receiver((post_save, post_delete), sender=permissions)
 def permission_change(sender, instance, using, raw=False, **kwargs):
+    invalidate_access()
     # raw save == database may be inconsistent; do not forward next signal
     if raw:
         return
     study_modified.send(sender=sender, study=instance.study, using=using)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def group_membership_change(sender, action, **kwargs):
+    # group permissions apply to members, so membership changes change access
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_access()
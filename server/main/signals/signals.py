@@ -1,6 +1,14 @@
 import django.dispatch
 
 study_modified = django.dispatch.Signal(providing_args=["study", "using"])
+# sent after lines are created without saving each line, e.g. with EDDObject.bulk_insert
+lines_created = django.dispatch.Signal(
+    providing_args=["study_id", "strain_ids", "using"]
+)
+# sent after lines are changed without saving each line, e.g. bulk edits of lines
+lines_modified = django.dispatch.Signal(
+    providing_args=["study_id", "added_strain_ids", "removed_strain_ids", "using"]
+)
 study_removed = django.dispatch.Signal(providing_args=["doc", "using"])
 type_modified = django.dispatch.Signal(providing_args=["measurement_type", "using"])
 type_removed = django.dispatch.Signal(providing_args=["doc", "using"])
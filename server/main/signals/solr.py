@@ -9,7 +9,8 @@ from django.contrib.auth import get_user_model
 from django.db import connection
 from django.db.models.signals import post_delete, post_save, pre_delete
 
-from .. import models
+from .. import models, tasks
+from ..redis import IndexQueue
 from ..solr import MeasurementTypeSearch, StudySearch, UserSearch
 from .dispatcher import receiver
 from .signals import (
@@ -82,12 +83,38 @@ def type_saved(sender, instance, created, raw, using, **kwargs):
         type_modified.send(sender=sender, measurement_type=instance, using=using)
 
 
+def queue_index(index, ids, remove=False):
+    """
+    Queues changes for a Solr index, and schedules a task to send the queued changes
+    if one is not already scheduled. Saving many items in a short time will then
+    result in few requests to Solr, sent outside of the request/response cycle.
+
+    :param index: the SolrSearch object for the index
+    :param ids: iterable of primary keys of changed items
+    :param remove: True if the items are removed from the index
+    """
+    queue = IndexQueue(index.core)
+    if remove:
+        queue.remove(*ids)
+    else:
+        queue.add(*ids)
+    delay = getattr(settings, "EDD_SOLR_QUEUE_DELAY", 2)
+    # claim expires in case the scheduled task is lost
+    if queue.claim(delay + 60):
+        try:
+            tasks.index_queued.apply_async(args=(index.core,), countdown=delay)
+        except tasks.index_queued.OperationalError:  # pragma: no cover
+            # this happens when the message queue goes away
+            queue.release()
+            logger.error("Failed to submit task index_queued(%s)", index.core)
+
+
 @receiver(study_modified)
 def index_study(sender, study, using, **kwargs):
     # only submit for indexing when the database key has a matching solr key
     if using in settings.EDD_MAIN_SOLR:
         # schedule the work for after the commit (or immediately if there's no transaction)
-        connection.on_commit(functools.partial(study_index.update, [study]))
+        connection.on_commit(functools.partial(queue_index, study_index, [study.pk]))
 
 
 @receiver(type_modified)
@@ -95,7 +122,8 @@ def index_type(sender, measurement_type, using, **kwargs):
     # only submit for indexing when the database key has a matching solr key
     if using in settings.EDD_MAIN_SOLR:
         # schedule the work for after the commit (or immediately if there's no transaction)
-        connection.on_commit(functools.partial(type_index.update, [measurement_type]))
+        partial = functools.partial(queue_index, type_index, [measurement_type.pk])
+        connection.on_commit(partial)
 
 
 @receiver(user_modified)
@@ -103,7 +131,7 @@ def index_user(sender, user, using, **kwargs):
     # only submit for indexing when the database key has a matching solr key
     if using in settings.EDD_MAIN_SOLR:
         # schedule the work for after the commit (or immediately if there's no transaction)
-        connection.on_commit(functools.partial(users_index.update, [user]))
+        connection.on_commit(functools.partial(queue_index, users_index, [user.pk]))
 
 
 @receiver(study_removed)
@@ -111,7 +139,8 @@ def remove_study(sender, doc, using, **kwargs):
     # only submit for removal when the database key has a matching solr key
     if using in settings.EDD_MAIN_SOLR:
         # schedule the work for after the commit (or immediately if there's no transaction)
-        connection.on_commit(functools.partial(study_index.remove, [doc]))
+        partial = functools.partial(queue_index, study_index, [doc.id], remove=True)
+        connection.on_commit(partial)
 
 
 @receiver(type_removed)
@@ -119,7 +148,8 @@ def remove_type(sender, doc, using, **kwargs):
     # only submit for removal when the database key has a matching solr key
     if using in settings.EDD_MAIN_SOLR:
         # schedule the work for after the commit (or immediately if there's no transaction)
-        connection.on_commit(functools.partial(type_index.remove, [doc]))
+        partial = functools.partial(queue_index, type_index, [doc.id], remove=True)
+        connection.on_commit(partial)
 
 
 @receiver(user_removed)
@@ -127,4 +157,5 @@ def remove_user(sender, doc, using, **kwargs):
     # only submit for removal when the database key has a matching solr key
     if using in settings.EDD_MAIN_SOLR:
         # schedule the work for after the commit (or immediately if there's no transaction)
-        connection.on_commit(functools.partial(users_index.remove, [doc]))
+        partial = functools.partial(queue_index, users_index, [doc.id], remove=True)
+        connection.on_commit(partial)
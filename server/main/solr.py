@@ -1,17 +1,36 @@
 import logging
+import os
+import threading
+import time
 from itertools import islice
 
 import requests
 from django.conf import settings as django_settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count, F, Prefetch
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import (
+    F,
+    Func,
+    IntegerField,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    TextField,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce, Concat
+from requests.adapters import HTTPAdapter
 from six import string_types
+from urllib3.util.retry import Retry
 
 from edd import utilities
 
 from . import models
 
 logger = logging.getLogger(__name__)
+# separate logger for timing of requests, to enable/route independently of other logs
+timing_logger = logging.getLogger(f"{__name__}.timing")
 # tuple for request connection and read timeouts, respectively, in seconds
 timeout = (10, 10)
 
@@ -20,6 +39,55 @@ class SolrException(IOError):
     pass
 
 
+_session = None
+# urllib3 1.26 renamed the Retry method_whitelist argument to allowed_methods
+_retry_methods = (
+    "allowed_methods"
+    if hasattr(Retry, "DEFAULT_ALLOWED_METHODS")
+    else "method_whitelist"
+)
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Gets the requests Session shared by all Solr clients in this process. The session
+    keeps a pool of open connections to Solr, and retries failed requests with backoff.
+    Pool size and retries are set with EDD_SOLR_POOL_SIZE, EDD_SOLR_RETRIES, and
+    EDD_SOLR_RETRY_BACKOFF.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = getattr(django_settings, "EDD_SOLR_POOL_SIZE", 10)
+            retry = Retry(
+                total=getattr(django_settings, "EDD_SOLR_RETRIES", 3),
+                backoff_factor=getattr(django_settings, "EDD_SOLR_RETRY_BACKOFF", 0.2),
+                # Solr updates and deletes are by ID, so POST is safe to retry
+                **{_retry_methods: frozenset(["GET", "POST"])},
+                status_forcelist=(502, 503, 504),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _reset_session():
+    # connections must not be shared with forked processes, e.g. Celery workers
+    global _session
+    _session = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_session)
+
+
 class SolrSearch:
     """ Base class for interfacing with Solr indices. """
 
@@ -54,6 +122,28 @@ class SolrSearch:
         # chop trailing slash if present
         self.base_url = self.base_url.rstrip("/")
 
+    def _request(self, method, url, retry=True, **kwargs):
+        # sends requests through the pooled session, logging the time taken;
+        #   requests that are not safe to repeat skip the session and its retries
+        kwargs.setdefault("timeout", timeout)
+        session = get_session() if retry else requests
+        start = time.perf_counter()
+        status = None
+        try:
+            response = session.request(method, url, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            timing_logger.info(
+                f"{method} {url} to {self.core} took {elapsed:.1f}ms ({status})",
+                extra={
+                    "solr_core": self.core,
+                    "solr_ms": elapsed,
+                    "solr_status": status,
+                },
+            )
+
     def __repr__(self, *args, **kwargs):
         return self.__str__()
 
@@ -72,15 +162,30 @@ class SolrSearch:
         headers = {"content-type": "application/json"}
         try:
             # issue the request (raises IOError)
-            response = requests.post(
-                url, data=command, headers=headers, timeout=timeout
-            )
+            response = self._request("POST", url, data=command, headers=headers)
             # raises HttpError (extends IOError)
             response.raise_for_status()
         except Exception as e:
             raise SolrException(f"Failed to clear index {self}") from e
         return self
 
+    def commit(self):
+        """
+        Sends a commit command, making all pending changes to the index visible.
+
+        :raises SolrException: if an error occurs during the attempt
+        """
+        url = f"{self.url}/update/json"
+        headers = {"content-type": "application/json"}
+        try:
+            response = self._request(
+                "POST", url, data=r'{"commit":{}}', headers=headers
+            )
+            response.raise_for_status()
+        except Exception as e:
+            raise SolrException(f"Failed to commit index {self}") from e
+        return self
+
     def get_solr_payload(self, obj):
         return obj.to_solr_json()
 
@@ -108,11 +213,13 @@ class SolrSearch:
         }
         return queryopt
 
-    def remove(self, docs):
+    def remove(self, docs, commit_within=None):
         """
         Updates Solr with a list of objects to remove from the index.
 
         :param docs: an iterable of objects with an id property
+        :param commit_within: (optional) milliseconds in which Solr should make the
+            removal visible, instead of sending a commit command
 
         :raises SolrException: if an error occurs during the removal attempt. Note that
             removals are performed iteratively, so it's possible that some succeeded
@@ -123,13 +230,19 @@ class SolrSearch:
         # Study pre_delete signal, but other clients must do their own permission checks.
         url = f"{self.url}/update/json"
         headers = {"content-type": "application/json"}
-        commands = ",".join(f'"delete":{{"id":"{doc.id}"}}' for doc in docs)
+        commands = [f'"delete":{{"id":"{doc.id}"}}' for doc in docs]
+        params = None
+        if commit_within is None:
+            commands.append('"commit":{}')
+        else:
+            params = {"commitWithin": commit_within}
         try:
-            response = requests.post(
+            response = self._request(
+                "POST",
                 url,
-                data=f'{{{commands}, "commit":{{}}}}',
+                data=f'{{{",".join(commands)}}}',
                 headers=headers,
-                timeout=timeout,
+                params=params,
             )
             response.raise_for_status()
         # catch / re-raise communication errors after logging some helpful
@@ -152,9 +265,7 @@ class SolrSearch:
         logger.debug(f"{self} searching with: {queryopt}")
         try:
             # contact Solr / raise any IOErrors that arise
-            response = requests.get(
-                f"{self.url}/select", params=queryopt, timeout=timeout
-            )
+            response = self._request("GET", f"{self.url}/select", params=queryopt)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -185,7 +296,7 @@ class SolrSearch:
         queryopt = self.get_queryopt(query, **kwargs)
         return self.search(queryopt=queryopt)
 
-    def update(self, docs):
+    def update(self, docs, commit_within=None):
         """
         Update Solr index from the given list of objects. Does no permissions checking;
         permissions already valid if called from Study post_save signal, but other
@@ -193,28 +304,35 @@ class SolrSearch:
 
         :param docs: an iterable of objects with a to_solr_json method to update in Solr.
             Must have an id attribute.
+        :param commit_within: (optional) milliseconds in which Solr should make the
+            updates visible, instead of sending a commit command
         :raises SolrException: if an error occurs during the update attempt
         """
         logger.info(f"Sending updates to {self}")
         url = f"{self.url}/update/json"
         headers = {"content-type": "application/json"}
         payload = filter(lambda d: d is not None, map(self.get_solr_payload, docs))
+        params = None if commit_within is None else {"commitWithin": commit_within}
         try:
             # Send updates in groups of 50
             for group in iter(lambda: list(islice(payload, 50)), []):
                 ids = [item.get("id") for item in group]
                 logger.debug(f"{self} updating with IDs: {ids}")
                 # make an initial request to do the add / raise IOError if it occurs
-                response = requests.post(
+                response = self._request(
+                    "POST",
                     url,
                     data=utilities.JSONEncoder.dumps(group),
                     headers=headers,
-                    timeout=timeout,
+                    params=params,
                 )
                 response.raise_for_status()
+            # Solr commits on its own when given commitWithin
+            if params is not None:
+                return
             # if the adds worked, send commit command
-            response = requests.post(
-                url, data=r'{"commit":{}}', headers=headers, timeout=timeout
+            response = self._request(
+                "POST", url, data=r'{"commit":{}}', headers=headers
             )
             # raises HttpError (extends IOError)
             response.raise_for_status()
@@ -244,7 +362,7 @@ class SolrSearch:
         params = {"action": "SWAP", "other": updated_core, "core": current_core}
         try:
             # send the request to swap out the current core for the updated one
-            response = requests.get(url, params=params, timeout=timeout)
+            response = self._request("GET", url, retry=False, params=params)
             response.raise_for_status()
             # swap again after the service switches the backing cores
             return self.swap()
@@ -258,13 +376,27 @@ class SolrSearch:
     def __len__(self):
         url = f"{self.base_url}/admin/cores"
         try:
-            response = requests.get(url, params={"core": self.core}, timeout=timeout)
+            response = self._request("GET", url, params={"core": self.core})
             response.raise_for_status()
             return response.json()["status"][self.core]["index"]["maxDoc"]
         except Exception as e:
             raise SolrException(f"Could not load length of {self}") from e
 
 
+class ArraySubquery(Subquery):
+    """ Collects the single column returned by a subquery into an array. """
+
+    template = "ARRAY(%(subquery)s)"
+    output_field = ArrayField(TextField())
+
+
+class CountSubquery(Subquery):
+    """ Counts the rows returned by a subquery. """
+
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) AS _count)"
+    output_field = IntegerField()
+
+
 class StudySearch(SolrSearch):
     """
     A more-or-less straight port of the StudySearch.pm module from the EDD perl code. Makes
@@ -276,6 +408,9 @@ class StudySearch(SolrSearch):
         settings_key: connection key in settings SOLR value
     """
 
+    # number of studies read per round-trip to the server-side cursor
+    chunk_size = 500
+
     def __init__(self, core="studies", ident=None, *args, **kwargs):
         super().__init__(core=core, *args, **kwargs)
         self.ident = ident
@@ -308,26 +443,91 @@ class StudySearch(SolrSearch):
 
     @staticmethod
     def get_queryset():
-        return (
-            models.Study.objects.select_related(
-                "contact",
-                "updated__mod_by__userprofile",
-                "created__mod_by__userprofile",
+        """
+        Creates a QuerySet of studies for indexing. Related values needed in the Solr
+        documents are collected into arrays with subqueries, so rows can be read with
+        a server-side cursor, with no additional queries per study.
+        """
+        study = OuterRef("pk")
+        text = {"output_field": TextField()}
+        files = models.Attachment.objects.filter(object_ref=study).values("pk")
+        comments = models.Comment.objects.filter(object_ref=study).values("pk")
+        metabolites = (
+            models.Metabolite.objects.filter(assay__line__study=study)
+            .annotate(
+                solr=Concat(Cast("pk", TextField()), Value("@"), "type_name", **text)
             )
-            .annotate(_file_count=Count("files"), _comment_count=Count("comments"))
-            .prefetch_related(
-                Prefetch(
-                    "userpermission_set",
-                    queryset=models.UserPermission.objects.select_related("user"),
-                ),
-                Prefetch(
-                    "grouppermission_set",
-                    queryset=models.GroupPermission.objects.select_related("group"),
-                ),
-                "everyonepermission_set",
+            .order_by()
+            .values("solr")
+            .distinct()
+        )
+        protocols = (
+            models.Protocol.objects.filter(Q(assay__line__study=study) | Q(study=study))
+            .annotate(solr=Concat(Cast("pk", TextField()), Value("@"), "name", **text))
+            .order_by()
+            .values("solr")
+            .distinct()
+        )
+        strains = (
+            models.Strain.objects.filter(line__study=study)
+            .annotate(
+                solr=Concat(
+                    # str(None) is used for the missing IDs in Strain.to_solr_value()
+                    Coalesce(Cast("registry_id", TextField()), Value("None")),
+                    Value("@"),
+                    "name",
+                    **text,
+                )
+            )
+            .order_by()
+            .values("solr")
+            .distinct()
+        )
+        # ACL entries are permission_type followed by the value from str(permission)
+        user_acl = (
+            models.UserPermission.objects.filter(study=study)
+            .annotate(
+                solr=Concat("permission_type", Value("u:"), "user__username", **text)
             )
+            .values("solr")
+        )
+        group_acl = (
+            models.GroupPermission.objects.filter(study=study)
+            .annotate(
+                solr=Concat("permission_type", Value("g:"), "group__name", **text)
+            )
+            .values("solr")
+        )
+        everyone_acl = (
+            models.EveryonePermission.objects.filter(study=study)
+            .annotate(solr=Concat("permission_type", Value("g:__Everyone__"), **text))
+            .values("solr")
+        )
+        return models.Study.objects.select_related(
+            "contact", "updated__mod_by__userprofile", "created__mod_by__userprofile",
+        ).annotate(
+            _file_count=CountSubquery(files),
+            _comment_count=CountSubquery(comments),
+            _solr_metabolite=ArraySubquery(metabolites),
+            _solr_protocol=ArraySubquery(protocols),
+            _solr_part=ArraySubquery(strains),
+            _solr_acl=Func(
+                ArraySubquery(user_acl),
+                ArraySubquery(group_acl),
+                ArraySubquery(everyone_acl),
+                arg_joiner=" || ",
+                template="(%(expressions)s)",
+                output_field=ArrayField(TextField()),
+            ),
         )
 
+    def update(self, docs, commit_within=None):
+        # values are aggregated in get_queryset(), so there is no prefetch to lose by
+        #   reading studies from a server-side cursor
+        if isinstance(docs, QuerySet):
+            docs = docs.iterator(chunk_size=self.chunk_size)
+        return super().update(docs, commit_within=commit_within)
+
     def query(self, query="", options=None):
         """
         Run a query against the Solr index.
@@ -504,3 +704,18 @@ class MeasurementTypeSearch(SolrSearch):
         else:
             item = obj
         return item.to_solr_json()
+
+
+def get_search(core):
+    """
+    Creates a search object for the named core, e.g. to pass a reference to an index
+    to a task.
+
+    :param core: the name of the core, e.g. "studies"
+    :raises ValueError: if no search type uses the core
+    """
+    for search_type in (StudySearch, UserSearch, MeasurementTypeSearch):
+        search = search_type()
+        if search.core == core:
+            return search
+    raise ValueError(f"No search index uses core {core}")
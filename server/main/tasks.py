@@ -4,6 +4,7 @@ Module contains tasks to be executed asynchronously by Celery worker nodes.
 """
 
 import json
+import time
 import traceback
 
 import arrow
@@ -12,7 +13,7 @@ from celery.utils.log import get_task_logger
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import mail_admins, send_mail
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import F
 from django.http.request import HttpRequest
 from django.urls import reverse
@@ -24,9 +25,10 @@ from edd.notify.backend import RedisBroker
 from jbei.rest.auth import HmacAuth
 from jbei.rest.clients.ice import IceApi, IceApiException
 
-from . import models
+from . import models, redis, solr
 from .export import forms as export_forms
 from .export.broker import ExportBroker
+from .export.columnar import ColumnarExport
 from .export.table import TableExport, WorklistExport
 from .importer.table import ImportBroker, TableImport
 from .utilities import get_absolute_url
@@ -117,7 +119,10 @@ def execute_export_table(broker, user, export_id, param_path):
         data=params, initial=init_options, selection=selection
     ).options
     # create and persist the export object
-    export = TableExport(selection, options)
+    if options.file_format == options.PARQUET_FILE:
+        export = ColumnarExport.from_selection(selection)
+    else:
+        export = TableExport(selection, options)
     broker.save_export(export_id, selection.studies[0].name, export)
     # no longer need the param data
     broker.clear_params(param_path)
@@ -221,10 +226,10 @@ def import_table_task(self, study_id, user_id, import_id):
             importer = TableImport(study, user)
             importer.parse_context(import_params)
 
-            with transaction.atomic(savepoint=False):
+            bulk = models.BulkUpdate(update=fake_request.update_obj)
+            with transaction.atomic(savepoint=False), bulk:
                 for page in pages:
-                    parsed_page = json.loads(page)
-                    added, updated = importer.import_series_data(parsed_page)
+                    added, updated = importer.import_series_data(page)
                     total_added += added
                     total_updated += updated
                 importer.finish_import()
@@ -269,6 +274,147 @@ def import_table_task(self, study_id, user_id, import_id):
         )
 
 
+@shared_task(bind=True)
+def delete_study_objects(self, study_id, user_id, line_ids=None):
+    """
+    Task removes lines from a study, with their assays, measurements, and values, in
+    batches; or removes the whole study when no lines are given. Views mark the objects
+    inactive before submitting this task, so objects waiting for removal are hidden.
+    Signals updating Solr and ICE are sent once, after all batches are removed.
+
+    :param study_id: the primary key of the study
+    :param user_id: the primary key of the user requesting the removal
+    :param line_ids: (optional) primary keys of lines to remove; when omitted, the
+        whole study is removed
+    """
+    # signals module imports this module
+    from .signals import study_modified
+
+    user = User.objects.get(pk=user_id)
+    notifications = RedisBroker(user)
+    study = models.Study.objects.filter(pk=study_id).first()
+    if study is None:
+        logger.warning(f"Study {study_id} no longer exists, nothing to delete")
+        return
+    try:
+        count = remove_lines(study, line_ids)
+        if line_ids is None:
+            # deleting the study itself removes it from Solr
+            study.delete()
+            message = _('Finished deleting study "{study}".').format(study=study.name)
+        else:
+            study_modified.send(sender=models.Study, study=study, using=study._state.db)
+            message = _('Finished deleting {count} lines from "{study}".').format(
+                count=count, study=study.name
+            )
+        notifications.notify(message)
+        notifications.mark_read(self.request.id)
+    except Exception as e:
+        logger.exception(f"Failure in delete_study_objects: {e}")
+        message = _(
+            'Failed deleting from "{study}", EDD encountered this problem: {e}'
+        ).format(study=study.name, e=e)
+        notifications.notify(message)
+        notifications.mark_read(self.request.id)
+        raise RuntimeError(message)
+
+
+def remove_lines(study, line_ids=None, batch_size=None):
+    """
+    Removes lines of a study, with their assays, measurements, and values. Rows are
+    removed in batches, each in a separate transaction, without loading objects or
+    sending model signals for each object. ICE links of strains no longer used in the
+    study are queued for removal. The study views only remove selections without active
+    measurements, and disable selections with data so they can be restored; any values
+    found here belong to disabled measurements, and are removed in batches as well.
+
+    :param study: the Study containing the lines
+    :param line_ids: (optional) primary keys of lines to remove; defaults to all lines
+    :param batch_size: (optional) number of rows removed in each transaction; defaults
+        to the EDD_DELETE_BATCH_SIZE setting, or 5000
+    :returns: the number of lines removed
+    """
+    # signals module imports this module
+    from .signals import check_ice_cannot_proceed, queue_ice_links
+
+    if batch_size is None:
+        batch_size = getattr(settings, "EDD_DELETE_BATCH_SIZE", 5000)
+    lines = models.Line.objects.filter(study_id=study.pk)
+    if line_ids is not None:
+        lines = lines.filter(pk__in=line_ids)
+    line_ids = list(lines.values_list("pk", flat=True))
+    strains = models.Strain.objects.filter(line__in=line_ids)
+    strain_ids = set(strains.values_list("pk", flat=True))
+    # filter on study as well, to only scan the study partition of values
+    in_lines = {"study_id": study.pk, "measurement__assay__line__in": line_ids}
+    _delete_batches(models.MeasurementValue.objects.filter(**in_lines), batch_size)
+    _delete_batches(models.PackedSeries.objects.filter(**in_lines), batch_size)
+    # with values removed, measurements have no rows to cascade
+    _delete_batches(
+        models.Measurement.objects.filter(study_id=study.pk, assay__line__in=line_ids),
+        batch_size,
+        delete=_delete_rows,
+    )
+    _delete_batches(
+        models.Assay.objects.filter(line__in=line_ids),
+        batch_size,
+        delete=_delete_edd_objects,
+    )
+    _delete_batches(
+        models.Line.objects.filter(pk__in=line_ids),
+        batch_size,
+        delete=_delete_edd_objects,
+    )
+    if not check_ice_cannot_proceed():
+        remaining = models.Strain.objects.filter(line__study_id=study.pk)
+        removed = strain_ids - set(remaining.values_list("pk", flat=True))
+        queue_ice_links(study.pk, removed, unlink=True)
+    return len(line_ids)
+
+
+def _delete_batches(queryset, batch_size, delete=None):
+    # removes rows matching queryset, up to batch_size rows in each transaction
+    model = queryset.model
+    while True:
+        ids = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            break
+        batch = model.objects.filter(pk__in=ids)
+        with transaction.atomic():
+            if delete is None:
+                batch.delete()
+            else:
+                delete(batch)
+
+
+def _delete_rows(queryset):
+    # removes rows matching queryset with a single DELETE, without collecting related
+    #   objects or sending model signals
+    meta = queryset.model._meta
+    ids = list(queryset.values_list("pk", flat=True))
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {qn(meta.db_table)} WHERE {qn(meta.pk.column)} = ANY(%s)",
+            [ids],
+        )
+
+
+def _delete_edd_objects(queryset):
+    # removes rows of an EDDObject subclass without loading objects; first rows of
+    #   many-to-many fields, then rows of the subclass, then the edd_object rows
+    ids = list(queryset.values_list("pk", flat=True))
+    for field in queryset.model._meta.local_many_to_many:
+        through = field.remote_field.through
+        if not through._meta.auto_created:
+            # relations through other models, e.g. Line.protocols through Assay
+            continue
+        attname = through._meta.get_field(field.m2m_field_name()).attname
+        through.objects.filter(**{f"{attname}__in": ids}).delete()
+    _delete_rows(queryset)
+    models.EDDObject.objects.filter(pk__in=ids).delete()
+
+
 _IMPORT_SUCCESS_MSG = """Your data import is complete for study "%(study)s".
 The import added %(added)d and updated %(updated)d measurements in %(duration)s."""
 
@@ -416,6 +562,79 @@ def unlink_ice_entry_from_study(self, strain, study):
             raise self.retry(exc=e, countdown=delay_calculation(self), max_retries=10)
 
 
+@shared_task(bind=True)
+def sync_ice_links(self, study_id):
+    """
+    Task sends changes queued for the links in ICE between a study and strains, using
+    a single ICE connection. Each queued strain is linked if it is still used in the
+    study, otherwise any link to the study is removed. Requests to ICE are limited to
+    the ICE_LINK_RATE_LIMIT setting, in requests per second.
+
+    :param study_id: the primary key of the EDD main.models.Study in the links
+    """
+    queue = redis.IceLinkQueue(study_id)
+    # release first, so changes queued while this runs will schedule another run
+    queue.release()
+    study = models.Study.objects.filter(pk=study_id).first()
+    if study is None:
+        logger.warning(f"Study {study_id} no longer exists, dropping ICE link changes")
+        while queue.pop_links(1000) or queue.pop_unlinks(1000):
+            pass
+        return
+    url = build_study_url(study.slug)
+    # always running as configured admin account
+    ice = create_ice_connection(settings.ICE_ADMIN_ACCOUNT)
+    if ice is None:
+        logger.error(f"Cannot connect to ICE, skipping link changes for {study_id}")
+        return
+    batch_size = getattr(settings, "ICE_LINK_BATCH", 100)
+    limit = _RateLimit(getattr(settings, "ICE_LINK_RATE_LIMIT", 10))
+    for pop, requeue in (
+        (queue.pop_unlinks, queue.unlink),
+        (queue.pop_links, queue.link),
+    ):
+        for ids in iter(lambda: pop(batch_size), []):
+            pending = set(ids)
+            try:
+                _send_ice_links(ice, study, url, pending, limit)
+            except (IceApiException, RequestException) as e:
+                # put unsent changes back, and retry unless another run is scheduled
+                requeue(*pending)
+                if queue.claim(60 * 60):
+                    countdown = delay_calculation(self)
+                    raise self.retry(exc=e, countdown=countdown, max_retries=10)
+                return
+
+
+class _RateLimit(object):
+    """ Spaces out calls to wait(), so they happen at most rate times per second. """
+
+    def __init__(self, rate):
+        self._interval = 1 / rate
+        self._last = 0
+
+    def wait(self):
+        delay = self._last + self._interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._last = time.monotonic()
+
+
+def _send_ice_links(ice, study, url, pending, limit):
+    # strain IDs are discarded from pending once their change is sent to ICE;
+    #   action depends on the strains used in the study now, not when queued
+    strains = models.Strain.objects.filter(pk__in=list(pending))
+    linked = set(strains.filter(line__study_id=study.pk).values_list("pk", flat=True))
+    for strain in strains:
+        if strain.registry_id:
+            limit.wait()
+            if strain.pk in linked:
+                ice.add_experiment_link(strain.registry_id, study.name, url)
+            else:
+                ice.unlink_entry_from_study(strain.registry_id, url)
+        pending.discard(strain.pk)
+
+
 @shared_task
 def template_sync_species(template_id):
     """
@@ -453,3 +672,33 @@ def template_sync_species(template_id):
     # removing any records in the database not in the template document
     species_qs.filter(species__in=exist_species).delete()
     exchange_qs.filter(exchange_name__in=exist_exchange).delete()
+
+
+@shared_task(bind=True)
+def index_queued(self, core):
+    """
+    Task sends changes queued for a Solr core, in batches of IDs. Changes use a soft
+    commit with commitWithin, instead of a hard commit after every batch.
+
+    :param core: the name of the Solr core, as used in main.redis.IndexQueue
+    """
+    queue = redis.IndexQueue(core)
+    # release first, so changes queued while this runs will schedule another run
+    queue.release()
+    index = solr.get_search(core)
+    model = index.get_queryset().model
+    batch_size = getattr(settings, "EDD_SOLR_QUEUE_BATCH", 500)
+    commit_within = getattr(settings, "EDD_SOLR_COMMIT_WITHIN", 5000)
+    for ids in iter(lambda: queue.pop_removals(batch_size), []):
+        try:
+            index.remove([model(pk=pk) for pk in ids], commit_within=commit_within)
+        except solr.SolrException as e:
+            queue.remove(*ids)
+            raise self.retry(exc=e, countdown=delay_calculation(self), max_retries=10)
+    for ids in iter(lambda: queue.pop_updates(batch_size), []):
+        try:
+            docs = index.get_queryset().filter(pk__in=ids)
+            index.update(docs, commit_within=commit_within)
+        except solr.SolrException as e:
+            queue.add(*ids)
+            raise self.retry(exc=e, countdown=delay_calculation(self), max_retries=10)
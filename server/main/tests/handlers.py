@@ -7,6 +7,7 @@ from faker import Faker
 
 from .. import models
 from ..signals import core, sbml, solr
+from ..signals.permission import permission_change
 from . import factory
 
 fake = Faker()
@@ -174,17 +175,25 @@ def test_line_strain_changed_without_ice():
 def test_submit_ice_unlink():
     study_id = fake.pyint()
     to_remove = fake.pylist(10, True, "int")
-    with patch("main.signals.core.tasks.unlink_ice_entry_from_study") as task:
-        core.submit_ice_unlink(study_id, to_remove)
-        assert task.delay.call_count == len(to_remove)
+    with patch("main.signals.core.IceLinkQueue") as MockQueue:
+        with patch("main.signals.core.tasks.sync_ice_links") as task:
+            core.submit_ice_unlink(study_id, to_remove)
+            MockQueue.return_value.unlink.assert_called_once_with(*to_remove)
+            task.apply_async.assert_called_once()
 
 
 def test_submit_ice_link():
     study_id = fake.pyint()
     to_link = fake.pylist(10, True, "int")
-    with patch("main.signals.core.tasks.link_ice_entry_to_study") as task:
-        core.submit_ice_link(study_id, to_link)
-        assert task.delay.call_count == len(to_link)
+    with patch("main.signals.core.IceLinkQueue") as MockQueue:
+        with patch("main.signals.core.tasks.sync_ice_links") as task:
+            queue = MockQueue.return_value
+            # only the first change claims scheduling of the task
+            queue.claim.side_effect = [True, False]
+            core.submit_ice_link(study_id, to_link)
+            core.submit_ice_link(study_id, to_link)
+            assert queue.link.call_count == 2
+            task.apply_async.assert_called_once()
 
 
 def test_sbml_template_saved_raw():
@@ -264,3 +273,53 @@ def test_solr_removed_user_forwards():
         solr.cache_deleting_key(User, user)
         solr.removed_user(User, user, using="default")
         signal.send.assert_called_once()
+
+
+def test_solr_queue_index_schedules_once():
+    with patch("main.signals.solr.IndexQueue") as MockQueue:
+        with patch("main.signals.solr.tasks") as tasks:
+            queue = MockQueue.return_value
+            # only the first change claims scheduling of the task
+            queue.claim.side_effect = [True, False]
+            solr.queue_index(solr.study_index, [1, 2])
+            solr.queue_index(solr.study_index, [3], remove=True)
+            queue.add.assert_called_once_with(1, 2)
+            queue.remove.assert_called_once_with(3)
+            tasks.index_queued.apply_async.assert_called_once()
+
+
+def test_permission_change_invalidates_access():
+    with patch("main.signals.permission.StudyAccessCache") as MockCache:
+        with patch("main.signals.permission.connection") as connection:
+            permission = models.EveryonePermission(study=models.Study())
+            # raw saves do not forward to study_modified, but still invalidate
+            permission_change(
+                models.EveryonePermission, permission, using="default", raw=True
+            )
+            MockCache.return_value.invalidate.assert_called_once()
+            connection.on_commit.assert_called_once()
+
+
+def test_log_update_collects_in_bulk():
+    line = factory.LineFactory.build()
+    with patch.object(models.BulkUpdate, "current") as current:
+        with patch.object(models.Line, "updates") as updates:
+            core.log_update(models.Line, line, created=True, raw=False, using="default")
+            current.return_value.log.assert_called_once_with(line)
+            updates.add.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_bulk_update_writes_updates_on_exit():
+    study = factory.StudyFactory()
+    through = models.EDDObject.updates.through
+    with models.BulkUpdate(path="test") as bulk:
+        lines = [factory.LineFactory(study=study) for _ in range(3)]
+        # rows are only written on exit
+        assert not through.objects.filter(update=bulk.update).exists()
+        # nested contexts join the outer context
+        with models.BulkUpdate() as inner:
+            assert inner is bulk
+    assert {line.updated_id for line in lines} == {bulk.update.pk}
+    assert through.objects.filter(update=bulk.update).count() == 3
+    assert models.BulkUpdate.current() is None
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import json
+
 from django.core.exceptions import PermissionDenied
-from django.test import RequestFactory
+from django.test import RequestFactory, SimpleTestCase
 
 from edd import TestCase
 from main import models
+from main.codec import JSONCodec, MsgpackCodec, get_codec
 from main.importer import TableImport
 
 from . import factory
@@ -76,3 +79,55 @@ class TableImportTests(TestCase):
         self.assertEqual(
             models.Measurement.objects.filter(study_id=self.target_study.pk).count(), 1
         )
+
+    def test_import_updates_existing_points(self):
+        """Test importing to an x value already in a measurement updates the y value."""
+        line = factory.LineFactory(study=self.target_study)
+        protocol = factory.ProtocolFactory()
+        assay = factory.AssayFactory(line=line, protocol=protocol)
+        mtype = factory.MetaboliteFactory()
+        unit = factory.UnitFactory()
+        self._set_permission(permission_type=models.StudyPermission.WRITE)
+        item = {
+            "line_id": line.id,
+            "assay_id": assay.id,
+            "measurement_id": mtype.id,
+            "comp_id": models.Measurement.Compartment.UNKNOWN,
+            "units_id": unit.id,
+            "metadata": {},
+        }
+        run = TableImport(self.target_study, self.user)
+        added, updated = run.import_series_data(
+            [{**item, "data": [[0, 1], [1, 2], [2, 3]]}]
+        )
+        self.assertEqual(added, 3)
+        self.assertEqual(updated, 0)
+        # second import overlaps on two x values, and repeats one x value
+        run = TableImport(self.target_study, self.user)
+        added, updated = run.import_series_data(
+            [{**item, "data": [[1, 5], [2, 6], [3, 7]]}, {**item, "data": [[3, 8]]}]
+        )
+        self.assertEqual(added, 1)
+        self.assertEqual(updated, 3)
+        # still only one measurement, with the most recent y values
+        measurement = models.Measurement.objects.get(study_id=self.target_study.pk)
+        values = {v.fx: v.fy for v in measurement.measurementvalue_set.order_by("x")}
+        self.assertEqual(values, {0: 1, 1: 5, 2: 6, 3: 8})
+
+
+class PageCodecTests(SimpleTestCase):
+    page = [{"kind": "std", "data": [["0.5", "1.25"], [1.0, None]], "assay_id": 12}]
+
+    def test_msgpack_round_trip(self):
+        codec = MsgpackCodec()
+        encoded = codec.encode(self.page)
+        self.assertTrue(encoded.startswith(codec.prefix))
+        self.assertEqual(codec.decode(encoded), self.page)
+
+    def test_msgpack_reads_json(self):
+        # pages stored before the codec was in use are JSON text
+        codec = MsgpackCodec()
+        self.assertEqual(codec.decode(json.dumps(self.page).encode("utf-8")), self.page)
+
+    def test_unknown_codec_is_json(self):
+        self.assertIsInstance(get_codec("unknown"), JSONCodec)
@@ -7,13 +7,18 @@ from unittest.mock import patch
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
 from django.test import RequestFactory
 from threadlocals.threadlocals import set_thread_variable
 
 from edd import TestCase
 
 from .. import models as edd_models
+from .. import partition
 from ..export import sbml as sbml_export
+from ..export.pivot import ValuePivot
+from ..export.table import ExportOption, ExportSelection, TableExport
 from ..forms import LineForm
 from ..models import (
     SYSTEM_META_TYPES,
@@ -203,6 +208,41 @@ class StudyTests(TestCase):
         self.assertFalse(study.user_can_read(user4))
         self.assertFalse(study.user_can_write(user4))
 
+    def test_solr_json_from_search_queryset(self):
+        study = Study.objects.get(name="Test Study 1")
+        user1 = User.objects.get(username="test1")
+        fuels = Group.objects.get(name="Fuels Synthesis")
+        UserPermission.objects.create(study=study, permission_type="W", user=user1)
+        GroupPermission.objects.create(study=study, permission_type="R", group=fuels)
+        line = factory.LineFactory(study=study)
+        line.strains.add(Strain.objects.create(name="Test Strain"))
+        assay = factory.AssayFactory(line=line)
+        factory.MeasurementFactory(
+            assay=assay, measurement_type=factory.MetaboliteFactory()
+        )
+        study.protocols.add(factory.ProtocolFactory())
+        # aggregated values from the queryset match the values loaded per study
+        expected = Study.objects.get(pk=study.pk).to_solr_json()
+        queryset = StudySearch.get_queryset().filter(pk=study.pk)
+        with self.assertNumQueries(1):
+            found = queryset.get().to_solr_json()
+        for key in ("metabolite", "protocol", "part", "aclr", "aclw"):
+            self.assertEqual(sorted(found.pop(key)), sorted(expected.pop(key)))
+        self.assertEqual(found, expected)
+
+    def test_access_filter_uses_cached_ids(self):
+        study = Study.objects.get(name="Test Study 1")
+        user1 = User.objects.get(username="test1")
+        with patch("main.models.core.connection") as connection:
+            with patch("main.models.core.StudyAccessCache") as MockCache:
+                connection.in_atomic_block = False
+                MockCache.return_value.load.return_value = ("key", [study.pk])
+                access = Study.access_filter(user1, via="study")
+        self.assertEqual(access, Q(study__pk__in=[study.pk]))
+        # a cache miss inside a transaction uses permission JOINs without caching
+        access = Study.access_filter(user1, via="study")
+        self.assertNotEqual(access, Q(study__pk__in=[study.pk]))
+
     def test_study_metadata(self):
         study = Study.objects.get(name="Test Study 1")
         md = MetadataType.objects.get(type_name="Some key")
@@ -347,6 +387,18 @@ class LineTests(TestCase):  # XXX also Strain, CarbonSource
         self.assertEqual(self.cs1.line_set.count(), 2)
         self.assertEqual(self.cs2.line_set.count(), 1)
 
+    def test_bulk_insert(self):
+        lines = [edd_models.Line(name=f"Bulk {i}", study=self.study2) for i in range(3)]
+        edd_models.Line.bulk_insert(lines, batch_size=2)
+        self.assertTrue(all(line.pk for line in lines))
+        self.assertEqual(
+            self.study2.line_set.filter(name__startswith="Bulk").count(), 3
+        )
+        line = edd_models.Line.objects.get(pk=lines[0].pk)
+        self.assertIsNotNone(line.uuid)
+        self.assertEqual(line.created, line.updated)
+        self.assertEqual(line.updates.count(), 1)
+
 
 # XXX because there's so much overlap in functionality and the necessary setup
 # is somewhat involved, this set of tests includes multiple models, focused
@@ -447,6 +499,85 @@ class AssayDataTests(TestCase):
         with self.assertRaises(ValueError):
             self.meas2.interpolate_at(20)
 
+    def test_measurement_packed(self):
+        measures = edd_models.Measurement.objects.filter(assay=self.assay1)
+        # only meas1 has values to pack
+        self.assertEqual(edd_models.PackedSeries.pack(measures), 1)
+        self.assertEqual(self.meas1.measurementvalue_set.count(), 0)
+        packed = edd_models.PackedSeries.objects.get(measurement=self.meas1)
+        self.assertEqual(packed.x, [0, 4, 8, 12, 18, 24, 32])
+        self.assertEqual(packed.y, [0.0, 0.1, 0.2, 0.4, 0.8, 1.6, None])
+        # reads through the model API are the same as with rows
+        self.assertEqual(
+            self.meas1.extract_data_xvalues(defined_only=True),
+            [0.0, 4.0, 8.0, 12.0, 18.0, 24.0],
+        )
+        self.assertTrue(math.isclose(self.meas1.interpolate_at(21), 1.2))
+        self.assertEqual(edd_models.PackedSeries.unpack(measures), 1)
+        self.assertEqual(self.meas1.measurementvalue_set.count(), 7)
+        self.assertFalse(edd_models.PackedSeries.objects.exists())
+
+    def test_partition_values(self):
+        if connection.pg_version < partition.MINIMUM_VERSION:
+            self.skipTest("Partitions require PostgreSQL 11")
+        partition.repartition(connection, 4)
+        self.assertEqual(partition.partition_count(connection), 4)
+        self.assertEqual(self.meas1.measurementvalue_set.count(), 7)
+        partition.repartition(connection, 0)
+        self.assertEqual(partition.partition_count(connection), 0)
+        self.assertEqual(self.meas1.measurementvalue_set.count(), 7)
+
+    def test_partition_statements(self):
+        statements = partition.rebuild_statements(
+            lambda name: f'"{name}"',
+            2,
+            ['CREATE INDEX "v_idx" ON ONLY "measurement_value" (measurement_id)'],
+            [("v_fk", "FOREIGN KEY (study_id) REFERENCES study(object_ref_id)")],
+            "measurement_value_id_seq",
+        )
+        self.assertEqual(
+            statements[:3],
+            [
+                'CREATE TABLE "measurement_value_new" (LIKE "measurement_value" '
+                "INCLUDING DEFAULTS) PARTITION BY HASH (study_id)",
+                'CREATE TABLE "measurement_value_new_p0" PARTITION OF '
+                '"measurement_value_new" FOR VALUES WITH (MODULUS 2, REMAINDER 0)',
+                'CREATE TABLE "measurement_value_new_p1" PARTITION OF '
+                '"measurement_value_new" FOR VALUES WITH (MODULUS 2, REMAINDER 1)',
+            ],
+        )
+        self.assertIn(
+            'ALTER TABLE "measurement_value" ADD PRIMARY KEY (id, study_id)', statements
+        )
+        self.assertIn(
+            'CREATE INDEX "v_idx" ON "measurement_value" (measurement_id)', statements
+        )
+        self.assertIn(
+            'ALTER TABLE "measurement_value_new_p1" RENAME TO "measurement_value_p1"',
+            statements,
+        )
+        # views of the table are dropped before the old table, then re-created
+        view = ("v_view", "SELECT id FROM measurement_value;")
+        with_view = partition.rebuild_statements(
+            lambda name: f'"{name}"',
+            0,
+            [],
+            [],
+            "measurement_value_id_seq",
+            views=[view],
+        )
+        dropped = with_view.index('DROP VIEW "v_view"')
+        self.assertLess(dropped, with_view.index('DROP TABLE "measurement_value"'))
+        self.assertIn(
+            'CREATE VIEW "v_view" AS SELECT id FROM measurement_value;', with_view
+        )
+        # without partitions, the table is rebuilt as a plain table
+        plain = partition.rebuild_statements(
+            lambda name: f'"{name}"', 0, [], [], "measurement_value_id_seq"
+        )
+        self.assertNotIn("PARTITION", " ".join(plain))
+        self.assertIn('ALTER TABLE "measurement_value" ADD PRIMARY KEY (id)', plain)
+
 
 class SBMLUtilTests(TestCase):
     """ Unit tests for various utilities used in SBML export """
@@ -499,6 +630,55 @@ class ExportTests(TestCase):
         # TODO tests using main.export.sbml.SbmlExport
         pass
 
+    def _create_export_data(self):
+        # two measurements, in assays with different protocols, with overlapping x
+        user = factory.UserFactory(is_superuser=True)
+        line = factory.LineFactory()
+        measurements = []
+        for points in [[(0, 1), (1, 2)], [(1, 3), (2, 4)]]:
+            assay = factory.AssayFactory(line=line, protocol=factory.ProtocolFactory())
+            measurement = factory.MeasurementFactory(assay=assay)
+            for x, y in points:
+                factory.ValueFactory(measurement=measurement, x=[x], y=[y])
+            measurements.append(measurement)
+        selection = ExportSelection(user, studyId=[line.study_id])
+        return selection, measurements
+
+    def test_stream_data_by_line(self):
+        selection, _ = self._create_export_data()
+        options = ExportOption(layout=ExportOption.DATA_COLUMN_BY_LINE)
+        export = TableExport(selection, options)
+        output = "".join(export.stream())
+        self.assertEqual(output, "0.0,1.0,2.0\n1.0,2.0,\n,3.0,4.0")
+        self.assertEqual(output, export.output())
+
+    def test_stream_line_by_data(self):
+        selection, _ = self._create_export_data()
+        options = ExportOption(layout=ExportOption.LINE_COLUMN_BY_DATA)
+        export = TableExport(selection, options)
+        output = "".join(export.stream())
+        self.assertEqual(output, "0.0,1.0,\n1.0,2.0,3.0\n2.0,,4.0")
+
+    def test_stream_data_by_point(self):
+        selection, _ = self._create_export_data()
+        options = ExportOption(
+            layout=ExportOption.DATA_COLUMN_BY_POINT, protocol_section=True
+        )
+        export = TableExport(selection, options)
+        output = "".join(export.stream())
+        self.assertEqual(output, "X,Y\n0.0,1.0\n1.0,2.0\n\nX,Y\n1.0,3.0\n2.0,4.0")
+
+    def test_pivot_aligns_values(self):
+        pivot = ValuePivot([0, 1.5, 3])
+        pivot.add([[0], [3]], [[1], [2]])
+        # measurement without values, and a value with x outside of columns
+        pivot.add([None], [None])
+        pivot.add([[1.5], [2]], [[4, 5], [6]])
+        self.assertEqual(len(pivot), 3)
+        rows = pivot.pivot()
+        self.assertEqual(rows, [["1.0", "", "2.0"], ["", "", ""], ["", "4.0:5.0", ""]])
+        self.assertEqual(len(pivot), 0)
+
     def test_data_export_errors(self):
         # TODO tests using main.export.sbml.SbmlExport
         pass
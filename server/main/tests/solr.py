@@ -1,8 +1,15 @@
 """Tests for Solr API"""
+import io
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.management.base import CommandError
 from django.test import override_settings
 from faker import Faker
 
 from .. import solr
+from ..management.commands import edd_index
 
 fake = Faker()
 
@@ -51,3 +58,125 @@ def test_get_queryopt_bad_params():
     assert queryopt["q"] == "query"
     assert queryopt["start"] == 0
     assert queryopt["rows"] == 50
+
+
+@override_settings(EDD_MAIN_SOLR=fake_django_setting)
+def test_update_commit_within():
+    search = solr.SolrSearch(core="test")
+    doc = MagicMock()
+    doc.to_solr_json.return_value = {"id": 1}
+    with patch("main.solr.get_session") as get_session:
+        session = get_session.return_value
+        search.update([doc], commit_within=1000)
+        # only the add request is sent, no separate commit
+        session.request.assert_called_once()
+        assert session.request.call_args[1]["params"] == {"commitWithin": 1000}
+
+
+@override_settings(EDD_MAIN_SOLR=fake_django_setting)
+def test_remove_commit_within():
+    search = solr.SolrSearch(core="test")
+    doc = MagicMock(id=1)
+    with patch("main.solr.get_session") as get_session:
+        session = get_session.return_value
+        search.remove([doc], commit_within=1000)
+        session.request.assert_called_once()
+        assert session.request.call_args[1]["data"] == '{"delete":{"id":"1"}}'
+        assert session.request.call_args[1]["params"] == {"commitWithin": 1000}
+
+
+@override_settings(EDD_SOLR_POOL_SIZE=2)
+def test_session_shared():
+    solr._reset_session()
+    session = solr.get_session()
+    assert solr.get_session() is session
+    adapter = session.get_adapter(fake_solr)
+    assert adapter._pool_maxsize == 2
+    solr._reset_session()
+
+
+class FakeStorage:
+    """Keeps pages of edd_index checkpoints in memory, in place of ScratchStorage."""
+
+    def __init__(self):
+        self.appended = threading.Event()
+        self.pages = {}
+
+    def append(self, data, name=None, expires=None):
+        self.pages.setdefault(name, []).append(data)
+        self.appended.set()
+
+    def delete(self, *names):
+        for name in names:
+            self.pages.pop(name, None)
+
+    def load_pages(self, name):
+        return iter(self.pages.get(name, []))
+
+
+def _index_command(storage, pks, resume=False):
+    command = edd_index.Command(stdout=io.StringIO())
+    command.storage = storage
+    command.options = {"batch": 2, "force": True, "resume": resume, "workers": 1}
+    queryset = MagicMock()
+    queryset.order_by.return_value.values_list.return_value = pks
+    # batches are sent as the range of the filter
+    queryset.filter.side_effect = lambda pk__gte, pk__lte: (pk__gte, pk__lte)
+    return command, queryset
+
+
+def _index_core():
+    core = MagicMock(core="test")
+
+    def swap():
+        core.core = "test" if core.core.endswith("_swap") else "test_swap"
+
+    core.swap.side_effect = swap
+    return core
+
+
+def _sent_ranges(core):
+    return [args[0] for args, kwargs in core.update.call_args_list]
+
+
+@patch("main.management.commands.edd_index.connection")
+def test_reindex_checkpoint_resume(connection):
+    storage = FakeStorage()
+    command, queryset = _index_command(storage, [1, 2, 3, 4, 5])
+    core = _index_core()
+
+    def fail_second(docs, commit_within=None):
+        if docs == (3, 4):
+            # fail only after the first batch is checkpointed
+            storage.appended.wait(5)
+            raise ValueError("Solr is down")
+
+    core.update.side_effect = fail_second
+    with pytest.raises(CommandError):
+        command._reindex(core, queryset)
+    # checkpoints are kept under the name of the main core, not the swap core
+    assert core.core == "test"
+    assert list(storage.pages) == ["edd_index:test"]
+    assert [2, 3, 4, 2] not in storage.pages["edd_index:test"]
+    assert [2, 1, 2, 2] in storage.pages["edd_index:test"]
+    # resume sends only the batches missing from the checkpoint
+    command, queryset = _index_command(storage, [1, 2, 3, 4, 5], resume=True)
+    core = _index_core()
+    command._reindex(core, queryset)
+    assert (1, 2) not in _sent_ranges(core)
+    assert (3, 4) in _sent_ranges(core)
+    core.clear.assert_not_called()
+    core.swap_execute.assert_called_once()
+    assert storage.pages == {}
+
+
+@patch("main.management.commands.edd_index.connection")
+def test_reindex_resume_shifted_ranges(connection):
+    storage = FakeStorage()
+    storage.append([2, 1, 2, 2], name="edd_index:test")
+    # item 2 is deleted since the checkpoint, so batches cover different items
+    command, queryset = _index_command(storage, [1, 3, 4, 5], resume=True)
+    core = _index_core()
+    command._reindex(core, queryset)
+    core.clear.assert_called_once()
+    assert _sent_ranges(core) == [(1, 3), (4, 5)]
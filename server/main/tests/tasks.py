@@ -0,0 +1,52 @@
+"""Tests for Celery tasks."""
+from unittest.mock import ANY, patch
+from uuid import uuid4
+
+import pytest
+from django.test import override_settings
+
+from .. import models, tasks
+from . import factory
+
+
+@pytest.mark.django_db
+@override_settings(ICE_LINK_RATE_LIMIT=1000)
+def test_sync_ice_links_follows_study_strains():
+    study = factory.StudyFactory()
+    line = factory.LineFactory(study=study)
+    linked = models.Strain.objects.create(name="linked", registry_id=uuid4())
+    removed = models.Strain.objects.create(name="removed", registry_id=uuid4())
+    line.strains.add(linked)
+    with patch("main.tasks.redis.IceLinkQueue") as MockQueue:
+        with patch("main.tasks.create_ice_connection") as connect:
+            queue = MockQueue.return_value
+            # both strains queued to link; only one is still used in the study
+            queue.pop_unlinks.side_effect = [[]]
+            queue.pop_links.side_effect = [[linked.pk, removed.pk], []]
+            tasks.sync_ice_links(study.pk)
+            ice = connect.return_value
+    queue.release.assert_called_once()
+    ice.add_experiment_link.assert_called_once_with(linked.registry_id, study.name, ANY)
+    ice.unlink_entry_from_study.assert_called_once_with(removed.registry_id, ANY)
+
+
+@pytest.mark.django_db
+def test_remove_lines_in_batches():
+    study = factory.StudyFactory()
+    removed = factory.LineFactory(study=study)
+    kept = factory.LineFactory(study=study)
+    for line in (removed, kept):
+        assay = factory.AssayFactory(line=line)
+        measurement = factory.MeasurementFactory(assay=assay)
+        for x in range(3):
+            factory.ValueFactory(measurement=measurement, x=[x], y=[x])
+    with patch("main.signals.check_ice_cannot_proceed", return_value=True):
+        count = tasks.remove_lines(study, [removed.pk], batch_size=2)
+    assert count == 1
+    assert not models.Line.objects.filter(pk=removed.pk).exists()
+    assert not models.Assay.objects.filter(line=removed).exists()
+    assert not models.MeasurementValue.objects.filter(
+        measurement__assay__line=removed
+    ).exists()
+    assert models.MeasurementValue.objects.filter(study=study).count() == 3
+    assert models.Line.objects.filter(study=study).get() == kept
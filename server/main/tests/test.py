@@ -11,6 +11,7 @@ from .admin import *  # noqa
 from .forms import *  # noqa
 from .handlers import *  # noqa
 from .ice import *  # noqa
+from .importer import *  # noqa
 from .models import *  # noqa
 from .solr import *  # noqa
 from .tasks import *  # noqa
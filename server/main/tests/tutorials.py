@@ -201,11 +201,12 @@ class ImportDataTestsMixin(object):
                             post_data = context_str.strip()[
                                 0:-1
                             ]  # strip off the closing bracket
-                            post_data = f'{post_data}, "series": {series_pages[0]} }}'
+                            series = json.dumps(series_pages[0])
+                            post_data = f'{post_data}, "series": {series} }}'
                         else:
                             post_data = (
                                 f'{{ "importId": "{import_id}", "page": {i+1}, '
-                                f'"totalPages": {page_count}, "series": {page}}}'
+                                f'"totalPages": {page_count}, "series": {json.dumps(page)}}}'
                             )
                         response = self.client.post(
                             self._import_url(),
@@ -274,13 +275,12 @@ class ImportDataTestsMixin(object):
 
         # if import can be completed in a single page, just return the series
         # data directly from file
-        series_str = series_file.read()
+        series = json.load(series_file)
         if page_count == 1:
-            return [series_str]
+            return [series]
 
-        # since we have to page the data, parse the json and break it up into
-        # pages of the requested size
-        series = json.loads(series_str)
+        # since we have to page the data, break it up into pages of the
+        # requested size
         item_count = len(series)
         page_size = settings.EDD_IMPORT_PAGE_SIZE
 
@@ -288,7 +288,7 @@ class ImportDataTestsMixin(object):
         for i in range(0, int(math.ceil(item_count / page_size))):
             end_index = min((i + 1) * page_size, item_count)
             page_series = series[i * page_size : end_index]
-            pages.append(json.dumps(page_series))
+            pages.append(page_series)
             self.assertTrue(page_series)
 
         # verify that data file content matches
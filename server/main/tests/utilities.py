@@ -2,7 +2,7 @@
 
 import json
 import os
-from unittest.mock import call, patch
+from unittest.mock import MagicMock, call, patch
 
 from django.contrib.auth import get_user_model
 from jsonschema import Draft4Validator
@@ -25,6 +25,7 @@ from main.importer.experiment_desc.constants import (
 )
 from main.importer.experiment_desc.importer import (
     ExperimentDescriptionOptions,
+    IcePartResolver,
     _build_response_content,
 )
 from main.importer.experiment_desc.parsers import (
@@ -908,3 +909,62 @@ class CombinatorialCreationTests(TestCase):
         # field that's in use by the GUI at the time of writing
         for line in creation_results.lines_created:
             self.assertEqual("Description blah blah", line.description)
+
+
+class IcePartResolverTests(TestCase):
+    def _resolver(self, part_ids):
+        importer = MagicMock(errors=[], ice_username="tester")
+        combo = MagicMock(ice_folder_to_filters={})
+        # first lookup is for part IDs, second for folder IDs
+        combo.get_related_object_ids.side_effect = [set(part_ids), set()]
+        combo.combinatorial_strains.return_value = False
+        options = ExperimentDescriptionOptions(use_ice_part_numbers=True)
+        return IcePartResolver(importer, [combo], options, MagicMock(), False)
+
+    def _entry_json(self, part_id, suppress_errors=False):
+        return {
+            "partId": part_id,
+            "recordId": f"uuid-{part_id}",
+            "type": "STRAIN",
+            "strainData": {"host": "E. coli"},
+        }
+
+    def test_query_entries_concurrently(self):
+        part_ids = [f"JBx_{i:06d}" for i in range(10)]
+        ice = MagicMock()
+        ice.get_entry_json.side_effect = self._entry_json
+        with patch("main.redis.ScratchStorage") as Storage:
+            storage = Storage.return_value
+            storage.load.return_value = None
+            with self.settings(ICE_REQUEST_WORKERS=4):
+                resolver = self._resolver(part_ids)
+                resolver._query_ice_entries(ice)
+        self.assertEqual(set(resolver.parts_by_ice_id), set(part_ids))
+        self.assertEqual(resolver.individual_entries_found, 10)
+        self.assertEqual(ice.get_entry_json.call_count, 10)
+        self.assertEqual(storage.save.call_count, 10)
+
+    def test_query_entries_cached(self):
+        part_ids = ["JBx_000001", "JBx_000002"]
+        ice = MagicMock()
+        with patch("main.redis.ScratchStorage") as Storage:
+            storage = Storage.return_value
+            storage.load.side_effect = lambda key: self._entry_json(key.split(":")[-1])
+            resolver = self._resolver(part_ids)
+            resolver._query_ice_entries(ice)
+        self.assertEqual(set(resolver.parts_by_ice_id), set(part_ids))
+        ice.get_entry_json.assert_not_called()
+
+    def test_query_entries_cache_failure(self):
+        part_ids = ["JBx_000001", "JBx_000002"]
+        ice = MagicMock()
+        ice.get_entry_json.side_effect = self._entry_json
+        with patch("main.redis.ScratchStorage") as Storage:
+            storage = Storage.return_value
+            storage.load.side_effect = ConnectionError("Redis is down")
+            storage.save.side_effect = ConnectionError("Redis is down")
+            resolver = self._resolver(part_ids)
+            resolver._query_ice_entries(ice)
+        # failing to reach the cache only means entries come from ICE
+        self.assertEqual(set(resolver.parts_by_ice_id), set(part_ids))
+        self.assertEqual(ice.get_entry_json.call_count, 2)
@@ -4,6 +4,7 @@ Tests used to validate the tutorial screencast functionality.
 """
 
 import json
+from contextlib import contextmanager
 from io import BytesIO
 from unittest.mock import patch
 
@@ -65,6 +66,49 @@ class StudyViewTests(TestCase):
         with self.assertRaises(Http404):
             views.load_study(request)
 
+    def test_edddata_etag(self):
+        """EDDData responses are not sent again until the study changes."""
+        target_url = reverse("main:edddata", kwargs=self.target_kwargs)
+        response = self.client.get(target_url)
+        self.assertEqual(response.status_code, codes.ok)
+        etag = response["ETag"]
+        # a matching If-None-Match skips the payload
+        response = self.client.get(target_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, codes.not_modified)
+        # adding a line changes the payload
+        line = factory.LineFactory(study=self.target_study)
+        response = self.client.get(target_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, codes.ok)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn(str(line.pk), json.loads(response.content)["Lines"])
+
+    def test_measurements_paged(self):
+        """Measurement data is sent in pages, with values downsampled on request."""
+        line = factory.LineFactory(study=self.target_study)
+        assay = factory.AssayFactory(line=line)
+        first, second = factory.MeasurementFactory.create_batch(2, assay=assay)
+        for x in range(10):
+            factory.ValueFactory(measurement=first, x=[x], y=[x % 3])
+        target_url = reverse(
+            "main:measurements",
+            kwargs={"slug": self.target_study.slug, "protocol": assay.protocol_id},
+        )
+        response = self.client.get(target_url, data={"limit": 1, "points": 4})
+        self.assertEqual(response.status_code, codes.ok)
+        page = response.json()
+        self.assertEqual(page["total_measures"], {str(assay.pk): 2})
+        self.assertEqual([m["id"] for m in page["measures"]], [first.pk])
+        self.assertEqual(page["next"], first.pk)
+        self.assertEqual(len(page["data"][str(first.pk)]), 4)
+        # following the cursor gives the last page
+        response = self.client.get(target_url, data={"cursor": page["next"]})
+        page = response.json()
+        self.assertEqual([m["id"] for m in page["measures"]], [second.pk])
+        self.assertIsNone(page["next"])
+        # unknown downsampling is a bad request
+        response = self.client.get(target_url, data={"method": "unknown"})
+        self.assertEqual(response.status_code, codes.bad_request)
+
     def test_create_study(self):
         """Test verifying that the create study views work."""
         # Verify response from the dedicated creation page
@@ -247,14 +291,45 @@ class StudyViewTests(TestCase):
         self.assertEqual(
             models.Study.objects.filter(slug=self.target_study.slug).count(), 1
         )
-        # delete actually happens
-        response = self.client.post(
-            target_url, data={"action": "delete_confirm"}, follow=True
-        )
+        # delete actually happens, in the background
+        with self._patch_delete_task() as task:
+            response = self.client.post(
+                target_url, data={"action": "delete_confirm"}, follow=True
+            )
         self.assertEqual(response.status_code, codes.ok)
         self.assertEqual(
-            models.Study.objects.filter(slug=self.target_study.slug).count(), 0
+            models.Study.objects.filter(
+                slug=self.target_study.slug, active=False
+            ).count(),
+            1,
+        )
+        task.delay.assert_called_once_with(self.target_study.pk, self.user.pk, None)
+
+    def test_overview_delete_with_data(self):
+        target_url = reverse("main:overview", kwargs=self.target_kwargs)
+        line = factory.LineFactory(study=self.target_study)
+        assay = factory.AssayFactory(line=line)
+        measurement = factory.MeasurementFactory(assay=assay)
+        factory.ValueFactory(measurement=measurement)
+        with self._patch_delete_task() as task:
+            response = self.client.post(
+                target_url, data={"action": "delete_confirm"}, follow=True
+            )
+        self.assertEqual(response.status_code, codes.ok)
+        # a study with data is only disabled, and keeps its data
+        task.delay.assert_not_called()
+        study = models.Study.objects.get(slug=self.target_study.slug)
+        self.assertFalse(study.active)
+        self.assertEqual(models.MeasurementValue.objects.filter(study=study).count(), 1)
+
+    @contextmanager
+    def _patch_delete_task(self):
+        # removal happens in a task submitted on commit, a TestCase never commits
+        on_commit = patch(
+            "main.views.study.transaction.on_commit", side_effect=lambda fn: fn()
         )
+        with on_commit, patch("main.views.study.tasks.delete_study_objects") as task:
+            yield task
 
     def test_overview_delete_readonly(self):
         # prevent deletion with user not having write permission
@@ -348,14 +423,20 @@ class StudyViewTests(TestCase):
         self.assertTemplateUsed(response, "main/confirm_delete.html")
         self.assertEqual(response.status_code, codes.ok)
         self.assertEqual(self.target_study.line_set.count(), 1)
-        # validate that confirming delete line works
-        response = self.client.post(
-            target_url,
-            data={"action": "disable_confirm", "lineId": [line.id]},
-            follow=True,
-        )
+        # validate that confirming delete line hides it, then removes it in background
+        with self._patch_delete_task() as task:
+            response = self.client.post(
+                target_url,
+                data={"action": "disable_confirm", "lineId": [line.id]},
+                follow=True,
+            )
         self.assertEqual(response.status_code, codes.ok)
-        self.assertEqual(self.target_study.line_set.count(), 0)
+        self.assertEqual(self.target_study.line_set.filter(active=True).count(), 0)
+        task.delay.assert_called_once_with(
+            self.target_study.pk, self.user.pk, [line.id]
+        )
+        # stand in for the task removing the line
+        line.delete()
         # validate that requesting to delete a line with measurements disables the line
         line = factory.LineFactory(study=self.target_study)
         assay = factory.AssayFactory(line=line)
@@ -508,6 +589,19 @@ class StudyViewTests(TestCase):
             )
             self.assertContains(response, "fake error", status_code=codes.bad_request)
 
+    def test_lines_autocomplete(self):
+        factory.LineFactory(study=self.target_study, name="Other line")
+        line = factory.LineFactory(study=self.target_study, name="Glucose feed")
+        with self.settings(EDD_AUTOCOMPLETE_CACHE_LENGTH=0):
+            response = self.client.get(
+                "/search/StudyLine/",
+                data={"study": self.target_study.pk, "term": "gluc"},
+            )
+        self.assertEqual(response.status_code, codes.ok)
+        self.assertEqual(
+            response.json(), {"rows": [{"name": line.name, "id": line.pk}]}
+        )
+
     def test_lines_export(self):
         target_url = reverse("main:lines", kwargs=self.target_kwargs)
         line = factory.LineFactory(study=self.target_study)
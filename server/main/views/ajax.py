@@ -3,15 +3,16 @@
 Views used as AJAX calls by the front-end Typescript code in EDD.
 """
 
-import collections
 import json
 import logging
 
+from django.conf import settings
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.core.exceptions import PermissionDenied
 from django.db import transaction
-from django.db.models import Count
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from django.views import generic
 from requests import codes
 
@@ -19,53 +20,88 @@ from edd import utilities
 
 from .. import models as edd_models
 from .. import utilities as main_utilities
+from ..plot import PlotData
+from ..redis import PayloadCache
+from ..signals.edddata import study_source
 from .study import StudyObjectMixin, load_study
 
 logger = logging.getLogger(__name__)
 
 
+def cached_json_response(request, name, sources, build):
+    """
+    Responds with a JSON payload, cached under the versions of the sources it was
+    built from. The versions double as an ETag, so that clients sending a matching
+    If-None-Match header get a 304 Not Modified response without any payload.
+
+    :param request: the request
+    :param name: name of the payload, unique among payloads with the same sources
+    :param sources: names of the sources used to build the payload
+    :param build: callable with no arguments returning the payload
+    """
+    try:
+        cache = PayloadCache()
+        version = cache.versions(*sources)
+    except Exception as e:
+        logger.error(f"Failed to check cached payload {name}: {e}")
+        return JsonResponse(build(), encoder=utilities.JSONEncoder)
+    etag = quote_etag(f"{name}-{version}")
+    if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+        response = HttpResponseNotModified()
+    else:
+        payload = cache.load(name, version)
+        if payload is None:
+            payload = json.dumps(build(), cls=utilities.JSONEncoder).encode("utf-8")
+            expires = getattr(settings, "EDD_PAYLOAD_CACHE_EXPIRES", None)
+            cache.save(name, version, payload, expires=expires)
+        response = HttpResponse(payload, content_type="application/json")
+    response["ETag"] = etag
+    # clients must check the ETag before using a stored copy
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def plot_data_response(request, measurements):
+    """
+    Responds with a page of measurements and their values for plotting. The GET
+    parameters are all optional:
+
+    - cursor: the "next" value of the previous page
+    - limit: maximum number of measurements in the page
+    - points: maximum number of points for each measurement
+    - method: downsampling method used when limiting points, "lttb" or "minmax"
+    """
+    try:
+        params = {
+            name: int(request.GET[name])
+            for name in ("cursor", "limit", "points")
+            if request.GET.get(name)
+        }
+        method = request.GET.get("method", "lttb")
+        plot = PlotData(
+            measurements,
+            limit=params.get("limit"),
+            points=params.get("points"),
+            method=method,
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=codes.bad_request)
+    payload = plot.page(cursor=params.get("cursor"))
+    return JsonResponse(payload, encoder=utilities.JSONEncoder)
+
+
 # /study/<study_id>/measurements/<protocol_id>/
 def study_measurements(request, pk=None, slug=None, protocol=None):
     """ Request measurement data in a study. """
     # TODO: uncovered code
     obj = load_study(request, pk=pk, slug=slug)
-    measure_types = edd_models.MeasurementType.objects.filter(
-        measurement__assay__line__study=obj, measurement__assay__protocol_id=protocol
-    ).distinct()
-    # stash QuerySet to use in both measurements and total_measures below
-    qmeasurements = edd_models.Measurement.objects.filter(
-        assay__line__study=obj,
+    measurements = edd_models.Measurement.objects.filter(
+        study_id=obj.pk,
         assay__protocol_id=protocol,
         active=True,
         assay__line__active=True,
     )
-    # Limit the measurements returned to keep browser performance
-    measurements = qmeasurements.order_by("id")[:5000]
-    total_measures = qmeasurements.values("assay_id").annotate(count=Count("assay_id"))
-    measure_list = list(measurements)
-    if len(measure_list):
-        # only try to pull values when we have measurement objects
-        values = edd_models.MeasurementValue.objects.filter(
-            measurement__assay__line__study=obj,
-            measurement__assay__protocol_id=protocol,
-            measurement__active=True,
-            measurement__assay__line__active=True,
-            measurement__pk__range=(measure_list[0].id, measure_list[-1].id),
-        )
-    else:
-        values = []
-    value_dict = collections.defaultdict(list)
-    for v in values:
-        value_dict[v.measurement_id].append((v.x, v.y))
-    payload = {
-        "total_measures": {
-            x["assay_id"]: x.get("count", 0) for x in total_measures if "assay_id" in x
-        },
-        "types": {t.pk: t.to_json() for t in measure_types},
-        "measures": [m.to_json() for m in measure_list],
-        "data": value_dict,
-    }
-    return JsonResponse(payload, encoder=utilities.JSONEncoder)
+    return plot_data_response(request, measurements)
     # END uncovered
 
 
@@ -74,45 +110,15 @@ def study_assay_measurements(request, pk=None, slug=None, protocol=None, assay=N
     """ Request measurement data in a study, for a single assay. """
     # TODO: uncovered code
     obj = load_study(request, pk=pk, slug=slug)
-    measure_types = edd_models.MeasurementType.objects.filter(
-        measurement__assay__line__study=obj,
-        measurement__assay__protocol_id=protocol,
-        measurement__assay=assay,
-    ).distinct()
-    # stash QuerySet to use in both measurements and total_measures below
-    qmeasurements = edd_models.Measurement.objects.filter(
-        assay__line__study_id=obj.pk,
+    measurements = edd_models.Measurement.objects.filter(
+        study_id=obj.pk,
         assay__protocol_id=protocol,
         assay=assay,
         active=True,
         assay__active=True,
         assay__line__active=True,
     )
-    # Limit the measurements returned to keep browser performant
-    measurements = qmeasurements.order_by("id")[:5000]
-    total_measures = qmeasurements.values("assay_id").annotate(count=Count("assay_id"))
-    measure_list = list(measurements)
-    values = edd_models.MeasurementValue.objects.filter(
-        measurement__assay__line__study_id=obj.pk,
-        measurement__assay__protocol_id=protocol,
-        measurement__assay=assay,
-        measurement__active=True,
-        measurement__assay__active=True,
-        measurement__assay__line__active=True,
-        measurement__id__range=(measure_list[0].id, measure_list[-1].id),
-    )
-    value_dict = collections.defaultdict(list)
-    for v in values:
-        value_dict[v.measurement_id].append((v.x, v.y))
-    payload = {
-        "total_measures": {
-            x["assay_id"]: x.get("count", 0) for x in total_measures if "assay_id" in x
-        },
-        "types": {t.pk: t.to_json() for t in measure_types},
-        "measures": [m.to_json() for m in measure_list],
-        "data": value_dict,
-    }
-    return JsonResponse(payload, encoder=utilities.JSONEncoder)
+    return plot_data_response(request, measurements)
     # END uncovered
 
 
@@ -123,12 +129,14 @@ def study_edddata(request, pk=None, slug=None):
     EDDData JS object on the client.
     """
     model = load_study(request, pk=pk, slug=slug)
-    # TODO: uncovered code
-    data_misc = main_utilities.get_edddata_misc()
-    data_study = main_utilities.get_edddata_study(model)
-    data_study.update(data_misc)
-    return JsonResponse(data_study, encoder=utilities.JSONEncoder)
-    # END uncovered
+
+    def build():
+        data_study = main_utilities.get_edddata_study(model)
+        data_study.update(main_utilities.get_edddata_misc())
+        return data_study
+
+    sources = (study_source(model.pk), "shared", "misc")
+    return cached_json_response(request, "edddata", sources, build)
 
 
 # /study/<study_id>/assaydata/
@@ -139,10 +147,11 @@ def study_assay_table_data(request, pk=None, slug=None):
     active_param = request.GET.get("active", None)
     active_value = "true" == active_param if active_param in ("true", "false") else None
     active = edd_models.common.qfilter(value=active_value, fields=["active"])
-    existingLines = model.line_set.filter(active)
-    existingAssays = edd_models.Assay.objects.filter(active, line__study=model)
-    return JsonResponse(
-        {
+
+    def build():
+        existingLines = model.line_set.filter(active)
+        existingAssays = edd_models.Assay.objects.filter(active, line__study=model)
+        return {
             "ATData": {
                 "existingLines": list(existingLines.values("name", "id")),
                 "existingAssays": {
@@ -153,9 +162,11 @@ def study_assay_table_data(request, pk=None, slug=None):
                 },
             },
             "EDDData": main_utilities.get_edddata_study(model),
-        },
-        encoder=utilities.JSONEncoder,
-    )
+        }
+
+    sources = (study_source(model.pk), "shared")
+    name = f"assaydata:{active_value}"
+    return cached_json_response(request, name, sources, build)
     # END uncovered
 
 
@@ -5,7 +5,7 @@ Views for running exports of data from EDD.
 
 import logging
 
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils.translation import ugettext as _
 from django.views import generic
 
@@ -14,10 +14,15 @@ from edd.notify.backend import RedisBroker
 from .. import tasks
 from ..export import forms as export_forms
 from ..export.broker import ExportBroker
+from ..export.columnar import ColumnarExport
 from ..export.sbml import SbmlExport
 from ..export.table import ExportSelection
 
 logger = logging.getLogger(__name__)
+content_types = {
+    "csv": "text/csv",
+    ColumnarExport.extension: ColumnarExport.content_type,
+}
 
 
 class EDDExportView(generic.TemplateView):
@@ -82,10 +87,14 @@ class EDDExportView(generic.TemplateView):
             # TODO: uncovered code
             broker = ExportBroker(context["user_id"])
             name = broker.load_export_name(download)
-            response = HttpResponse(
-                broker.load_export(download), content_type="text/csv"
+            extension = broker.load_export_format(download)
+            response = StreamingHttpResponse(
+                broker.load_export(download),
+                content_type=content_types.get(extension, "application/octet-stream"),
             )
-            response["Content-Disposition"] = f'attachment; filename="{name}.csv"'
+            response[
+                "Content-Disposition"
+            ] = f'attachment; filename="{name}.{extension}"'
             return response
             # END uncovered
         return super().render_to_response(context, **kwargs)
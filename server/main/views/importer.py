@@ -90,7 +90,7 @@ class ImportTableView(StudyObjectMixin, generic.DetailView):
         pages = payload["totalPages"]
         broker.check_bounds(import_id, series, pages)
         # store the series of points for the task to read later
-        count = broker.add_page(import_id, json.dumps(series))
+        count = broker.add_page(import_id, series)
         # only on the first page, store the import context
         if payload["page"] == 1:
             del payload["series"]
@@ -4,6 +4,7 @@ Views dealing with displaying and manipulating Study records.
 """
 
 import collections
+import functools
 import logging
 
 from django.conf import settings
@@ -21,9 +22,10 @@ from rest_framework.reverse import reverse as rest_reverse
 
 from .. import forms as edd_forms
 from .. import models as edd_models
-from .. import redis
+from .. import redis, tasks
 from ..export import forms as export_forms
 from ..export.table import ExportSelection
+from ..lines import clone_lines
 from .export import ExportView, SbmlView, WorklistView
 
 logger = logging.getLogger(__name__)
@@ -179,14 +181,17 @@ class StudyDetailBaseView(StudyObjectMixin, generic.DetailView):
         instance = self.get_object()
         # re-using export selection to check if Study has data or not
         selection = ExportSelection(request.user, studyId=[instance.pk])
+        # check before disabling, the selection only includes active studies
+        has_data = selection.measurements.exists()
         lvs = redis.LatestViewedStudies(self.request.user)
         lvs.remove_study(instance)
-        if selection.measurements.count() == 0:
+        instance.active = False
+        instance.save(update_fields=["active"])
+        if not has_data:
             # true deletion only if there are zero measurements!
-            instance.delete()
-        else:
-            instance.active = False
-            instance.save(update_fields=["active"])
+            #   a study with data stays inactive, so it can be restored;
+            #   removing everything in the study happens in the background
+            self._submit_delete(request, instance)
         messages.success(
             request, _('Deleted Study "{study}".').format(study=instance.name)
         )
@@ -246,6 +251,14 @@ class StudyDetailBaseView(StudyObjectMixin, generic.DetailView):
                 _("You do not have permission to modify this study.")
             )
 
+    def _submit_delete(self, request, study, line_ids=None):
+        # removing lines, assays, and values takes too long for a request on large
+        #   studies; the task notifies the user when done
+        task = functools.partial(
+            tasks.delete_study_objects.delay, study.pk, request.user.pk, line_ids
+        )
+        transaction.on_commit(task)
+
 
 class StudyAttachmentView(generic.DetailView):
     model = edd_models.Attachment
@@ -424,23 +437,14 @@ class StudyLinesView(StudyDetailBaseView):
         self.check_write_permission(request)
         form = export_forms.ExportSelectionForm(data=request.POST, user=request.user)
         study = self.get_object()
-        cloned = 0
         if not form.is_valid():
             messages.error(request, _("Failed to validate selection for clone."))
             return False
-        for line in form.selection.lines:
-            # easy way to clone is just pretend to fill out add line form
-            initial = edd_forms.LineForm.initial_from_model(line)
-            # update name to indicate which is the clone
-            initial["name"] = initial["name"] + " clone"
-            clone = edd_forms.LineForm(initial, study=study)
-            if clone.is_valid():
-                clone.save()
-                cloned += 1
+        cloned = clone_lines(study, form.selection.lines)
         messages.success(
             request,
             _("Cloned {count} of {total} Lines").format(
-                count=cloned, total=form.selection.lines.count()
+                count=len(cloned), total=form.selection.lines.count()
             ),
         )
         return True
@@ -465,8 +469,12 @@ class StudyLinesView(StudyDetailBaseView):
             with transaction.atomic():
                 if not active and form.selection.measurements.count() == 0:
                     # true deletion only if there are zero measurements!
-                    count, details = form.selection.lines.delete()
-                    count = details[edd_models.Line._meta.label]
+                    #   lines with data are only disabled, so they can be enabled;
+                    #   lines are hidden now, and removed in the background
+                    line_ids = list(form.selection.lines.values_list("pk", flat=True))
+                    count = form.selection.lines.update(active=False)
+                    form.selection.assays.update(active=False)
+                    self._submit_delete(request, self.get_object(), line_ids)
                 else:
                     count = form.selection.lines.update(active=active)
                     # cascade deactivation to assays and measurements
@@ -512,20 +520,16 @@ class StudyLinesView(StudyDetailBaseView):
         study = self.get_object()
         total = lines.count()
         saved = 0
-        for line in lines:
-            form = edd_forms.LineForm(
-                request.POST, instance=line, prefix="line", study=study
-            )
-            # removes fields having disabled bulk edit checkbox
-            form.check_bulk_edit()
-            if form.is_valid():
-                form.save()
-                saved += 1
-            else:
-                context["new_line"] = form
-                for error in form.errors.values():
-                    messages.warning(request, error)
-                break
+        # validate once, then apply the same changes to every line
+        form = edd_forms.LineForm(request.POST, prefix="line", study=study)
+        # removes fields having disabled bulk edit checkbox
+        form.check_bulk_edit()
+        if form.is_valid():
+            saved = form.save_bulk(lines)
+        else:
+            context["new_line"] = form
+            for error in form.errors.values():
+                messages.warning(request, error)
         messages.success(
             request,
             _("Saved {saved} of {total} Lines").format(saved=saved, total=total),
@@ -693,6 +697,8 @@ class StudyDetailView(StudyDetailBaseView):
         # loop over measurements to add formset and to inverted structure
         show_edit = True
         with transaction.atomic():
+            # values are edited as rows; packed series become rows again
+            edd_models.PackedSeries.unpack(measures)
             for m in measures:
                 m.form = edd_forms.MeasurementValueFormSet(
                     form_payload,
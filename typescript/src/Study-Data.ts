@@ -1640,15 +1640,26 @@ function onSuccess(data) {
 function fetchMeasurements(EDDData) {
     // pulling in protocol measurements AssayMeasurements
     $.each(EDDData.Protocols, (id, protocol) => {
-        $.ajax({
-            "url": 'measurements/' + id + '/',
-            "type": 'GET',
-            "dataType": 'json',
-            "error": (xhr, status) => {
-                return;
-            },
-            "success": processMeasurementData.bind(this, protocol),
-        });
+        fetchMeasurementPages('measurements/' + id + '/', protocol);
+    });
+}
+
+// measurements are sent in pages; keep requesting until there is no next page
+function fetchMeasurementPages(url: string, protocol, cursor?: number): void {
+    $.ajax({
+        "url": url,
+        "type": 'GET',
+        "dataType": 'json',
+        "data": cursor ? { "cursor": cursor } : {},
+        "error": (xhr, status) => {
+            return;
+        },
+        "success": (data) => {
+            processMeasurementData(protocol, data);
+            if (data.next) {
+                fetchMeasurementPages(url, protocol, data.next);
+            }
+        },
     });
 }
 
@@ -1670,13 +1681,7 @@ function filterTableKeyDown(e) {
 
 export function requestAssayData(assay) {
     var protocol = EDDData.Protocols[assay.pid];
-    $.ajax({
-        "url": ['measurements', assay.pid, assay.id, ''].join('/'),
-        "type": 'GET',
-        "dataType": 'json',
-        "error": (xhr, status) => { return; },
-        "success": processMeasurementData.bind(this, protocol),
-    });
+    fetchMeasurementPages(['measurements', assay.pid, assay.id, ''].join('/'), protocol);
 }
 
 function processMeasurementData(protocol, data) {